@@ -0,0 +1,38 @@
+"""
+Migrate database of Uhost to current schema version in place
+
+Uses the same config.ini (or UHOST_CONFIG) as Uhost. Stop Uhost and back up
+the database before running it. Uhost migrates the schema at start too.
+"""
+
+import logging
+import sys
+from uhost.utilities.config import Config
+from uhost.utilities.storage_backend import StorageBackend, StorageBackendException, open_backend
+
+logging.basicConfig(format='[%(asctime)s] %(message)s', level=logging.INFO)
+
+
+def main():
+    """
+    Main function
+    """
+
+    try:
+        backend = open_backend(Config())
+        version = backend.migrate()
+    except StorageBackendException as er:
+        logging.error(er)
+        sys.exit(1)
+
+    if version == 0:
+        logging.info('There is no schema in %s, it is created at Uhost start', backend.name)
+    elif version == StorageBackend.SCHEMA_VERSION:
+        logging.info('Schema of %s is up to date (version %d)', backend.name, version)
+    else:
+        logging.info('Schema of %s is migrated from version %d to %d', backend.name, version,
+                     StorageBackend.SCHEMA_VERSION)
+
+
+if __name__ == '__main__':
+    main()
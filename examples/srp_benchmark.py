@@ -0,0 +1,123 @@
+"""
+Benchmark of SRP computations of Uhost handshake
+
+Compares server side of HELLO computed as before (k, HNxorg and g^b computed
+on every handshake), with precomputed constants of SRP group and with server
+ephemerals generated in background, checks the results are the same. Then
+compares handshakes of RFC 5054 groups with every available arithmetic
+(built-in and gmpy2 if it is installed). Reference computations are kept by
+uhost.utilities.srp_reference, tests/test_srp_compat.py checks conversions
+against them byte for byte.
+"""
+
+import os
+import sys
+import time
+import timeit
+from uhost.utilities import ephemeral_pool, srp
+from uhost.utilities.srp_reference import legacy_bytes_to_long, legacy_long_to_bytes, legacy_H, legacy_verifier
+
+ROUNDS = 200
+GROUP_ROUNDS = 50
+
+
+def measure(name, function, baseline=None, rounds=ROUNDS):
+    """
+    Print mean time of function call
+
+    :return float: Seconds per call
+    """
+
+    seconds = timeit.timeit(function, number=rounds) / rounds
+    speedup = ' ({:.1f}x)'.format(baseline / seconds) if baseline else ''
+    print('{:<40} {:>10.1f} us{}'.format(name, seconds * 1e6, speedup))
+    return seconds
+
+
+def check(name, condition):
+    """
+    Print result of compatibility check
+    """
+
+    print('{:<40} {}'.format(name, 'ok' if condition else 'FAILED'))
+    return condition
+
+
+def main():
+    """
+    Main function
+    """
+
+    username = bytes.fromhex('0123456789abcdef')
+    password = os.urandom(32)
+    salt, vkey = srp.create_salted_verification_key(username, password)
+    user = srp.User(username, password)
+    _, bytes_A = user.start_authentication()
+    bytes_b = os.urandom(32)
+
+    hash_class = srp.hashlib.sha256
+    N, g = srp.get_ng(srp.NG_1024, None, None)
+    group = srp.Group.get(hash_class, N, g)
+    b = srp.bytes_to_long(bytes_b)
+    group.pow_g(b)  # Build fixed-base table
+
+    print('Arithmetic: {}'.format(srp.get_arithmetic()))
+    verifier = srp.Verifier(username, salt, vkey, bytes_A, bytes_b=bytes_b)
+    ok = check('Verifier matches legacy computation',
+                (verifier.B, verifier.M, verifier.H_AMK) == legacy_verifier(username, salt, vkey, bytes_A, bytes_b))
+    ok &= check('Fixed-base g^e matches pow()',
+                all(group.pow_g(e) == pow(g, e, N)
+                    for e in [0, 1, 255, 256, 2 ** 255, 2 ** 256 - 1, 2 ** 256, srp.get_random(40)]))
+    _, bytes_B = verifier.get_challenge()
+    ok &= check('Handshake succeeds',
+                verifier.verify_session(user.process_challenge(salt, bytes_B)) is not None)
+    print()
+
+    bytes_N = srp.long_to_bytes(N)
+    baseline = measure('long_to_bytes(N) previous', lambda: legacy_long_to_bytes(N))
+    measure('long_to_bytes(N)', lambda: srp.long_to_bytes(N), baseline)
+    baseline = measure('bytes_to_long(N) previous', lambda: legacy_bytes_to_long(bytes_N))
+    measure('bytes_to_long(N)', lambda: srp.bytes_to_long(bytes_N), baseline)
+    baseline = measure('H(A, B) previous', lambda: legacy_H(hash_class, N, N))
+    measure('H(A, B)', lambda: srp.H(hash_class, N, N), baseline)
+    baseline = measure('g^b with pow()', lambda: pow(g, b, N))
+    measure('g^b with fixed-base table', lambda: group.pow_g(b), baseline)
+    baseline = measure('k and HNxorg computed', lambda: (srp.H(hash_class, N, g), srp.HNxorg(hash_class, N, g)))
+    measure('k and HNxorg precomputed', lambda: srp.Group.get(hash_class, N, g), baseline)
+    baseline = measure('Handshake (server) legacy', lambda: legacy_verifier(username, salt, vkey, bytes_A, bytes_b))
+    measure('Handshake (server) precomputed',
+            lambda: srp.Verifier(username, salt, vkey, bytes_A, bytes_b=bytes_b), baseline)
+
+    pool = ephemeral_pool.EphemeralPool(group, size=ROUNDS, min_size=ROUNDS)
+    pool.start()
+    while len(pool) < ROUNDS:
+        time.sleep(0.1)
+    measure('Handshake (server) with ephemeral pool', lambda: srp.Verifier(username, salt, vkey, bytes_A), baseline)
+    pool.stop()
+    print()
+
+    default_arithmetic = srp.get_arithmetic()
+    for bits, ng_type in ((1024, srp.NG_1024), (2048, srp.NG_2048), (3072, srp.NG_3072)):
+        salt, vkey = srp.create_salted_verification_key(username, password, ng_type=ng_type)
+        user = srp.User(username, password, ng_type=ng_type)
+        _, bytes_A = user.start_authentication()
+        results = set()
+        baseline = None
+        for arithmetic in srp.get_arithmetics():
+            srp.set_arithmetic(arithmetic)
+            verifier = srp.Verifier(username, salt, vkey, bytes_A, ng_type=ng_type, bytes_b=bytes_b)
+            results.add((verifier.B, verifier.M, verifier.H_AMK))
+            seconds = measure('Handshake (server) {}-bit, {}'.format(bits, arithmetic),
+                              lambda: srp.Verifier(username, salt, vkey, bytes_A, ng_type=ng_type, bytes_b=bytes_b),
+                              baseline, GROUP_ROUNDS)
+            baseline = baseline or seconds
+        _, bytes_B = verifier.get_challenge()
+        ok &= check('{}-bit handshake, same results'.format(bits),
+                    len(results) == 1 and verifier.verify_session(user.process_challenge(salt, bytes_B)) is not None)
+    srp.set_arithmetic(default_arithmetic)
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
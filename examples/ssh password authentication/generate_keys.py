@@ -47,8 +47,9 @@ def main():
 
     while True:
         try:
+            # Keys are binary since schema version 2, update_time is indexed
             sql = """
-                SELECT device_id, session_key, update_time
+                SELECT CAST(device_id AS CHAR), LOWER(HEX(session_key)), update_time
                 FROM udata
                 where session_key is not null and update_time > '{max_time}'
                 order by update_time asc 
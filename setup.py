@@ -14,7 +14,7 @@ setuptools.setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/connax-utim/uhost-python",
-    packages=setuptools.find_packages(exclude=['examples']),
+    packages=setuptools.find_packages(exclude=['examples', 'tests', 'tests.*']),
     platforms='any',
     classifiers=[
         "Programming Language :: Python :: 3",
@@ -28,4 +28,7 @@ setuptools.setup(
         'six',
         'pycrypto',
     ],
+    extras_require={
+        'gmpy2': ['gmpy2'],
+    },
 )
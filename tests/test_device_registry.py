@@ -0,0 +1,138 @@
+"""
+Loading, lookups and negative entries of DeviceRegistry
+"""
+
+import pytest
+from uhost.utilities import device_registry
+from uhost.utilities.device_registry import DeviceRegistry
+
+
+class Database(object):
+    """
+    Source of Utim IDs counting its calls
+    """
+
+    def __init__(self, devices):
+        self.devices = set(devices)
+        self.loads = 0
+        self.lookups = []
+        self.broken = False
+
+    def load(self):
+        self.loads += 1
+        return None if self.broken else list(self.devices)
+
+    def lookup(self, devid):
+        self.lookups.append(devid)
+        return None if self.broken else devid in self.devices
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(device_registry.time, 'monotonic', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def database():
+    return Database(['a', 'b'])
+
+
+def create_registry(database, refresh_interval=300, negative_ttl=30):
+    return DeviceRegistry(database.load, database.lookup, refresh_interval, negative_ttl)
+
+
+def test_first_check_loads_all_ids(clock, database):
+    registry = create_registry(database)
+    assert 'a' in registry
+    assert registry.contains('b')
+    assert database.loads == 1
+    assert database.lookups == []
+    assert len(registry) == 2
+
+
+def test_registry_is_reloaded_after_refresh_interval(clock, database):
+    registry = create_registry(database)
+    assert 'a' in registry
+    database.devices.discard('a')
+    clock[0] += 299
+    assert 'a' in registry
+    clock[0] += 1
+    assert 'b' in registry
+    assert database.loads == 2
+    assert 'a' not in registry
+
+
+def test_zero_refresh_interval_loads_once(clock, database):
+    registry = create_registry(database, refresh_interval=0)
+    assert 'a' in registry
+    clock[0] += 10 ** 6
+    assert 'b' in registry
+    assert database.loads == 1
+
+
+def test_unknown_id_is_looked_up_and_added(clock, database):
+    registry = create_registry(database)
+    assert 'a' in registry
+    database.devices.add('c')
+    assert 'c' in registry
+    assert 'c' in registry
+    assert database.lookups == ['c']
+
+
+def test_missing_id_is_remembered_for_negative_ttl(clock, database):
+    registry = create_registry(database)
+    assert 'junk' not in registry
+    clock[0] += 29
+    assert 'junk' not in registry
+    assert database.lookups == ['junk']
+    clock[0] += 1
+    assert 'junk' not in registry
+    assert database.lookups == ['junk', 'junk']
+
+
+def test_add_invalidates_negative_entry(clock, database):
+    registry = create_registry(database)
+    assert 'c' not in registry
+    registry.add('c')
+    assert 'c' in registry
+    registry.discard('c')
+    assert 'c' not in registry
+    assert database.lookups == ['c', 'c']
+
+
+def test_failed_lookup_is_not_remembered(clock, database):
+    registry = create_registry(database)
+    assert 'a' in registry
+    database.broken = True
+    assert 'c' not in registry
+    database.broken = False
+    database.devices.add('c')
+    assert 'c' in registry
+
+
+def test_failed_load_keeps_ids_and_is_retried_soon(clock, database):
+    registry = create_registry(database)
+    assert 'a' in registry
+    database.broken = True
+    clock[0] += 300
+    assert 'a' in registry
+    assert database.loads == 2
+    database.broken = False
+    clock[0] += 29
+    assert 'a' in registry
+    assert database.loads == 2
+    clock[0] += 1
+    assert 'a' in registry
+    assert database.loads == 3
+
+
+def test_missing_ids_are_bounded(clock, database, monkeypatch):
+    monkeypatch.setattr(DeviceRegistry, 'MAX_MISSING', 3)
+    registry = create_registry(database)
+    for devid in ['x', 'y', 'z', 'w']:
+        assert devid not in registry
+    # Remembered IDs were cleared to make room for 'w'
+    assert 'x' not in registry
+    assert database.lookups == ['x', 'y', 'z', 'w', 'x']
@@ -0,0 +1,54 @@
+"""
+Placement of devices on Uhost nodes by HashRing
+"""
+
+import collections
+from uhost.utilities.hash_ring import HashRing
+
+KEYS = ['{:016x}'.format(i * 7919) for i in range(5000)]
+
+
+def test_empty_ring():
+    assert HashRing([]).node_for('a') is None
+
+
+def test_single_node_owns_everything():
+    ring = HashRing(['node1'])
+    assert {ring.node_for(key) for key in KEYS[:100]} == {'node1'}
+
+
+def test_str_and_bytes_keys_are_the_same():
+    ring = HashRing(['node1', 'node2', 'node3'])
+    assert all(ring.node_for(key) == ring.node_for(key.encode()) for key in KEYS[:500])
+
+
+def test_placement_does_not_depend_on_node_order():
+    ring = HashRing(['node1', 'node2', 'node3', 'node2'])
+    other = HashRing(['node3', 'node1', 'node2'])
+    assert ring.nodes == ['node1', 'node2', 'node3']
+    assert all(ring.node_for(key) == other.node_for(key) for key in KEYS)
+
+
+def test_keys_are_spread_over_nodes():
+    nodes = ['node1', 'node2', 'node3', 'node4']
+    ring = HashRing(nodes)
+    counts = collections.Counter(ring.node_for(key) for key in KEYS)
+    assert set(counts) == set(nodes)
+    share = len(KEYS) / len(nodes)
+    assert all(0.6 * share < count < 1.4 * share for count in counts.values())
+
+
+def test_adding_node_moves_only_its_keys():
+    ring = HashRing(['node1', 'node2', 'node3'])
+    grown = HashRing(['node1', 'node2', 'node3', 'node4'])
+    moved = [key for key in KEYS if ring.node_for(key) != grown.node_for(key)]
+    assert all(grown.node_for(key) == 'node4' for key in moved)
+    assert 0.1 * len(KEYS) < len(moved) < 0.4 * len(KEYS)
+
+
+def test_removing_node_moves_only_its_keys():
+    ring = HashRing(['node1', 'node2', 'node3'])
+    shrunk = HashRing(['node1', 'node3'])
+    for key in KEYS:
+        if ring.node_for(key) != 'node2':
+            assert shrunk.node_for(key) == ring.node_for(key)
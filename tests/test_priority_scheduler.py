@@ -0,0 +1,116 @@
+"""
+Weighted round robin and per-key order of PriorityScheduler
+"""
+
+import itertools
+from uhost.utilities.message_class import MessageClass
+from uhost.utilities.priority_scheduler import PriorityScheduler
+
+CLASSES = [MessageClass.HANDSHAKE, MessageClass.CONTROL, MessageClass.DATA, MessageClass.KEEPALIVE]
+
+
+def fill(scheduler, count):
+    for message_class in reversed(CLASSES):
+        for i in range(count):
+            scheduler.put(message_class, (message_class, i))
+
+
+def pop_all(scheduler):
+    items = []
+    while not scheduler.empty():
+        items.append(scheduler.pop())
+    return items
+
+
+def test_round_follows_weights():
+    scheduler = PriorityScheduler()
+    fill(scheduler, 20)
+    round_classes = [item[0] for item in (scheduler.pop() for _ in range(15))]
+    assert round_classes == [MessageClass.HANDSHAKE] * 8 + [MessageClass.CONTROL] * 4 + \
+        [MessageClass.DATA] * 2 + [MessageClass.KEEPALIVE]
+
+
+def test_custom_weights_and_no_starvation():
+    scheduler = PriorityScheduler({MessageClass.HANDSHAKE: 1, MessageClass.CONTROL: 1, MessageClass.DATA: 1,
+                                   MessageClass.KEEPALIVE: 0})
+    fill(scheduler, 3)
+    items = pop_all(scheduler)
+    assert len(items) == 12
+    # Zero weight is raised to one, so keepalives are served every round
+    assert [item[0] for item in items[:4]] == CLASSES
+    for message_class in CLASSES:
+        assert [item[1] for item in items if item[0] == message_class] == [0, 1, 2]
+
+
+def test_pop_of_empty_scheduler():
+    scheduler = PriorityScheduler()
+    assert scheduler.pop() is None
+    assert scheduler.pop_oldest() is None
+    assert scheduler.least_important() is None
+    assert scheduler.oldest(MessageClass.DATA) is None
+    assert scheduler.drop(MessageClass.DATA) is None
+
+
+def test_unknown_class_is_data():
+    scheduler = PriorityScheduler()
+    scheduler.put(42, 'item')
+    assert scheduler.least_important() == MessageClass.DATA
+    assert scheduler.drop(MessageClass.DATA) == 'item'
+
+
+def test_pop_oldest_keeps_arrival_order():
+    scheduler = PriorityScheduler()
+    for i, message_class in enumerate([MessageClass.KEEPALIVE, MessageClass.HANDSHAKE, MessageClass.DATA,
+                                       MessageClass.HANDSHAKE]):
+        scheduler.put(message_class, i)
+    assert [scheduler.pop_oldest() for _ in range(4)] == [0, 1, 2, 3]
+    assert scheduler.empty()
+
+
+def test_least_important_oldest_and_drop():
+    scheduler = PriorityScheduler()
+    scheduler.put(MessageClass.DATA, 'data 1')
+    scheduler.put(MessageClass.HANDSHAKE, 'hello')
+    scheduler.put(MessageClass.DATA, 'data 2')
+    assert scheduler.least_important() == MessageClass.DATA
+    assert scheduler.oldest(MessageClass.DATA) < scheduler.oldest(MessageClass.HANDSHAKE)
+    assert scheduler.drop(MessageClass.DATA) == 'data 1'
+    assert scheduler.oldest(MessageClass.DATA) > scheduler.oldest(MessageClass.HANDSHAKE)
+    assert len(scheduler) == 2
+
+
+def test_key_keeps_order_of_device():
+    scheduler = PriorityScheduler()
+    scheduler.put(MessageClass.DATA, 'b-data', 'b')
+    scheduler.put(MessageClass.KEEPALIVE, 'a-ka', 'a')
+    scheduler.put(MessageClass.HANDSHAKE, 'a-hs', 'a')
+    scheduler.put(MessageClass.HANDSHAKE, 'b-hs', 'b')
+    scheduler.put(MessageClass.DATA, 'a-data', 'a')
+    # Handshake of device b joins its pending data, handshake of device a joins its keepalive
+    assert pop_all(scheduler) == ['b-data', 'b-hs', 'a-ka', 'a-hs', 'a-data']
+
+
+def test_key_is_released_when_its_items_are_taken():
+    scheduler = PriorityScheduler()
+    scheduler.put(MessageClass.KEEPALIVE, 'a-ka', 'a')
+    assert scheduler.pop() == 'a-ka'
+    scheduler.put(MessageClass.DATA, 'b-data', 'b')
+    scheduler.put(MessageClass.HANDSHAKE, 'a-hs', 'a')
+    assert pop_all(scheduler) == ['a-hs', 'b-data']
+
+    scheduler.put(MessageClass.KEEPALIVE, 'a-ka', 'a')
+    assert scheduler.drop(MessageClass.KEEPALIVE) == 'a-ka'
+    scheduler.put(MessageClass.HANDSHAKE, 'a-hs', 'a')
+    assert scheduler.least_important() == MessageClass.HANDSHAKE
+
+
+def test_shared_counter_orders_items_of_schedulers():
+    counter = itertools.count()
+    first = PriorityScheduler(counter=counter)
+    second = PriorityScheduler(counter=counter)
+    first.put(MessageClass.DATA, 'first 1')
+    second.put(MessageClass.DATA, 'second 1')
+    first.put(MessageClass.DATA, 'first 2')
+    assert first.oldest(MessageClass.DATA) < second.oldest(MessageClass.DATA)
+    first.drop(MessageClass.DATA)
+    assert first.oldest(MessageClass.DATA) > second.oldest(MessageClass.DATA)
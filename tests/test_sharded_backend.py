@@ -0,0 +1,87 @@
+"""
+Routing and fan-out of ShardedBackend, shards are fake MySQL backends
+"""
+
+import threading
+import types
+import pytest
+from uhost.utilities import sharded_backend
+from uhost.utilities.hash_ring import HashRing
+from uhost.utilities.sharded_backend import ShardedBackend
+
+HOSTS = ['db1', 'db2', 'db3']
+DEVIDS = ['{:016x}'.format(i * 7919) for i in range(300)]
+
+
+class FakeShard(object):
+    """
+    MySQL backend of one host recording its calls
+    """
+
+    def __init__(self, cfg, host):
+        self.host = host
+        self.name = 'uhost_' + cfg.uhost_name
+        self.version = cfg.versions.get(host, 4)
+        self.calls = []
+
+    def create(self):
+        self.calls.append('create')
+
+    def execute(self, sql, params=None, raise_error=False, replica=False):
+        self.calls.append((sql, params, raise_error, replica))
+        return [(self.host,)]
+
+    def schema_version(self):
+        return self.version
+
+    def migrate(self):
+        self.calls.append('migrate')
+        return self.version
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    monkeypatch.setattr(sharded_backend, 'MySqlBackend', FakeShard)
+    return ShardedBackend(types.SimpleNamespace(uhost_name='74657374', db_shards=HOSTS, versions={'db2': 3}))
+
+
+def test_utims_are_routed_by_hash_ring(backend):
+    ring = HashRing(HOSTS)
+    assert [shard.host for shard in backend.shards] == HOSTS
+    assert all(backend.shard_for(devid).host == ring.node_for(devid) for devid in DEVIDS)
+    assert backend.name == 'uhost_74657374'
+
+
+def test_group_keeps_every_utim_once(backend):
+    groups = backend.group(DEVIDS)
+    assert len(groups) == len(HOSTS)
+    assert sorted(devid for devids in groups.values() for devid in devids) == sorted(DEVIDS)
+    for shard, devids in groups.items():
+        assert all(backend.shard_for(devid) is shard for devid in devids)
+
+
+def test_map_shards_runs_in_parallel_and_keeps_order(backend):
+    barrier = threading.Barrier(len(HOSTS), timeout=5)
+
+    def host(shard):
+        barrier.wait()
+        return shard.host
+
+    assert backend.map_shards(host) == HOSTS
+    shards = backend.shards[1:]
+    assert backend.map_shards(lambda shard: shard.host, shards) == HOSTS[1:]
+    assert backend.map_shards(lambda shard: shard.host, shards[:1]) == HOSTS[1:2]
+
+
+def test_schema_is_created_and_migrated_on_every_shard(backend):
+    backend.create()
+    assert all(shard.calls == ['create'] for shard in backend.shards)
+    assert backend.schema_version() == 3
+    assert backend.migrate() == 3
+    assert all(shard.calls == ['create', 'migrate'] for shard in backend.shards)
+
+
+def test_uhost_wide_statements_run_on_first_shard(backend):
+    assert backend.execute("SELECT * FROM subs WHERE sub_id = %s", [1], True, True) == [('db1',)]
+    assert backend.shards[0].calls == [("SELECT * FROM subs WHERE sub_id = %s", [1], True, True)]
+    assert all(shard.calls == [] for shard in backend.shards[1:])
@@ -0,0 +1,181 @@
+"""
+Load shedding policies of SheddingQueue
+"""
+
+import queue
+import threading
+import time
+import pytest
+from uhost.utilities.deferred_call import DeferredCall
+from uhost.utilities.message_class import MessageClass
+from uhost.utilities.shedding_queue import LoadShedder, SheddingQueue, shard_of
+
+HANDSHAKE = MessageClass.HANDSHAKE
+DATA = MessageClass.DATA
+KEEPALIVE = MessageClass.KEEPALIVE
+
+DEVICES = [('device%d' % i).encode() for i in range(16)]
+
+
+def classify(item):
+    return item[1]
+
+
+def create_queue(maxsize, policy=LoadShedder.POLICY_DROP_OLDEST, block_timeout=None, weights=None, partitions=1):
+    return SheddingQueue(maxsize, LoadShedder('test', policy, classify), block_timeout, weights, partitions)
+
+
+def device_of(partition, partitions):
+    return next(device for device in DEVICES if shard_of(device, partitions) == partition)
+
+
+def drain(items, partition=0):
+    result = []
+    while True:
+        try:
+            result.append(items.get(False, partition=partition))
+        except queue.Empty:
+            return result
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        LoadShedder('test', 'drop_everything')
+
+
+def test_drop_oldest_drops_least_important_class():
+    items = create_queue(3)
+    items.put([b'a', DATA, 1])
+    items.put([b'b', KEEPALIVE, 2])
+    items.put([b'c', DATA, 3])
+    items.put([b'd', HANDSHAKE, 4])
+    assert [item[2] for item in drain(items)] == [1, 3, 4]
+    assert items.shedder.drops == {'keepalive': 1}
+
+
+def test_drop_oldest_within_class():
+    items = create_queue(2)
+    for i in range(4):
+        items.put([b'a', DATA, i])
+    assert [item[2] for item in drain(items)] == [2, 3]
+    assert items.shedder.drops == {'data': 2}
+    assert items.unfinished_tasks == 2
+
+
+@pytest.mark.parametrize('policy', LoadShedder.POLICIES)
+def test_less_important_item_is_rejected(policy):
+    items = create_queue(2, policy, block_timeout=0.01)
+    items.put([b'a', HANDSHAKE, 1])
+    items.put([b'a', DATA, 2])
+    with pytest.raises(queue.Full):
+        items.put([b'a', KEEPALIVE, 3])
+    assert items.shedder.drops == {'keepalive': 1}
+    assert [item[2] for item in drain(items)] == [1, 2]
+
+
+def test_reject_newest_keeps_queued_items_of_class():
+    items = create_queue(2, LoadShedder.POLICY_REJECT_NEWEST)
+    items.put([b'a', DATA, 1])
+    items.put([b'a', DATA, 2])
+    with pytest.raises(queue.Full):
+        items.put([b'a', DATA, 3])
+    items.put([b'a', HANDSHAKE, 4])
+    assert [item[2] for item in drain(items)] == [2, 4]
+    assert items.shedder.drops == {'data': 2}
+
+
+def test_block_waits_for_free_space():
+    items = create_queue(1, LoadShedder.POLICY_BLOCK, block_timeout=5)
+    items.put([b'a', DATA, 1])
+    consumer = threading.Timer(0.05, items.get)
+    consumer.start()
+    items.put([b'a', DATA, 2])
+    consumer.join()
+    assert [item[2] for item in drain(items)] == [2]
+    assert items.shedder.drops == {}
+
+
+def test_block_sheds_as_reject_newest_on_timeout():
+    items = create_queue(1, LoadShedder.POLICY_BLOCK, block_timeout=0.05)
+    items.put([b'a', DATA, 1])
+    started = time.monotonic()
+    with pytest.raises(queue.Full):
+        items.put([b'a', DATA, 2])
+    assert time.monotonic() - started >= 0.05
+    items.put([b'a', HANDSHAKE, 3], block=False)
+    assert [item[2] for item in drain(items)] == [3]
+
+
+def test_deferred_calls_are_put_regardless_of_capacity():
+    items = create_queue(1, LoadShedder.POLICY_REJECT_NEWEST)
+    items.put([b'a', DATA, 1])
+    calls = [DeferredCall('a', lambda: None) for _ in range(3)]
+    for call in calls:
+        items.put(call)
+    assert items.qsize() == 4
+    # Calls are never shed: only the frame may make room
+    items.put([b'a', HANDSHAKE, 2])
+    assert drain(items) == calls + [[b'a', HANDSHAKE, 2]]
+    assert items.shedder.drops == {'data': 1}
+
+
+def test_full_of_deferred_calls_rejects_frames():
+    items = create_queue(1)
+    call = DeferredCall('a', lambda: None)
+    items.put(call)
+    with pytest.raises(queue.Full):
+        items.put([b'a', HANDSHAKE, 1])
+    assert drain(items) == [call]
+
+
+def test_weights_take_important_classes_first():
+    items = create_queue(0, weights={})
+    items.put([b'a', KEEPALIVE, 1])
+    items.put([b'b', DATA, 2])
+    items.put([b'c', HANDSHAKE, 3])
+    assert [item[2] for item in drain(items)] == [3, 2, 1]
+
+
+def test_weights_keep_order_of_device():
+    items = create_queue(0, weights={})
+    items.put([b'a', KEEPALIVE, 1])
+    items.put([b'b', DATA, 2])
+    items.put([b'a', HANDSHAKE, 3])
+    assert [item[2] for item in drain(items)] == [2, 1, 3]
+
+
+def test_partitions_route_devices():
+    partitions = 4
+    items = create_queue(0, partitions=partitions)
+    for i in range(3):
+        for device in DEVICES:
+            items.put([device, DATA, i])
+    call = DeferredCall('device0', lambda: None)
+    items.put(call)
+
+    for partition in range(partitions):
+        got = drain(items, partition)
+        assert all(shard_of(item[0], partitions) == partition for item in got)
+        for device in DEVICES:
+            if shard_of(device, partitions) == partition:
+                assert [item[2] for item in got if item[0] == device and item is not call] == [0, 1, 2]
+        assert (call in got) == (shard_of(b'device0', partitions) == partition)
+    assert items.qsize() == 0
+
+
+def test_partitions_share_capacity_and_shed_oldest():
+    first, second = device_of(0, 2), device_of(1, 2)
+    items = create_queue(2, partitions=2)
+    items.put([second, DATA, 1])
+    items.put([first, DATA, 2])
+    items.put([first, DATA, 3])
+    assert drain(items, 1) == []
+    assert [item[2] for item in drain(items, 0)] == [2, 3]
+
+
+def test_get_of_partition_waits_for_its_items():
+    items = create_queue(0, partitions=2)
+    threading.Timer(0.05, items.put, ([device_of(1, 2), DATA, 1],)).start()
+    with pytest.raises(queue.Empty):
+        items.get(timeout=0.2, partition=0)
+    assert items.get(timeout=1, partition=1)[2] == 1
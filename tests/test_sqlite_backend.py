@@ -0,0 +1,162 @@
+"""
+Schema creation and migration of SqliteBackend
+"""
+
+import datetime
+import sqlite3
+import types
+import pytest
+from uhost.utilities.sqlite_backend import SqliteBackend
+from uhost.utilities.storage_backend import StorageBackendException
+
+# Schema version 1 as created by the first SQLite backend
+SCHEMA_1 = [
+    """CREATE TABLE statuses (
+           complex_status TEXT NOT NULL PRIMARY KEY,
+           status TEXT,
+           provision TEXT,
+           network TEXT,
+           security TEXT) WITHOUT ROWID""",
+    """CREATE TABLE subs (
+           sub_id INTEGER PRIMARY KEY AUTOINCREMENT,
+           sub_name TEXT,
+           sub_type TEXT,
+           host_name TEXT,
+           shared_access_key_name TEXT,
+           shared_access_key TEXT,
+           auth_method TEXT,
+           region TEXT)""",
+    """CREATE TABLE udata (
+           device_id TEXT NOT NULL PRIMARY KEY,
+           name TEXT,
+           session_key TEXT,
+           config_hash TEXT,
+           keep_alive_counter INTEGER DEFAULT 0,
+           status TEXT DEFAULT 'STATUS_NEWBORN' REFERENCES statuses(complex_status),
+           update_time TIMESTAMP,
+           sub_id INTEGER REFERENCES subs(sub_id)) WITHOUT ROWID"""
+]
+
+SESSION_KEY = bytes(range(32))
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'uhost.sqlite')
+
+
+@pytest.fixture
+def backend(path):
+    return SqliteBackend(types.SimpleNamespace(uhost_name='74657374', sqlite_path=path))
+
+
+def create_schema_1(path):
+    connection = sqlite3.connect(path)
+    for sql in SCHEMA_1:
+        connection.execute(sql)
+    connection.executemany("INSERT INTO statuses (complex_status, status, network, security) VALUES (?, ?, ?, ?)",
+                           [item[1:] for item in SqliteBackend.STATUSES])
+    connection.execute("INSERT INTO subs (sub_name) VALUES ('hub')")
+    connection.executemany("""INSERT INTO udata (device_id, name, session_key, config_hash, keep_alive_counter,
+                                                 status, update_time, sub_id)
+                              VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                           [('AbC1', 'first', SESSION_KEY.hex(), 'hash', 2, 'STATUS_DONE', '2020-01-02 03:04:05', 1),
+                            ('abc2', 'second', None, None, 0, 'STATUS_NEWBORN', None, None),
+                            ('abc3', 'third', None, None, 0, 'STATUS_UNKNOWN', None, None)])
+    connection.commit()
+    connection.close()
+
+
+def columns(backend):
+    return [row[1] for row in backend.execute("PRAGMA table_info(udata)")]
+
+
+def indexes(backend):
+    return {row[0] for row in backend.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+
+def test_create_new_schema(backend):
+    assert backend.schema_version() == 0
+    backend.create()
+    assert backend.schema_version() == SqliteBackend.SCHEMA_VERSION
+    assert columns(backend) == ['device_id', 'name', 'session_key', 'srp_salt', 'srp_vkey', 'srp_key_id',
+                                'config_hash', 'keep_alive_counter', 'status', 'update_time', 'sub_id']
+    assert {'udata_status_idx', 'udata_update_time_idx'} <= indexes(backend)
+    assert backend.execute("SELECT code, complex_status FROM statuses ORDER BY code") == \
+        [(item[0], item[1]) for item in SqliteBackend.STATUSES]
+
+    # Create of existing schema changes nothing
+    backend.create()
+    assert backend.schema_version() == SqliteBackend.SCHEMA_VERSION
+
+
+def test_execute_with_mysql_placeholders(backend):
+    backend.create()
+    update_time = datetime.datetime(2020, 1, 2, 3, 4, 5)
+    backend.execute("INSERT INTO udata (device_id, name, session_key, update_time) VALUES (%s, %s, %s, %s)",
+                    ['abc', 'utim', SESSION_KEY, update_time])
+    assert backend.execute("SELECT name, session_key, status, update_time FROM udata WHERE device_id = %s",
+                           ['abc']) == [('utim', SESSION_KEY, SqliteBackend.STATUS_CODES['STATUS_NEWBORN'],
+                                         '2020-01-02 03:04:05')]
+    assert backend.execute("SELECT name FROM udata WHERE device_id = %s", ['missing']) == []
+
+
+def test_failed_statement(backend):
+    backend.create()
+    sql = "INSERT INTO udata (device_id, status) VALUES (%s, %s)"
+    # Foreign keys are enforced
+    assert backend.execute(sql, ['abc', 99]) is None
+    with pytest.raises(StorageBackendException):
+        backend.execute(sql, ['abc', 99], raise_error=True)
+    assert backend.execute("SELECT COUNT(*) FROM udata") == [(0,)]
+
+
+def test_migrate_from_version_1(path, backend):
+    create_schema_1(path)
+    assert backend.schema_version() == 1
+    backend.create()
+    assert backend.schema_version() == SqliteBackend.SCHEMA_VERSION
+    assert columns(backend) == ['device_id', 'name', 'session_key', 'srp_salt', 'srp_vkey', 'srp_key_id',
+                                'config_hash', 'keep_alive_counter', 'status', 'update_time', 'sub_id']
+    assert {'udata_status_idx', 'udata_update_time_idx'} <= indexes(backend)
+
+    rows = backend.execute("""SELECT device_id, name, session_key, srp_salt, srp_vkey, srp_key_id, config_hash,
+                                     keep_alive_counter, status, update_time, sub_id
+                              FROM udata ORDER BY name""")
+    assert rows == [
+        ('AbC1', 'first', SESSION_KEY, None, None, None, 'hash', 2, SqliteBackend.STATUS_CODES['STATUS_DONE'],
+         '2020-01-02 03:04:05', 1),
+        ('abc2', 'second', None, None, None, None, None, 0, SqliteBackend.STATUS_CODES['STATUS_NEWBORN'], None,
+         None),
+        # Unknown status name gets the default status
+        ('abc3', 'third', None, None, None, None, None, 0, SqliteBackend.STATUS_CODES['STATUS_NEWBORN'], None,
+         None)
+    ]
+    # Device IDs keep their case
+    assert backend.execute("SELECT name FROM udata WHERE device_id = %s", ['abc1']) == []
+    assert backend.execute("SELECT code, complex_status FROM statuses ORDER BY code") == \
+        [(item[0], item[1]) for item in SqliteBackend.STATUSES]
+    assert backend.execute("PRAGMA foreign_key_check") == []
+
+
+@pytest.mark.skipif(sqlite3.sqlite_version_info < (3, 35), reason='SQLite without DROP COLUMN')
+def test_migrate_from_version_3(backend):
+    backend.create()
+    backend.execute("ALTER TABLE udata DROP COLUMN srp_key_id")
+    backend.execute("INSERT INTO udata (device_id, srp_salt, srp_vkey) VALUES (%s, %s, %s)", ['abc', b'salt', b'v'])
+    backend._set_schema_version(3)
+    assert backend.migrate() == 3
+    assert backend.schema_version() == SqliteBackend.SCHEMA_VERSION
+    assert backend.execute("SELECT srp_salt, srp_vkey, srp_key_id FROM udata") == [(b'salt', b'v', None)]
+
+
+def test_newer_schema_is_not_migrated(backend):
+    backend.create()
+    backend._set_schema_version(SqliteBackend.SCHEMA_VERSION + 1)
+    with pytest.raises(StorageBackendException):
+        backend.migrate()
+
+
+def test_migrate_without_schema(backend):
+    assert backend.migrate() == 0
+    assert backend.schema_version() == 0
@@ -0,0 +1,67 @@
+"""
+Compatibility of SRP conversions with their previous implementation
+
+Salts, verification keys and handshake messages of Utims depend on these
+conversions byte for byte, so they are checked against the reference
+(previous) implementation kept by uhost.utilities.srp_reference.
+"""
+
+import hashlib
+import os
+import pytest
+from uhost.utilities import srp
+from uhost.utilities.srp_reference import legacy_bytes_to_long, legacy_long_to_bytes, legacy_H, legacy_HNxorg, \
+    legacy_verifier
+
+
+NUMBERS = [0, 1, 0x7F, 0x80, 0xFF, 0x100, 0xFFFF, 0x10000, 2 ** 255, 2 ** 256 - 1, 2 ** 256] + \
+    [srp.get_random(size) for size in (1, 2, 31, 32, 33, 128, 256, 384)] + \
+    [srp.get_random(32) >> shift for shift in (8, 16, 64)]  # Short values of 32-byte secrets
+
+STRINGS = [b'', b'\x00', b'\x00\x00', b'\x00\x01', b'\x00\xff\x00', b'\x01\x00', b'\xff' * 32] + \
+    [b'\x00' * zeros + os.urandom(size) for zeros in (0, 1, 3) for size in (1, 32, 128)]
+
+GROUPS = [srp.get_ng(ng_type, None, None) for ng_type in (srp.NG_1024, srp.NG_2048, srp.NG_3072)] + \
+    [(2 ** 127 - 1, 3), (0xFF, 2)]
+
+
+@pytest.mark.parametrize('n', NUMBERS)
+def test_long_to_bytes(n):
+    assert srp.long_to_bytes(n) == legacy_long_to_bytes(n)
+
+
+@pytest.mark.parametrize('s', STRINGS)
+def test_bytes_to_long(s):
+    assert srp.bytes_to_long(s) == legacy_bytes_to_long(s)
+
+
+@pytest.mark.parametrize('s', STRINGS)
+def test_round_trip_drops_leading_zeros(s):
+    assert srp.long_to_bytes(srp.bytes_to_long(s)) == s.lstrip(b'\x00')
+
+
+@pytest.mark.parametrize('args', [(0,), (1, 2), (b'',), (None, 5, b'\x00\x01'), tuple(NUMBERS[-4:]),
+                                  tuple(STRINGS[-3:])])
+def test_H(args):
+    assert srp.H(hashlib.sha256, *args) == legacy_H(hashlib.sha256, *args)
+
+
+@pytest.mark.parametrize('N, g', GROUPS)
+@pytest.mark.parametrize('hash_class', [hashlib.sha1, hashlib.sha256])
+def test_HNxorg(hash_class, N, g):
+    assert srp.HNxorg(hash_class, N, g) == legacy_HNxorg(hash_class, N, g)
+
+
+def test_verifier_matches_legacy_computation():
+    username = bytes.fromhex('0123456789abcdef')
+    password = os.urandom(32)
+    salt, vkey = srp.create_salted_verification_key(username, password)
+    user = srp.User(username, password)
+    _, bytes_A = user.start_authentication()
+    bytes_b = os.urandom(32)
+
+    verifier = srp.Verifier(username, salt, vkey, bytes_A, bytes_b=bytes_b)
+    assert (verifier.B, verifier.M, verifier.H_AMK) == legacy_verifier(username, salt, vkey, bytes_A, bytes_b)
+
+    _, bytes_B = verifier.get_challenge()
+    assert verifier.verify_session(user.process_challenge(salt, bytes_B)) is not None
@@ -0,0 +1,43 @@
+"""
+Fixed-base exponentiation of SRP groups
+
+Group.pow_g() computes g^e with a precomputed table of g for exponents up to
+FIXED_BASE_BITS bits and falls back to modular exponentiation above that, both
+must match built-in pow().
+"""
+
+import hashlib
+import pytest
+from uhost.utilities import srp
+
+NG_TYPES = [srp.NG_1024, srp.NG_2048, srp.NG_3072]
+
+
+def exponents(N):
+    bits = srp.Group.FIXED_BASE_BITS
+    return [0, 1, 2, 255, 256, 2 ** (bits - 1), 2 ** bits - 1, 2 ** bits, 2 ** bits + 1, srp.get_random(32),
+            N - 2, N - 1]
+
+
+@pytest.fixture(params=srp.get_arithmetics())
+def arithmetic(request):
+    default_arithmetic = srp.get_arithmetic()
+    srp.set_arithmetic(request.param)
+    yield request.param
+    srp.set_arithmetic(default_arithmetic)
+
+
+@pytest.mark.parametrize('ng_type', NG_TYPES)
+def test_pow_g_matches_pow(arithmetic, ng_type):
+    N, g = srp.get_ng(ng_type, None, None)
+    group = srp.Group.get(hashlib.sha256, N, g)
+    for e in exponents(N):
+        assert group.pow_g(e) == pow(g, e, N), e
+
+
+@pytest.mark.parametrize('ng_type', NG_TYPES)
+def test_pow_g_returns_int(arithmetic, ng_type):
+    N, g = srp.get_ng(ng_type, None, None)
+    group = srp.Group.get(hashlib.sha256, N, g)
+    assert type(group.pow_g(srp.get_random(32))) is int
+    assert type(group.pow_g(N - 1)) is int
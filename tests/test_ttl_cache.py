@@ -0,0 +1,104 @@
+"""
+Eviction, expiration and invalidation stamps of TtlCache
+"""
+
+import pytest
+from uhost.utilities import ttl_cache
+from uhost.utilities.ttl_cache import TtlCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ttl_cache.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_none_is_cached_value():
+    cache = TtlCache(10, 60)
+    assert cache.get('a') == (False, None)
+    cache.put('a', None)
+    assert cache.get('a') == (True, None)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_zero_maxsize_keeps_nothing():
+    cache = TtlCache(0, 60)
+    cache.put('a', 1)
+    assert cache.get('a') == (False, None)
+    assert len(cache) == 0
+
+
+def test_least_recently_used_is_evicted():
+    cache = TtlCache(2, 60)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert cache.get('b') == (False, None)
+    assert cache.get('a') == (True, 1)
+    assert cache.get('c') == (True, 3)
+
+
+def test_entry_expires(clock):
+    cache = TtlCache(10, 60)
+    cache.put('a', 1)
+    clock[0] += 59
+    assert cache.get('a') == (True, 1)
+    clock[0] += 1
+    assert cache.get('a') == (False, None)
+    assert len(cache) == 0
+
+
+def test_zero_ttl_keeps_entry_until_evicted(clock):
+    cache = TtlCache(10, 0)
+    cache.put('a', 1)
+    clock[0] += 10 ** 6
+    assert cache.get('a') == (True, 1)
+
+
+def test_put_with_current_stamp():
+    cache = TtlCache(10, 60)
+    stamp = cache.stamp()
+    cache.put('a', 1, stamp)
+    assert cache.get('a') == (True, 1)
+
+
+def test_put_after_invalidate_is_skipped():
+    cache = TtlCache(10, 60)
+    stamp = cache.stamp()
+    # Value was read from the source, then changed and invalidated by another thread
+    cache.invalidate('a')
+    cache.put('a', 'stale', stamp)
+    assert cache.get('a') == (False, None)
+
+    # Invalidation of any key skips the put: stamps are not per key
+    stamp = cache.stamp()
+    cache.invalidate('b')
+    cache.put('a', 'stale', stamp)
+    assert cache.get('a') == (False, None)
+
+    cache.put('a', 'fresh', cache.stamp())
+    assert cache.get('a') == (True, 'fresh')
+
+
+def test_put_after_clear_is_skipped():
+    cache = TtlCache(10, 60)
+    cache.put('a', 1)
+    stamp = cache.stamp()
+    cache.clear()
+    cache.put('b', 2, stamp)
+    assert len(cache) == 0
+
+
+def test_put_without_stamp_ignores_invalidations():
+    cache = TtlCache(10, 60)
+    cache.invalidate('a')
+    cache.put('a', 1)
+    assert cache.get('a') == (True, 1)
+
+
+def test_shared_cache_by_name():
+    cache = TtlCache.shared('test_ttl_cache.shared', 10, 60)
+    assert TtlCache.shared('test_ttl_cache.shared') is cache
+    assert TtlCache.shared('test_ttl_cache.other') is not cache
@@ -0,0 +1,111 @@
+"""
+Coalescing and failed flushes of WriteBuffer
+"""
+
+import threading
+import pytest
+from uhost.utilities.write_buffer import WriteBuffer
+
+
+class Sink(object):
+    """
+    Flush callable recording written values, fails while failing is set
+    """
+
+    def __init__(self):
+        self.writes = []
+        self.failing = False
+        self.during_flush = None
+        self.flushed = threading.Event()
+
+    def __call__(self, pending):
+        if self.during_flush is not None:
+            self.during_flush()
+        if self.failing:
+            raise IOError('database is gone')
+        self.writes.append(pending)
+        self.flushed.set()
+
+
+@pytest.fixture
+def sink():
+    return Sink()
+
+
+def test_latest_value_per_column_is_written(sink):
+    buffer = WriteBuffer(sink)
+    buffer.set('a', 'status', 1)
+    buffer.set('a', 'status', 2)
+    buffer.set_many('a', {'keep_alive_counter': 5, 'status': 3})
+    buffer.set('b', 'status', 1)
+    assert len(buffer) == 2
+    assert buffer.get('a', 'status') == (True, 3)
+    assert buffer.get('a', 'session_key') == (False, None)
+
+    assert buffer.flush()
+    assert sink.writes == [{'a': {'status': 3, 'keep_alive_counter': 5}, 'b': {'status': 1}}]
+    assert len(buffer) == 0
+    assert buffer.get('a', 'status') == (False, None)
+
+
+def test_flush_of_empty_buffer(sink):
+    buffer = WriteBuffer(sink)
+    assert buffer.flush()
+    assert sink.writes == []
+
+
+def test_values_are_visible_while_flushing(sink):
+    buffer = WriteBuffer(sink)
+    buffer.set('a', 'status', 1)
+    seen = []
+    sink.during_flush = lambda: seen.append(buffer.get('a', 'status'))
+    buffer.flush()
+    assert seen == [(True, 1)]
+
+
+def test_failed_flush_keeps_values(sink):
+    buffer = WriteBuffer(sink)
+    buffer.set_many('a', {'status': 1, 'keep_alive_counter': 1})
+    sink.failing = True
+    assert not buffer.flush()
+    assert len(buffer) == 1
+    assert buffer.get('a', 'status') == (True, 1)
+
+    sink.failing = False
+    assert buffer.flush()
+    assert sink.writes == [{'a': {'status': 1, 'keep_alive_counter': 1}}]
+
+
+def test_failed_flush_keeps_newer_values(sink):
+    buffer = WriteBuffer(sink)
+    buffer.set_many('a', {'status': 1, 'keep_alive_counter': 1})
+    sink.failing = True
+    # Values set during the failed flush win over the values being put back
+    sink.during_flush = lambda: buffer.set('a', 'status', 2)
+    assert not buffer.flush()
+
+    sink.failing = False
+    sink.during_flush = None
+    assert buffer.flush()
+    assert sink.writes == [{'a': {'status': 2, 'keep_alive_counter': 1}}]
+
+
+def test_max_pending_wakes_flushing_thread(sink):
+    buffer = WriteBuffer(sink, interval=60, max_pending=2)
+    buffer.start()
+    try:
+        buffer.set('a', 'status', 1)
+        assert not sink.flushed.wait(0.1)
+        buffer.set('b', 'status', 1)
+        assert sink.flushed.wait(5)
+        assert sink.writes == [{'a': {'status': 1}, 'b': {'status': 1}}]
+    finally:
+        buffer.stop()
+
+
+def test_stop_flushes_pending_values(sink):
+    buffer = WriteBuffer(sink, interval=60)
+    buffer.start()
+    buffer.set('a', 'status', 1)
+    buffer.stop()
+    assert sink.writes == [{'a': {'status': 1}}]
@@ -0,0 +1,258 @@
+"""
+Uhost asyncio module
+"""
+
+import asyncio
+import collections
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from .uhost import Uhost
+from .utilities.async_queue import AsyncQueue
+from .utilities.device_lanes import DeviceLanes
+from .utilities.shedding_queue import LoadShedder
+
+
+class PreparedItems(object):
+    """
+    Items of a device prepared with their batch
+    """
+
+    def __init__(self, prepared, devid):
+        """
+        Initialization
+
+        :param prepared: Future of {device ID: prepared items} of the batch
+        :param str devid: Device ID
+        """
+
+        self.prepared = prepared
+        self.devid = devid
+
+
+class AsyncUhost(Uhost):
+    """
+    Uhost running its pipelines as coroutines of a single event loop
+
+    Inbound and outbound items are processed in lanes of their devices: items
+    of one device keep their order, up to async_concurrency items of different
+    devices are processed at once. Database and transport clients and item
+    handlers are blocking, so AsyncUhost is an event loop front end of a thread
+    pool: the loop schedules lanes, handlers run in the executor.
+    """
+
+    def __init__(self):
+        """
+        Initialization
+        """
+
+        super().__init__()
+
+        self.__loop = None
+        self.__executor = None
+        self.__stopped = None
+        self.__tasks = []
+
+    def _create_queue(self, name, maxsize, classify, weights=None, partitions=1):
+        """
+        Create queue of the pipeline
+
+        :param str name: Queue name
+        :param int maxsize: Queue capacity (0 - unbounded)
+        :param classify: Callable to get MessageClass of item
+        :param dict weights: PriorityScheduler weights (None - arrival order)
+        :param int partitions: Not used, lanes of devices are not partitioned
+        """
+
+        return AsyncQueue(maxsize, LoadShedder(name, self._config.queue_policy, classify), weights)
+
+    def run(self):
+        """
+        Run Uhost event loop
+        """
+
+        asyncio.run(self.serve())
+
+    async def serve(self):
+        """
+        Run Uhost coroutines until stop() is called
+        """
+
+        self.__loop = asyncio.get_running_loop()
+        self.__stopped = asyncio.Event()
+        # Handlers and batch preparation of inbound and outbound lanes, publisher and keepalive sweep
+        self.__executor = ThreadPoolExecutor(max_workers=2 * self._config.async_concurrency + 2)
+
+        for item_queue in (self._inbound_queue, self._outbound_queue, self._ready_to_send_queue):
+            item_queue.bind(self.__loop)
+
+        # Run main loop
+        self._running = True
+
+        # Subscribe to Uhost topic
+        await self.__loop.run_in_executor(self.__executor, self._connection.subscribe)
+
+        self.__tasks = [
+            asyncio.ensure_future(self.__pump(self._inbound_queue, self._item_process.dispatch,
+                                              self._item_process.open_frames,
+                                              self._item_process.frame_key)),
+            asyncio.ensure_future(self.__pump(self._outbound_queue, self._out_process.process)),
+            asyncio.ensure_future(self.__publish()),
+            asyncio.ensure_future(self.__keepalive())
+        ]
+
+        logging.info("Async Uhost works!")
+
+        self._generate_utim_config()
+
+        try:
+            await self.__stopped.wait()
+        finally:
+            self._running = False
+            for task in self.__tasks:
+                task.cancel()
+            await asyncio.gather(*self.__tasks, return_exceptions=True)
+            self.__executor.shutdown(wait=False)
+
+    def stop(self):
+        """
+        Stop Uhost
+        """
+
+        # Stop main loop
+        self._running = False
+        if self.__loop is not None and self.__stopped is not None:
+            self.__loop.call_soon_threadsafe(self.__stopped.set)
+
+        # Stop SRP computations
+        self.srp_executor.shutdown()
+
+        # Stop connection
+        self._connection.disconnect()
+
+        # Write buffered database updates
+        self.database.flush()
+
+    async def __pump(self, source, handler, prepare=None, key=None):
+        """
+        Process items of the source queue in lanes of their devices
+
+        With prepare items are collected in batches. Items of devices idle in
+        lanes are prepared together in the executor while the pump goes on, items
+        of busy devices are prepared in their lanes after earlier items (those
+        may change session key of the device), so no device waits for another.
+
+        :param AsyncQueue source: Queue to get items from
+        :param handler: Callable to process single item
+        :param prepare: Callable to prepare list of items (returns list of prepared items)
+        :param key: Callable to get device ID of prepared item (item[0] by default)
+        """
+
+        key = key if key is not None else (lambda item: item[0])
+        process = functools.partial(self.__process, handler, prepare, key)
+        lanes = DeviceLanes(self.__loop, process, self._config.async_concurrency, shedder=source.shedder)
+        try:
+            if prepare is None:
+                while True:
+                    await lanes.put(await source.get())
+
+            while True:
+                idle = collections.OrderedDict()  # {device ID: items}
+                busy = []
+                for item in await self.__collect(source):
+                    devid = lanes.key(item)
+                    if lanes.busy(devid):
+                        busy.append(item)
+                    else:
+                        idle.setdefault(devid, []).append(item)
+
+                for item in busy:
+                    await lanes.put(item)
+
+                if idle:
+                    prepared = self.__loop.run_in_executor(self.__executor, self.__prepare, prepare, key,
+                                                           [item for items in idle.values() for item in items])
+                    for devid in idle:
+                        await lanes.put(PreparedItems(prepared, devid), devid)
+        finally:
+            lanes.cancel()
+
+    async def __process(self, handler, prepare, key, item):
+        """
+        Process item in lane of its device
+
+        :param item: Item or PreparedItems of the device
+        """
+
+        if isinstance(item, PreparedItems):
+            items = (await item.prepared).get(item.devid, [])
+        elif prepare is not None:
+            groups = await self.__loop.run_in_executor(self.__executor, self.__prepare, prepare, key, [item])
+            items = [prepared for group in groups.values() for prepared in group]
+        else:
+            items = [item]
+
+        for prepared in items:
+            await self.__loop.run_in_executor(self.__executor, handler, prepared)
+
+    @staticmethod
+    def __prepare(prepare, key, items):
+        """
+        Prepare items (runs in executor)
+
+        :return dict: {device ID: prepared items}
+        """
+
+        groups = dict()
+        try:
+            for item in prepare(items):
+                groups.setdefault(key(item), []).append(item)
+        except Exception as ex:
+            logging.exception("Failed to prepare %d item(s): %s", len(items), ex)
+        return groups
+
+    async def __collect(self, source):
+        """
+        Collect batch of items
+
+        :param AsyncQueue source: Queue to get items from
+        :return list: Items
+        """
+
+        batch = [await source.get()]
+        batch_size = max(1, self._config.inbound_batch_size)
+        deadline = self.__loop.time() + self._config.inbound_batch_window
+        while len(batch) < batch_size:
+            remaining = deadline - self.__loop.time()
+            try:
+                if remaining > 0:
+                    batch.append(await asyncio.wait_for(source.get(), remaining))
+                else:
+                    batch.append(source.get_nowait())
+            except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                break
+        return batch
+
+    async def __publish(self):
+        """
+        Publish items of the ready to send queue
+        """
+
+        while True:
+            item = await self._ready_to_send_queue.get()
+            try:
+                await self.__loop.run_in_executor(self.__executor, self._connection.publish_item, item)
+            except Exception as ex:
+                logging.exception("Failed to publish item: %s", ex)
+
+    async def __keepalive(self):
+        """
+        Run keepalive sweeps
+        """
+
+        while True:
+            await asyncio.sleep(self._keepalive_manager.PERIOD)
+            try:
+                await self.__loop.run_in_executor(self.__executor, self._keepalive_manager.sweep)
+            except Exception as ex:
+                logging.exception("Keepalive sweep failed: %s", ex)
@@ -2,14 +2,16 @@
 Uhost main module
 """
 
-import _thread
 import hashlib
-import json
 import logging
-import queue
+import threading
 import time
 import os
 from .utilities import process_inbound_item, signature, srp, process_outbound_item, uhost_connection, keepalive_manager
+from .utilities.worker_pool import WorkerPool
+from .utilities.srp_executor import SrpExecutor
+from .utilities.shedding_queue import LoadShedder, SheddingQueue
+from .utilities.message_class import MessageClass
 from .utilities.database_connection import DataBaseConnection
 from .utilities.config import Config
 from .utilities.exceptions import UtimInitializationError
@@ -28,40 +30,97 @@ class Uhost(object):
         # Check master key
         self.__get_master_key()
 
-        self.__config = Config()
+        self._config = Config()
 
-        self.__name = bytes.fromhex(self.__config.uhost_name)
+        self.__name = bytes.fromhex(self._config.uhost_name)
 
-        # Inbound queue
-        self.__inbound_queue = queue.Queue()
+        # Inbound queue (handshake frames are got ahead of the backlog), partition per worker
+        self._inbound_queue = self._create_queue('inbound', self._config.inbound_queue_size,
+                                                 MessageClass.of_frame_item, self._priority_weights(),
+                                                 self._config.inbound_workers)
 
-        # Outbound queue
-        self.__outbound_queue = queue.Queue()
+        # Outbound queue, partition per worker
+        self._outbound_queue = self._create_queue('outbound', self._config.outbound_queue_size,
+                                                  MessageClass.of_payload_item,
+                                                  partitions=self._config.outbound_workers)
+
+        # Ready to send queue
+        self._ready_to_send_queue = self._create_queue('ready to send', self._config.send_queue_size,
+                                                       MessageClass.of_frame_item)
 
         # Database connection
         self.database = DataBaseConnection(init_db=True)
 
         # MQTT connection
-        self.__connection = uhost_connection.UhostConnection('mqtt', self.__inbound_queue)
+        self._connection = uhost_connection.UhostConnection('mqtt', self._inbound_queue,
+                                                            self._ready_to_send_queue)
 
         # Keepaliver
-        self.__keepalive_manager = keepalive_manager.KeepaliveManager(self.__outbound_queue)
+        self._keepalive_manager = keepalive_manager.KeepaliveManager(self._outbound_queue)
 
         # Running main loop flag
-        self.__running = False
+        self._running = False
+
+        # SRP computations
+        self.srp_executor = SrpExecutor(self._config.srp_processes, self._config.srp_ephemerals)
 
-        # SRP client sessions
-        self.__sessions = []
+        # SRP client sessions by utim name
+        self.__sessions = dict()
+        self.__sessions_lock = threading.Lock()
 
         # Process Items
-        self.__item_process = process_inbound_item.ProcessInboundItem(
-            self, self.__inbound_queue, self.__outbound_queue
+        self._item_process = process_inbound_item.ProcessInboundItem(
+            self, self._inbound_queue, self._outbound_queue
         )
 
-        self.__out_process = process_outbound_item.ProcessOutboundItem(
-            self, self.__outbound_queue, self.__connection.outbound_queue
+        self._out_process = process_outbound_item.ProcessOutboundItem(
+            self, self._outbound_queue, self._ready_to_send_queue
         )
 
+        # Worker pools
+        self.__item_pool = WorkerPool('inbound', self._inbound_queue, self._item_process.dispatch,
+                                      prepare=self._item_process.open_frames,
+                                      classify=self._item_process.frame_class,
+                                      key=self._item_process.frame_key,
+                                      weights=self._priority_weights(),
+                                      batch_size=self._config.inbound_batch_size,
+                                      batch_window=self._config.inbound_batch_window)
+        self.__out_pool = WorkerPool('outbound', self._outbound_queue, self._out_process.process)
+
+    def _create_queue(self, name, maxsize, classify, weights=None, partitions=1):
+        """
+        Create queue of the pipeline
+
+        :param str name: Queue name
+        :param int maxsize: Queue capacity (0 - unbounded)
+        :param classify: Callable to get MessageClass of item
+        :param dict weights: PriorityScheduler weights (None - arrival order)
+        :param int partitions: Number of worker partitions
+        """
+
+        shedder = LoadShedder(name, self._config.queue_policy, classify)
+        return SheddingQueue(maxsize, shedder, self._config.queue_block_timeout, weights, partitions)
+
+    def _priority_weights(self):
+        """
+        Get PriorityScheduler weights of inbound messages
+
+        :return dict: {message class: items per round}
+        """
+
+        classes = [MessageClass.HANDSHAKE, MessageClass.CONTROL, MessageClass.DATA, MessageClass.KEEPALIVE]
+        return dict(zip(classes, self._config.priority_weights))
+
+    def get_queue_drops(self):
+        """
+        Get number of items dropped by full queues
+
+        :return dict: {queue name: {message class name: number}}
+        """
+
+        return {item_queue.shedder.name: item_queue.shedder.drops
+                for item_queue in (self._inbound_queue, self._outbound_queue, self._ready_to_send_queue)}
+
     @staticmethod
     def __get_master_key():
         """
@@ -81,77 +140,112 @@ class Uhost(object):
         Get SRP session
         """
 
-        session = None
+        if utim_name is None:
+            return None
+
+        with self.__sessions_lock:
+            session = self.__sessions.get(utim_name)
+        if session is not None:
+            return session
 
-        if utim_name is not None:
-            session = next((item for item in self.__sessions if item['utimname'] == utim_name),
-                           None)
+        # Get salt, vkey stored at provisioning (created with verifier when offloaded),
+        # database and SRP computations do not hold sessions of other utims
+        salt, vkey = self.database.get_srp_verifier(utim_name, self.srp_key_id())
+        if (salt is None or vkey is None) and not self.srp_executor.offloaded:
+            salt, vkey = self.__create_srp_verification_key(utim_name)
+            self.set_srp_verifier(utim_name, salt, vkey)
 
-            if session is None:
-                # Remove old sessions of the utim_name
-                self.remove_srp_session(utim_name)
+        # Create session
+        session = {
+            'utimname': utim_name,
+            'salt': salt,
+            'vkey': vkey,
+            'A': None,
+            'svr': None,
+            'test_data': b'testovaya_stroka',  # TODO: os.urandom(32),
+            'platform_verified': False
+        }
 
-                # Get salt, vkey from SRP
-                username = bytes.fromhex(utim_name)
-                password = self.__get_master_key()
-                logging.debug("Username: %s", [x for x in username])
-                logging.debug("Password: %s", [x for x in password])
-                salt, vkey = srp.create_salted_verification_key(username, password)
+        # Save server session with the utim name (utim_name) unless it was saved meanwhile
+        with self.__sessions_lock:
+            return self.__sessions.setdefault(utim_name, session)
 
-                # Create session
-                session = {
-                    'utimname': utim_name,
-                    'salt': salt,
-                    'vkey': vkey,
-                    'A': None,
-                    'svr': None,
-                    'test_data': b'testovaya_stroka',  # TODO: os.urandom(32),
-                    'platform_verified': False
-                }
+    def __create_srp_verification_key(self, utim_name):
+        """
+        Create SRP salt and verification key of Utim
 
-                # Save server session with the utim name (utim_name)
-                self.__sessions.append(session)
+        :param str utim_name: Utim name
+        :return: (salt, vkey)
+        """
 
-        return session
+        username = bytes.fromhex(utim_name)
+        password = self.__get_master_key()
+        logging.debug("Username: %s", [x for x in username])
+        logging.debug("Password: %s", [x for x in password])
+        return srp.create_salted_verification_key(username, password)
 
-    def set_srp_session(self, utim_name, session):
+    @classmethod
+    def srp_key_id(cls):
         """
-        Set SRP session
+        Get ID of master key, it is stored with SRP verification keys derived from the key
+
+        :return bytes: Key ID
         """
 
-        # Remove old sessions of the utim_name
-        self.remove_srp_session(utim_name)
+        return hashlib.sha256(b'uhost srp key id' + cls.__get_master_key()).digest()[:8]
 
-        # Add new session
-        self.__sessions.append(session)
+    def set_srp_verifier(self, utim_name, salt, vkey):
+        """
+        Store SRP salt and verification key of Utim derived from current master key
 
-    def remove_srp_session(self, utim_name):
+        :param str utim_name: Utim name
+        :param bytes salt: Salt
+        :param bytes vkey: Verification key
         """
-        Remove SRP session
+
+        self.database.set_srp_verifier(utim_name, salt, vkey, self.srp_key_id())
+
+    def add_utim(self, utim_name):
         """
+        Provision Utim, its SRP salt and verification key are created once and stored
 
-        # Remove session of the utim_name
-        self.__sessions[:] = [d for d in self.__sessions if d.get('utimname') != utim_name]
+        :param str utim_name: Utim name
+        """
 
-    def __process_item(self):
+        salt, vkey = self.__create_srp_verification_key(utim_name)
+        self.database.add_utim(utim_name, salt, vkey, self.srp_key_id())
+
+    def create_srp_verifier(self, utim_name, salt, vkey, bytes_A):
         """
-        Process UHOST data
+        Create SRP verifier (in worker process if SRP computations are offloaded)
+
+        :param str utim_name: Utim name
+        :param bytes salt: Salt or None to create new one (caller stores it then)
+        :param bytes vkey: Verification key or None to create new one (caller stores it then)
+        :param bytes bytes_A: Public ephemeral value of Utim
+        :return Future: Future of (salt, vkey, srp.Verifier)
         """
 
-        while self.__running:
-            if not self.__item_process.is_queue_empty():
-                data = self.__item_process.pull_single_item()
-                self.__item_process.run_worker(data)
+        return self.srp_executor.submit_verifier(bytes.fromhex(utim_name), self.__get_master_key(),
+                                                 salt, vkey, bytes_A)
 
-    def __process_out(self):
+    def set_srp_session(self, utim_name, session):
         """
-        Process out data
+        Set SRP session
         """
 
-        while self.__running:
-            if not self.__out_process.is_queue_empty():
-                data = self.__out_process.pull_single_item()
-                self.__out_process.process(data)
+        with self.__sessions_lock:
+            # Replace old session of the utim_name
+            self.__sessions[utim_name] = session
+
+    def remove_srp_session(self, utim_name):
+        """
+        Remove SRP session
+        """
+
+        # Remove session of the utim_name
+        with self.__sessions_lock:
+            self.__sessions.pop(utim_name, None)
 
     def run(self):
         """
@@ -159,28 +253,28 @@ class Uhost(object):
         """
 
         # Run main loop
-        self.__running = True
+        self._running = True
 
         # Run UHost MQTT
-        self.__connection.run()
+        self._connection.run()
 
         # Run keepaliver
-        self.__keepalive_manager.run()
+        self._keepalive_manager.run()
 
-        # Run thread for item processing
-        _thread.start_new_thread(self.__process_item, ())
+        # Run workers for item processing
+        self.__item_pool.run()
 
-        # Run thread for out processin
-        _thread.start_new_thread(self.__process_out, ())
+        # Run workers for out processing
+        self.__out_pool.run()
 
         logging.info("Uhost \'%s\' works!", self.__name)
 
-        self.__generate_utim_config()
+        self._generate_utim_config()
 
-        while self.__running:
+        while self._running:
             time.sleep(1)
 
-    def __generate_utim_config(self):
+    def _generate_utim_config(self):
         """
         Generate Utim config file
         """
@@ -201,12 +295,12 @@ class Uhost(object):
         
         ########################################################
         """.format(
-            uhost_name=self.__config.uhost_name,
+            uhost_name=self._config.uhost_name,
             mk=self.__get_master_key().hex(),
-            protocol=self.__config.uhost_messaging_protocol,
-            msg_host=self.__config.messaging_hostname,
-            msg_user=self.__config.messaging_username,
-            msg_pass=self.__config.messaging_password
+            protocol=self._config.uhost_messaging_protocol,
+            msg_host=self._config.messaging_hostname,
+            msg_user=self._config.messaging_username,
+            msg_pass=self._config.messaging_password
         ))
 
     def stop(self):
@@ -215,10 +309,18 @@ class Uhost(object):
         """
 
         # Stop main loop
-        self.__running = False
+        self._running = False
+
+        # Stop workers
+        self.__item_pool.stop()
+        self.__out_pool.stop()
+        self.srp_executor.shutdown()
 
         # Stop serial exchange
-        self.__connection.disconnect()
+        self._connection.disconnect()
+
+        # Write buffered database updates
+        self.database.flush()
 
     def get_session_key(self, utim_name):
         """
@@ -292,10 +394,15 @@ class Uhost(object):
         """
         self.database.set_status(devid, status)
 
+    def save_dev_transition(self, devid, **changes):
+        """
+        Save all device state changes of a handshake step at once
+
+        :param str devid: Device ID
+        :param changes: status (Status), keep_alive_counter, config_hash, session_key
+        """
+        self.database.transition(devid, **changes)
+
     @staticmethod
     def config_hash(config):
-        if config is None or config.get('type') is None:
-            return 'nothing'
-        sha = hashlib.sha256()
-        sha.update(json.dumps(config).encode())
-        return sha.digest().hex()
+        return DataBaseConnection.config_hash(config)
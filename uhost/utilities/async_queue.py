@@ -0,0 +1,135 @@
+"""
+Async queue module
+
+asyncio queue which keeps the synchronous put() used by workers and transports
+"""
+
+import asyncio
+import collections
+import logging
+from .deferred_call import DeferredCall
+from .priority_scheduler import PriorityScheduler
+from .shedding_queue import ClassQueue, LoadShedder
+
+
+class AsyncQueue(object):
+    """
+    Async queue class
+
+    Items can be put from any thread (workers, transport callbacks) and are
+    consumed by coroutines of the event loop the queue is bound to. A bounded
+    queue sheds load with its LoadShedder when it is full (block policy is
+    treated as reject_newest: producers are never blocked). Items are got in
+    arrival order, or in PriorityScheduler order of their classes if weights
+    are set, items of one device keep their order. Deferred calls are got first and never dropped (see ClassQueue).
+    """
+
+    def __init__(self, maxsize=0, shedder=None, weights=None, key=None):
+        """
+        Initialization
+
+        :param int maxsize: Queue capacity (0 - unbounded)
+        :param LoadShedder shedder: Load shedding policy
+        :param dict weights: PriorityScheduler weights (None - arrival order)
+        :param key: Callable to get device ID of item, items of one device keep their order (item[0] by default)
+        """
+
+        self.maxsize = maxsize
+        self.shedder = shedder if shedder is not None else LoadShedder('queue')
+        self.__key = key if key is not None else ClassQueue.default_key
+        self.__loop = None
+        self.__items = PriorityScheduler(weights)
+        self.__calls = collections.deque()
+        self.__ordered = weights is not None
+        self.__not_empty = None
+
+    def bind(self, loop):
+        """
+        Bind queue to event loop
+
+        :param loop: Event loop running consumers of the queue
+        """
+
+        self.__loop = loop
+        self.__not_empty = asyncio.Event()
+        if self.__items or self.__calls:
+            self.__not_empty.set()
+
+    def put(self, item, block=True, timeout=None):
+        """
+        Put item (thread-safe, never blocks)
+
+        :param item: Item to put
+        """
+
+        if self.__loop is None:
+            self.__append(item)
+        else:
+            self.__loop.call_soon_threadsafe(self.__append, item)
+
+    def __append(self, item):
+        """
+        Append item, shed load if queue is full
+        """
+
+        if isinstance(item, DeferredCall):
+            self.__calls.append(item)
+        elif 0 < self.maxsize <= self.qsize() and not self.shedder.shed(self.__items, item):
+            logging.debug("Item is rejected by full queue")
+            return
+        else:
+            self.__items.put(self.shedder.classify(item), item, self.__key_of(item))
+        if self.__not_empty is not None:
+            self.__not_empty.set()
+
+    def __key_of(self, item):
+        """
+        Get device ID of item, None if item has no device ID
+        """
+
+        try:
+            return self.__key(item)
+        except (IndexError, KeyError, TypeError):
+            return None
+
+    async def get(self):
+        """
+        Get item
+        """
+
+        while not self.__items and not self.__calls:
+            self.__not_empty.clear()
+            await self.__not_empty.wait()
+        return self.__pop()
+
+    def get_nowait(self):
+        """
+        Get item if it is available, raise asyncio.QueueEmpty otherwise
+        """
+
+        if not self.__items and not self.__calls:
+            raise asyncio.QueueEmpty
+        return self.__pop()
+
+    def __pop(self):
+        """
+        Pop next item
+        """
+
+        if self.__calls:
+            return self.__calls.popleft()
+        return self.__items.pop() if self.__ordered else self.__items.pop_oldest()
+
+    def empty(self):
+        """
+        Check queue is empty or not
+        """
+
+        return self.__items.empty() and not self.__calls
+
+    def qsize(self):
+        """
+        Get number of items in queue
+        """
+
+        return len(self.__items) + len(self.__calls)
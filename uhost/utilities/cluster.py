@@ -0,0 +1,73 @@
+"""
+Cluster module
+
+Several Uhost nodes share one Uhost topic, devices are pinned to nodes by consistent hashing
+"""
+
+from . import config
+from .hash_ring import HashRing
+
+
+class Cluster(object):
+    """
+    Cluster membership class
+
+    Without [CLUSTER] section in config the Uhost is a single node owning every device.
+    """
+
+    def __init__(self):
+        """
+        Initialization
+        """
+
+        self.__config = config.Config()
+        self.__node_id = self.__config.cluster_node_id
+        self.__ring = None
+        if self.enabled:
+            self.__ring = HashRing(self.__config.cluster_nodes, self.__config.cluster_replicas)
+
+    @property
+    def enabled(self):
+        return self.__node_id is not None
+
+    @property
+    def node_id(self):
+        return self.__node_id
+
+    def node_for(self, devid):
+        """
+        Get node owning the device
+
+        :param devid: Device ID (str or bytes)
+        :return str: Node ID or None if clustering is disabled
+        """
+
+        if not self.enabled:
+            return None
+        return self.__ring.node_for(devid)
+
+    def owns(self, devid):
+        """
+        Check the device is pinned to this node
+
+        :param devid: Device ID (str or bytes)
+        :return bool:
+        """
+
+        return not self.enabled or self.__ring.node_for(devid) == self.__node_id
+
+    def shared_topic(self, topic):
+        """
+        Get shared subscription topic for Uhost topic
+        """
+
+        if not self.enabled:
+            return topic
+        return '$share/{group}/{topic}'.format(group=self.__config.cluster_share_group, topic=topic)
+
+    def node_topic(self, topic, node_id=None):
+        """
+        Get topic of the node for messages forwarded by other nodes
+        """
+
+        return '{topic}/{node}'.format(topic=topic, node=node_id if node_id is not None else self.__node_id)
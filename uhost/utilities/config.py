@@ -29,13 +29,68 @@ class Config(object):
             self.__messaging_username = self.parser[self.uhost_messaging_protocol]['username']
             self.__messaging_password = self.parser[self.uhost_messaging_protocol]['password']
             self.__messaging_reconnect_time = self.parser[self.uhost_messaging_protocol]['reconnect_time']
-            self.__db_hostname = self.parser['MYSQLDB']['hostname']
-            self.__db_username = self.parser['MYSQLDB']['username']
-            self.__db_password = self.parser['MYSQLDB']['password']
+            self.__storage = self.parser['UHOST'].get('storage', 'MYSQLDB').upper()
+            self.__db_hostname = self.parser.get('MYSQLDB', 'hostname', fallback=None)
+            self.__db_username = self.parser.get('MYSQLDB', 'username', fallback=None)
+            self.__db_password = self.parser.get('MYSQLDB', 'password', fallback=None)
+            self.__sqlite_path = self.parser.get('SQLITE', 'path', fallback=None)
+            self.__db_pool_size = self.parser.getint('MYSQLDB', 'pool_size', fallback=10)
+            self.__db_pool_recycle = self.parser.getfloat('MYSQLDB', 'pool_recycle', fallback=3600)
+            self.__db_pool_timeout = self.parser.getfloat('MYSQLDB', 'pool_timeout', fallback=5)
+            self.__db_pool_ping_interval = self.parser.getfloat('MYSQLDB', 'pool_ping_interval', fallback=30)
+            self.__db_replicas = [host.strip() for host in
+                                  self.parser.get('MYSQLDB', 'replicas', fallback='').split(',') if host.strip()]
+            self.__db_read_your_writes = self.parser.getfloat('MYSQLDB', 'read_your_writes', fallback=2)
+            self.__db_shards = [host.strip() for host in
+                                self.parser.get('MYSQLDB', 'shards', fallback='').split(',') if host.strip()]
+            self.__write_behind_interval = self.parser.getint(self.__storage, 'write_behind_interval',
+                                                              fallback=0) / 1000.0
+            self.__write_behind_size = self.parser.getint(self.__storage, 'write_behind_size', fallback=1000)
+            self.__inbound_workers = self.parser['UHOST'].getint('inbound_workers', 1)
+            self.__outbound_workers = self.parser['UHOST'].getint('outbound_workers', 1)
+            self.__async_concurrency = max(1, self.parser['UHOST'].getint('async_concurrency', 16))
+            self.__srp_processes = self.parser['UHOST'].getint('srp_processes', 0)
+            self.__srp_ephemerals = self.parser['UHOST'].getint('srp_ephemerals', 64)
+            self.__inbound_batch_size = self.parser['UHOST'].getint('inbound_batch_size', 64)
+            self.__inbound_batch_window = self.parser['UHOST'].getint('inbound_batch_window', 0) / 1000.0
+            self.__priority_weights = [int(weight) for weight in
+                                       self.parser['UHOST'].get('priority_weights', '8, 4, 2, 1').split(',')]
+            self.__inbound_queue_size = self.parser.getint('QUEUES', 'inbound_size', fallback=0)
+            self.__outbound_queue_size = self.parser.getint('QUEUES', 'outbound_size', fallback=0)
+            self.__send_queue_size = self.parser.getint('QUEUES', 'send_size', fallback=0)
+            self.__queue_policy = self.parser.get('QUEUES', 'policy', fallback='drop_oldest')
+            self.__queue_block_timeout = self.parser.getfloat('QUEUES', 'block_timeout', fallback=1.0)
+            self.__devices_refresh = self.parser.getfloat('CACHE', 'devices_refresh', fallback=300)
+            self.__devices_negative_ttl = self.parser.getfloat('CACHE', 'devices_negative_ttl', fallback=30)
+            self.__session_keys_size = self.parser.getint('CACHE', 'session_keys_size', fallback=10000)
+            self.__session_keys_ttl = self.parser.getfloat('CACHE', 'session_keys_ttl', fallback=60)
+            self.__configurations_size = self.parser.getint('CACHE', 'configurations_size', fallback=1000)
+            self.__configurations_ttl = self.parser.getfloat('CACHE', 'configurations_ttl', fallback=60)
+            self.__srp_verifiers_size = self.parser.getint('CACHE', 'srp_verifiers_size', fallback=10000)
+            self.__srp_verifiers_ttl = self.parser.getfloat('CACHE', 'srp_verifiers_ttl', fallback=600)
+            self.__cluster_node_id = self.parser.get('CLUSTER', 'node_id', fallback=None)
+            self.__cluster_nodes = [node.strip() for node in
+                                    self.parser.get('CLUSTER', 'nodes', fallback='').split(',') if node.strip()]
+            self.__cluster_share_group = self.parser.get('CLUSTER', 'share_group', fallback='uhost')
+            self.__cluster_replicas = self.parser.getint('CLUSTER', 'replicas', fallback=100)
 
-        except KeyError:
+        except (KeyError, ValueError):
             raise ConfigException
 
+        if self.__storage not in ('MYSQLDB', 'SQLITE'):
+            raise ConfigException
+        if self.__storage == 'MYSQLDB' and None in (self.__db_username, self.__db_password):
+            raise ConfigException
+        if self.__storage == 'MYSQLDB' and self.__db_hostname is None and not self.__db_shards:
+            raise ConfigException
+        if self.__db_shards and self.__db_replicas:
+            raise ConfigException('MYSQLDB replicas are not supported together with shards')
+
+        if self.__cluster_node_id is not None and self.__cluster_node_id not in self.__cluster_nodes:
+            raise ConfigException
+        if self.__cluster_node_id is not None and self.__uhost_messaging_protocol != 'MQTT':
+            raise ConfigException('CLUSTER is supported with MQTT messaging protocol only')
+
     @property
     def uhost_name(self):
         return self.__uhost_name
@@ -60,6 +115,14 @@ class Config(object):
     def messaging_reconnect_time(self):
         return self.__messaging_reconnect_time
 
+    @property
+    def storage(self):
+        return self.__storage
+
+    @property
+    def sqlite_path(self):
+        return self.__sqlite_path
+
     @property
     def db_hostname(self):
         return self.__db_hostname
@@ -71,3 +134,139 @@ class Config(object):
     @property
     def db_password(self):
         return self.__db_password
+
+    @property
+    def db_pool_size(self):
+        return self.__db_pool_size
+
+    @property
+    def db_pool_recycle(self):
+        return self.__db_pool_recycle
+
+    @property
+    def db_pool_timeout(self):
+        return self.__db_pool_timeout
+
+    @property
+    def db_pool_ping_interval(self):
+        return self.__db_pool_ping_interval
+
+    @property
+    def db_replicas(self):
+        return self.__db_replicas
+
+    @property
+    def db_read_your_writes(self):
+        return self.__db_read_your_writes
+
+    @property
+    def db_shards(self):
+        return self.__db_shards
+
+    @property
+    def write_behind_interval(self):
+        return self.__write_behind_interval
+
+    @property
+    def write_behind_size(self):
+        return self.__write_behind_size
+
+    @property
+    def inbound_workers(self):
+        return self.__inbound_workers
+
+    @property
+    def outbound_workers(self):
+        return self.__outbound_workers
+
+    @property
+    def async_concurrency(self):
+        return self.__async_concurrency
+
+    @property
+    def srp_processes(self):
+        return self.__srp_processes
+
+    @property
+    def srp_ephemerals(self):
+        return self.__srp_ephemerals
+
+    @property
+    def inbound_batch_size(self):
+        return self.__inbound_batch_size
+
+    @property
+    def inbound_batch_window(self):
+        return self.__inbound_batch_window
+
+    @property
+    def priority_weights(self):
+        return self.__priority_weights
+
+    @property
+    def inbound_queue_size(self):
+        return self.__inbound_queue_size
+
+    @property
+    def outbound_queue_size(self):
+        return self.__outbound_queue_size
+
+    @property
+    def send_queue_size(self):
+        return self.__send_queue_size
+
+    @property
+    def queue_policy(self):
+        return self.__queue_policy
+
+    @property
+    def queue_block_timeout(self):
+        return self.__queue_block_timeout
+
+    @property
+    def devices_refresh(self):
+        return self.__devices_refresh
+
+    @property
+    def devices_negative_ttl(self):
+        return self.__devices_negative_ttl
+
+    @property
+    def session_keys_size(self):
+        return self.__session_keys_size
+
+    @property
+    def session_keys_ttl(self):
+        return self.__session_keys_ttl
+
+    @property
+    def configurations_size(self):
+        return self.__configurations_size
+
+    @property
+    def configurations_ttl(self):
+        return self.__configurations_ttl
+
+    @property
+    def srp_verifiers_size(self):
+        return self.__srp_verifiers_size
+
+    @property
+    def srp_verifiers_ttl(self):
+        return self.__srp_verifiers_ttl
+
+    @property
+    def cluster_node_id(self):
+        return self.__cluster_node_id
+
+    @property
+    def cluster_nodes(self):
+        return self.__cluster_nodes
+
+    @property
+    def cluster_share_group(self):
+        return self.__cluster_share_group
+
+    @property
+    def cluster_replicas(self):
+        return self.__cluster_replicas
@@ -0,0 +1,243 @@
+"""
+Connection pool module
+
+Thread-safe pool of persistent MySQL connections
+"""
+
+import collections
+import contextlib
+import logging
+import threading
+import time
+import mysql.connector
+
+
+class ConnectionPoolException(Exception):
+    """
+    Connection pool exception
+
+    The exception is raised when:
+     * no connection was released during the wait timeout
+    """
+
+    pass
+
+
+class PooledConnection(object):
+    """
+    Pooled connection class
+
+    Keeps server-side prepared statements of the connection: every SQL text gets
+    its own prepared cursor, so repeated statements are parsed by the server once.
+    """
+
+    MAX_STATEMENTS = 64  # Prepared statements kept per connection
+
+    def __init__(self, connection):
+        """
+        Initialization
+
+        :param connection: MySQL connection
+        """
+
+        self.connection = connection
+        self.created = time.monotonic()
+        self.last_used = self.created
+        self.__statements = collections.OrderedDict()
+
+    def execute(self, sql, params=None):
+        """
+        Execute prepared statement
+
+        :param str sql: SQL with %s placeholders
+        :param params: Bound parameters
+        :return: Fetched rows or None if statement returns no rows
+        """
+
+        cursor = self.__statements.get(sql)
+        if cursor is None:
+            cursor = self.connection.cursor(prepared=True)
+            self.__statements[sql] = cursor
+            if len(self.__statements) > self.MAX_STATEMENTS:
+                self.__statements.popitem(last=False)[1].close()
+        else:
+            self.__statements.move_to_end(sql)
+
+        cursor.execute(sql, params)
+        fetch = None
+        if cursor.with_rows:
+            fetch = cursor.fetchall()
+        return fetch
+
+    def close(self):
+        """
+        Close statements and connection quietly
+        """
+
+        try:
+            for cursor in self.__statements.values():
+                cursor.close()
+            self.__statements.clear()
+            self.connection.close()
+        except mysql.connector.Error as er:
+            logging.debug(er)
+
+
+class ConnectionPool(object):
+    """
+    Connection pool class
+
+    Connections are opened on demand up to the pool size and kept open between
+    queries. A connection idle for longer than ping_interval is checked before
+    use, a connection older than recycle seconds is closed and opened again.
+    Network I/O (check, connect, close) runs outside of the pool lock.
+    """
+
+    __shared = dict()
+    __shared_lock = threading.Lock()
+
+    def __init__(self, size=10, recycle=3600, timeout=5, ping_interval=30, **connect_args):
+        """
+        Initialization
+
+        :param int size: Max number of open connections
+        :param float recycle: Max age of connection in seconds (0 - unlimited)
+        :param float timeout: Seconds to wait for free connection
+        :param float ping_interval: Idle seconds after which connection is checked before use
+        :param connect_args: Arguments of mysql.connector.connect
+        """
+
+        self.__size = max(1, int(size))
+        self.__recycle = recycle
+        self.__timeout = timeout
+        self.__ping_interval = ping_interval
+        self.__connect_args = connect_args
+        self.__idle = []  # PooledConnection, most recently used last
+        self.__opened = 0
+        self.__condition = threading.Condition()
+
+    @classmethod
+    def shared(cls, size=10, recycle=3600, timeout=5, ping_interval=30, **connect_args):
+        """
+        Get pool shared by every user of the same database
+
+        :return ConnectionPool:
+        """
+
+        key = tuple(sorted(connect_args.items()))
+        with cls.__shared_lock:
+            pool = cls.__shared.get(key)
+            if pool is None:
+                pool = cls(size, recycle, timeout, ping_interval, **connect_args)
+                cls.__shared[key] = pool
+            return pool
+
+    def __open(self):
+        """
+        Open new connection
+        """
+
+        connection = mysql.connector.connect(**self.__connect_args)
+        connection.autocommit = True
+        return PooledConnection(connection)
+
+    def __healthy(self, entry):
+        """
+        Check idle connection before use
+        """
+
+        now = time.monotonic()
+        if self.__recycle and now - entry.created > self.__recycle:
+            return False
+        if now - entry.last_used > self.__ping_interval:
+            try:
+                entry.connection.ping(reconnect=False)
+            except mysql.connector.Error as er:
+                logging.debug(er)
+                return False
+        return True
+
+    def acquire(self):
+        """
+        Get connection from pool
+
+        :return PooledConnection:
+        :raise: ConnectionPoolException, mysql.connector.Error
+        """
+
+        deadline = time.monotonic() + self.__timeout
+        entry = None
+        with self.__condition:
+            while True:
+                if self.__idle:
+                    entry = self.__idle.pop()
+                    break
+
+                if self.__opened < self.__size:
+                    self.__opened += 1
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise ConnectionPoolException('No free connection in {} seconds'.format(self.__timeout))
+                self.__condition.wait(remaining)
+
+        # Check and reconnect without the lock (they may wait for the server), the slot is kept meanwhile
+        if entry is not None:
+            if self.__healthy(entry):
+                return entry
+            entry.close()
+
+        try:
+            return self.__open()
+        except Exception:
+            with self.__condition:
+                self.__opened -= 1
+                self.__condition.notify()
+            raise
+
+    def release(self, entry, broken=False):
+        """
+        Return connection to pool
+
+        :param PooledConnection entry: Connection got by acquire()
+        :param bool broken: Close connection instead of reusing it
+        """
+
+        if broken:
+            entry.close()
+        with self.__condition:
+            if broken:
+                self.__opened -= 1
+            else:
+                entry.last_used = time.monotonic()
+                self.__idle.append(entry)
+            self.__condition.notify()
+
+    @contextlib.contextmanager
+    def connection(self):
+        """
+        Context manager of pooled connection
+
+        Connection is closed instead of reused if the block raises an exception.
+        """
+
+        entry = self.acquire()
+        try:
+            yield entry
+        except Exception:
+            self.release(entry, broken=True)
+            raise
+        self.release(entry)
+
+    def close(self):
+        """
+        Close idle connections
+        """
+
+        with self.__condition:
+            idle, self.__idle = self.__idle, []
+            self.__opened -= len(idle)
+            self.__condition.notify_all()
+        for entry in idle:
+            entry.close()
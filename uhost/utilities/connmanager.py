@@ -36,18 +36,22 @@ class ConnManager(object):
         logging.info('Disconnecting...')
         self.__connection.disconnect()
 
-    def subscribe(self, topic, callback_object, callback):
+    def subscribe(self, topic, callback_object, callback, route=None):
         """
         Subscribe on topic
 
         :param str topic: Topic for subscription
         :param object callback_object: Object with callback method
         :param method callback: Callback for received message
+        :param route: Callable returning topic of the node owning the sender (MQTT only)
         """
         logging.info("Subscribing for {0}".format(topic))
         self.__callback_object = callback_object
         self.__callback = callback
-        self.__connection.subscribe(topic, self, ConnManager._on_message)
+        if route is None:
+            self.__connection.subscribe(topic, self, ConnManager._on_message)
+        else:
+            self.__connection.subscribe(topic, self, ConnManager._on_message, route)
 
     def unsubscribe(self, topic):
         """
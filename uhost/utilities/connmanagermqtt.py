@@ -12,6 +12,10 @@ class ConnManagerMQTT(object):
     UconnMQTT wrapper that guarantee delivery to addressee
     """
 
+    _TYPE_MESSAGE = b'\x01'
+    _TYPE_ACK = b'\x02'
+    _TYPE_FORWARD = b'\x03'  # Message forwarded between Uhost nodes, acknowledged by the owning node
+
     _SENDER = 'sender'
     _DESTINATION = 'destination'
     _MESSAGE = 'message'
@@ -26,6 +30,7 @@ class ConnManagerMQTT(object):
         self.__sent_messages = dict()
         self.__callback = None
         self.__callback_object = None
+        self.__route = None
 
     def disconnect(self):
         """
@@ -34,18 +39,20 @@ class ConnManagerMQTT(object):
         logging.info('Disconnecting...')
         self.__connection.disconnect()
 
-    def subscribe(self, topic, callback_object, callback):
+    def subscribe(self, topic, callback_object, callback, route=None):
         """
         Subscribe on topic
 
         :param str topic: Topic for subscription
         :param method callback: Callback for received message
+        :param route: Callable returning topic of the node owning the sender (None - this node owns it)
         """
         logging.info("Subscribing for {0}".format(topic))
         if not callable(callback):
             raise exceptions.UtimUncallableCallbackError
         self.__callback = callback
         self.__callback_object = callback_object
+        self.__route = route
         self.__connection.subscribe(topic, self, ConnManagerMQTT._on_message)
 
     def unsubscribe(self, topic):
@@ -67,7 +74,7 @@ class ConnManagerMQTT(object):
         """
         id = self.__message_number
         self.__message_number = (self.__message_number + 1) % 65536
-        out_message = b'\x01' + id.to_bytes(2, 'big') + message
+        out_message = self._TYPE_MESSAGE + id.to_bytes(2, 'big') + message
         logging.info("Publishing {0} to topic {1}".format(message, destination))
         self.__connection.publish(sender, destination, out_message)
         self.__sent_messages[id] = {self._SENDER: sender,
@@ -89,7 +96,7 @@ class ConnManagerMQTT(object):
                 logging.info("Message {0} wasn\'t delivered".format(id))
                 message = self.__sent_messages[id]
                 self.__connection.publish(message[self._SENDER], message[self._DESTINATION],
-                                          b'\x01' + id.to_bytes(2, 'big') + message[self._MESSAGE])
+                                          self._TYPE_MESSAGE + id.to_bytes(2, 'big') + message[self._MESSAGE])
                 time.sleep(5)
             except KeyError:
                 logging.error("Message was already deleted from republish")
@@ -108,7 +115,11 @@ class ConnManagerMQTT(object):
         if len(message) < 3:
             logging.info('Message is too short to be something!')
         else:
-            if message[:1] == b'\x02':
+            if message[:1] == self._TYPE_FORWARD:
+                logging.info('Received message forwarded by another node, sending ack...')
+                self.__ack(sender, message[1:3])
+                self.__callback(self.__callback_object, sender, message[3:])
+            elif message[:1] == self._TYPE_ACK:
                 try:
                     logging.info('Received ack, deleting message from sent')
                     id = int.from_bytes(message[1:3], 'big')
@@ -117,7 +128,21 @@ class ConnManagerMQTT(object):
                 except KeyError:
                     logging.error("Message was already deleted from republish")
             else:
-                logging.info('Received message, sending ack...')
-                ack_message = b'\x02' + message[1:3]
-                self.__connection.publish(b'ack', sender.decode(), ack_message)
-                self.__callback(self.__callback_object, sender, message[3:])
+                destination = self.__route(sender) if self.__route is not None else None
+                if destination is not None:
+                    # Owning node acks the message, sender republishes it if the forward is lost
+                    logging.info("Forwarding message to topic {0}".format(destination))
+                    self.__connection.publish(sender, destination, self._TYPE_FORWARD + message[1:])
+                else:
+                    logging.info('Received message, sending ack...')
+                    self.__ack(sender, message[1:3])
+                    self.__callback(self.__callback_object, sender, message[3:])
+
+    def __ack(self, sender, id):
+        """
+        Acknowledge message
+
+        :param sender: Message sender
+        :param id: Message ID (2 bytes)
+        """
+        self.__connection.publish(b'ack', sender.decode(), self._TYPE_ACK + id)
@@ -1,171 +1,214 @@
 """
-MySQL database connection module
+Database connection module
 """
 
-import mysql.connector
 import datetime
+import hashlib
+import json
 import logging
 from . import config
+from .device_registry import DeviceRegistry
+from .device_state import DeviceState
+from .storage_backend import StorageBackend, open_backend
+from .ttl_cache import TtlCache
+from .write_buffer import WriteBuffer
 
 
 class DataBaseConnection(object):
-    __DB_NAME = 'udata'
-    __SUB_DB_NAME = 'subs'
-    __STATUSES_DB_NAME = 'statuses'
+    """
+    Database connection class
 
-    __MAX_TRIES = 3
+    Accessors of Utims of the Uhost, SQL runs on storage backend chosen in config (MySQL or SQLite)
+    """
 
-    __STATUSES_LIST = [
-        ['STATUS_CONFIGURING', 'Provisioning', 'Online', 'D2C protected'],
-        ['STATUS_DED', 'Disabled', 'Offline', 'Not protected'],
-        ['STATUS_DONE', 'Working', 'Online', 'D2C protected'],
-        ['STATUS_NEWBORN', 'Disabled', 'Offline', 'Not protected'],
-        ['STATUS_NO_CONFIG', 'Disabled', 'Online', 'D2C protected'],
-        ['STATUS_SRP', 'Provisioning', 'Connecting', 'Securing connection'],
-        ['STATUS_TESTING', 'Provisioning', 'Online', 'D2C protected']
+    __DB_NAME = StorageBackend.UTIMS_TABLE
+    __SUB_DB_NAME = StorageBackend.SUBS_TABLE
+    __STATUSES_DB_NAME = StorageBackend.STATUSES_TABLE
 
-    ]
+    __MAX_IN_LIST = 512  # Max values of IN list in one statement
+    __MAX_PINNED = 100000  # Max Utims which reads are pinned to primary server
+    __BUFFERED_COLUMNS = ['status', 'update_time', 'keep_alive_counter', 'config_hash']
+    __TRANSITION_COLUMNS = ['status', 'keep_alive_counter', 'config_hash', 'session_key', 'srp_salt', 'srp_vkey',
+                            'srp_key_id']
 
     def __init__(self, init_db=False):
         self.__config = config.Config()
-        self.__uhost_name = 'uhost_' + self.__config.uhost_name
-        self.__db_host = self.__config.db_hostname
-        self.__db_name = self.__config.db_username
-        self.__db_pass = self.__config.db_password
+        self.__backend = open_backend(self.__config)
+        self.__uhost_name = self.__backend.name
+
+        # Utims of one write-behind UPDATE: 3 parameters per Utim, padded to a power of two
+        self.__max_update_rows = self.__MAX_IN_LIST
+        while self.__max_update_rows > 1 and 3 * self.__max_update_rows > self.__backend.MAX_PARAMS:
+            self.__max_update_rows //= 2
 
         if init_db:
-            self.__create_db(self.__uhost_name)
-            self.__create_table(self.__uhost_name)
-            self.__insert_statuses(self.__uhost_name)
-
-    def __execute(self, sql):
-        tries = 0
-        while tries < self.__MAX_TRIES:
-            try:
-                connection = mysql.connector.connect(user=self.__db_name, password=self.__db_pass, host=self.__db_host,
-                                                     database=self.__uhost_name)
-                connection.autocommit = True
-                cursor = connection.cursor()
-                cursor.execute(sql)
-                fetch = None
-                if cursor.with_rows:
-                    fetch = cursor.fetchall()
-                cursor.close()
-                connection.disconnect()
-                return fetch
-            except mysql.connector.Error as er:
-                logging.debug(sql)
-                logging.debug(er)
-                tries = tries + 1
-                logging.debug('reconnect')
-
-    def __create_db(self, db_name):
-        connection = mysql.connector.connect(user=self.__db_name, password=self.__db_pass, host=self.__db_host)
-        connection.autocommit = True
-        sql = """CREATE DATABASE IF NOT EXISTS {db_name};""".format(db_name=db_name)
-        cursor = connection.cursor()
-        cursor.execute(sql)
-
-    def __create_table(self, db_name):
-        connection = mysql.connector.connect(user=self.__db_name, password=self.__db_pass, host=self.__db_host,
-                                             database=db_name)
-        connection.autocommit = True
-        cursor = connection.cursor()
-
-        sql = """CREATE TABLE IF NOT EXISTS {status_db_name} (
-                    complex_status CHAR(32) NOT NULL,
-                    status CHAR(32),
-                    provision CHAR(32),
-                    network CHAR(32),
-                    security CHAR(32),
-                    PRIMARY KEY (complex_status));""".format(status_db_name=self.__STATUSES_DB_NAME)
-        logging.debug(sql)
-        cursor.execute(sql)
-        sql = """CREATE TABLE IF NOT EXISTS {sub_db_name} (
-                    sub_id INT NOT NULL AUTO_INCREMENT,
-                    sub_name CHAR(64),
-                    sub_type CHAR(32),
-                    host_name CHAR(64),
-                    shared_access_key_name CHAR(32),
-                    shared_access_key CHAR(64),
-                    auth_method CHAR(32),
-                    region CHAR(32),
-                    PRIMARY KEY (sub_id));""".format(sub_db_name=self.__SUB_DB_NAME)
-        logging.debug(sql)
-        cursor.execute(sql)
-        sql = """CREATE TABLE IF NOT EXISTS {db_name} (
-                    device_id CHAR(64) NOT NULL,
-                    name CHAR(64),
-                    session_key CHAR(64),
-                    config_hash CHAR(64),
-                    keep_alive_counter INT DEFAULT 0,
-                    status CHAR(32) DEFAULT 'STATUS_NEWBORN',
-                    update_time TIMESTAMP,
-                    sub_id INT,
-                    PRIMARY KEY (device_id),
-                    FOREIGN KEY (sub_id) REFERENCES {sub_db_name}(sub_id),
-                    FOREIGN KEY (status) REFERENCES {status_db_name}(complex_status));""".format(
-            db_name=self.__DB_NAME, sub_db_name=self.__SUB_DB_NAME, status_db_name=self.__STATUSES_DB_NAME
-        )
+            self.__backend.create()
+
+        # Utims written recently, their reads go to primary server until replicas catch up
+        self.__pinned = None
+        if self.__backend.has_replicas:
+            self.__pinned = TtlCache.shared(self.__uhost_name + '/pinned', maxsize=self.__MAX_PINNED,
+                                            ttl=self.__config.db_read_your_writes)
+
+        # Utim IDs kept in memory, shared by every DataBaseConnection of the Uhost
+        self.__devices = DeviceRegistry.shared(self.__uhost_name, self.__select_utim_names, self.__select_utim,
+                                               refresh_interval=self.__config.devices_refresh,
+                                               negative_ttl=self.__config.devices_negative_ttl)
+        if init_db:
+            self.__devices.reload()
+
+        # Session keys of existing Utims, invalidated by set_session_key
+        self.__session_keys = TtlCache.shared(self.__uhost_name, maxsize=self.__config.session_keys_size,
+                                              ttl=self.__config.session_keys_ttl)
+
+        # SRP salts, verification keys and master key IDs of Utims, invalidated by set_srp_verifier
+        self.__srp_verifiers = TtlCache.shared(self.__uhost_name + '/srp', maxsize=self.__config.srp_verifiers_size,
+                                               ttl=self.__config.srp_verifiers_ttl)
+
+        # Configuration hashes of subscriptions, computed once per sub_id and recomputed after TTL
+        # (subs are changed outside of Uhost, so changes are noticed after configurations_ttl seconds)
+        self.__config_hashes = TtlCache.shared(self.__uhost_name + '/subs', maxsize=self.__config.configurations_size,
+                                               ttl=self.__config.configurations_ttl)
+
+        # Optional write-behind of status, keepalive counter and config hash
+        self.__writes = None
+        if self.__config.write_behind_interval > 0:
+            self.__writes = WriteBuffer.shared(self.__uhost_name, self.__flush_writes,
+                                               interval=self.__config.write_behind_interval,
+                                               max_pending=self.__config.write_behind_size)
+
+    def __shard(self, devids, shard):
+        """
+        Get backend keeping Utims, Utims of one statement are kept by the same shard
+        """
+        if shard is not None:
+            return shard
+        if devids:
+            return self.__backend.shard_for(devids[0])
+        return self.__backend
+
+    def __execute(self, sql, params=None, raise_error=False, devids=(), shard=None):
+        """
+        Execute statement
+        :param list devids: Utim IDs the statement changes, it runs on their shard
+        :param StorageBackend shard: Shard to run statement on
+        """
+        return self.__shard(devids, shard).execute(sql, params, raise_error)
+
+    def __read(self, sql, params=None, devids=(), shard=None):
+        """
+        Execute read-only statement on read replica unless one of Utims is written recently
+        :param list devids: Utim IDs the statement reads, it runs on their shard
+        :param StorageBackend shard: Shard to run statement on
+        """
+        replica = self.__pinned is not None and not any(self.__pinned.get(devid)[0] for devid in devids)
+        return self.__shard(devids, shard).execute(sql, params, replica=replica)
+
+    def __map_groups(self, devids, function):
+        """
+        Call function for Utims of every shard, shards are called in parallel
+        :param devids: Utim IDs
+        :param function: Callable taking list of Utim IDs kept by one shard
+        :return list: Results
+        """
+        groups = self.__backend.group(devids)
+        return self.__backend.map_shards(lambda shard: function(groups[shard]), groups)
+
+    def __pin(self, devids):
+        """
+        Pin reads of written Utims to primary server
+        """
+        if self.__pinned is not None:
+            for devid in devids:
+                self.__pinned.put(devid, True)
+
+    @staticmethod
+    def __devid(value):
+        """
+        Get Utim ID from binary column
+        """
+        if isinstance(value, (bytes, bytearray)):
+            return value.decode()
+        return value
+
+    @staticmethod
+    def __key(value):
+        """
+        Get session key from binary column
+        """
+        if value is None:
+            return None
+        return bytes(value)
+
+    @staticmethod
+    def __status_code(status):
+        """
+        Get code of status stored in database
+        """
+        return StorageBackend.STATUS_CODES[status]
+
+    @staticmethod
+    def __status_name(code):
+        """
+        Get status by code stored in database
+        """
+        return StorageBackend.STATUS_NAMES.get(code)
+
+    def add_utim(self, devid, srp_salt=None, srp_vkey=None, srp_key_id=None):
+        """
+        Add Utim
+        :param str devid: Utim ID
+        :param bytes srp_salt: SRP salt created at provisioning
+        :param bytes srp_vkey: SRP verification key created at provisioning
+        :param bytes srp_key_id: ID of master key the verification key is derived from
+        """
+        sql = """INSERT INTO {db_name} (device_id, srp_salt, srp_vkey, srp_key_id)
+                 VALUES (%s, %s, %s, %s);""".format(db_name=self.__DB_NAME)
         logging.debug(sql)
-        cursor.execute(sql)
-
-    def __insert_statuses(self, db_name):
-        logging.debug('Start inserting')
-        connection = mysql.connector.connect(user=self.__db_name, password=self.__db_pass, host=self.__db_host,
-                                             database=db_name)
-        connection.autocommit = True
-        cursor = connection.cursor()
-
-        for item in self.__STATUSES_LIST:
-            logging.debug(item)
-            if len(item) == 4:
-                try:
-                    sql = """
-                        INSERT INTO {table_name} (complex_status, status, network, security)
-                        VALUES ('{cstatus}', '{status}', '{network}', '{security}');
-                    """.format(table_name=self.__STATUSES_DB_NAME, cstatus=item[0], status=item[1], network=item[2],
-                               security=item[3])
-                    logging.debug(sql)
-                    cursor.execute(sql)
-                except mysql.connector.errors.IntegrityError as ex:
-                    logging.debug(ex)
-                    if '1062 (23000): Duplicate entry ' not in str(ex):
-                        raise ex
-
-        logging.debug('End inserting')
-
-    def add_utim(self, devid):
-        sql = """INSERT INTO {db_name} (device_id)
-                 VALUES ('{devid}');""".format(db_name=self.__DB_NAME, devid=devid)
-        print(sql)
-        print(self.__execute(sql))
+        result = self.__execute(sql, (devid, srp_salt, srp_vkey, srp_key_id), devids=[devid])
+        logging.debug("Utim %s added: %s", devid, result)
+        self.__srp_verifiers.invalidate(devid)
+        self.__pin([devid])
+        self.__devices.add(devid)
+
+    def __select_utim_names(self):
+        """
+        Select all utim names, shards are queried in parallel
+        :return: list of utim IDs or None on database error
+        """
+        sql = "SELECT device_id FROM {db_name}".format(db_name=self.__DB_NAME)
+        fetches = self.__backend.map_shards(lambda shard: self.__read(sql, shard=shard))
+        if None in fetches:
+            return None
+        return [self.__devid(row[0]) for fetch in fetches for row in fetch]
+
+    def __select_utim(self, devid):
+        """
+        Select utim by ID
+        :return: True, False or None on database error
+        """
+        sql = "SELECT device_id FROM {db_name} WHERE device_id = %s".format(db_name=self.__DB_NAME)
+        fetch = self.__read(sql, (devid,), [devid])
+        if fetch is None:
+            return None
+        return len(fetch) > 0
 
     def get_utim_names(self):
         """
         Get all utim names
         :return: list of utim IDs
         """
-        sql = "SELECT device_id FROM {db_name}".format(db_name=self.__DB_NAME)
-        fetch = self.__execute(sql)
-        result = list()
-
-        if fetch:
-            for row in fetch:
-                result.append(row[0])
+        result = self.__select_utim_names()
+        if result is None:
+            return list()
         return result
 
     def does_utim_exist(self, devid):
         """
-        If Utim exists in DB
+        If Utim exists (answered from in-memory registry)
         :return: True or False
         """
-        sql = "SELECT device_id FROM {db_name} WHERE device_id = '{devid}'".format(db_name=self.__DB_NAME,
-                                                                                   devid=devid)
-        fetch = self.__execute(sql)
-        if fetch is not None and len(fetch) > 0:
-            return True
-        return False
+        return self.__devices.contains(devid)
 
     def get_session_key(self, devid):
         """
@@ -173,14 +216,91 @@ class DataBaseConnection(object):
         :param str devid: Utim ID
         :return bytes: session key
         """
-        # TODO session key must be dehexlified
-        sql = "SELECT session_key FROM {db_name} WHERE device_id = '{devid}'".format(db_name=self.__DB_NAME,
-                                                                                     devid=devid)
-        fetch = self.__execute(sql)
-        if fetch is not None and len(fetch) > 0 and fetch[0][0] is not None:
-            return bytes.fromhex(fetch[0][0])
+        found, session_key = self.__session_keys.get(devid)
+        if found:
+            return session_key
+
+        stamp = self.__session_keys.stamp()
+        sql = "SELECT session_key FROM {db_name} WHERE device_id = %s".format(db_name=self.__DB_NAME)
+        fetch = self.__read(sql, (devid,), [devid])
+        if fetch is not None and len(fetch) > 0:
+            session_key = self.__key(fetch[0][0])
+            self.__session_keys.put(devid, session_key, stamp)
+            return session_key
         return None
 
+    @staticmethod
+    def __padded(values):
+        """
+        Pad values to a power of two by repeating the last value,
+        so lists of any length share a few prepared statements
+        :param list values: Values
+        :return list: Padded values
+        """
+        values = list(values)
+        size = 1
+        while size < len(values):
+            size *= 2
+        values.extend(values[-1:] * (size - len(values)))
+        return values
+
+    @classmethod
+    def __in_list(cls, values):
+        """
+        Get placeholders and parameters of IN list
+        :param list values: Values
+        :return: (placeholders, parameters)
+        """
+        values = cls.__padded(values)
+        return ', '.join(['%s'] * len(values)), values
+
+    @classmethod
+    def __chunks(cls, values, size=None):
+        """
+        Split values into IN lists of allowed size
+        :param int size: Max values of chunk (max IN list by default)
+        """
+        size = size or cls.__MAX_IN_LIST
+        values = list(values)
+        for index in range(0, len(values), size):
+            yield values[index:index + size]
+
+    def get_session_keys(self, devids):
+        """
+        Get session keys of several Utims in one query per shard
+        :param list devids: Utim IDs
+        :return dict: {Utim ID: session key or None} for existing Utims only
+        """
+        result = dict()
+        missing = list()
+        for devid in set(devids):
+            found, session_key = self.__session_keys.get(devid)
+            if found:
+                result[devid] = session_key
+            else:
+                missing.append(devid)
+        if not missing:
+            return result
+
+        stamp = self.__session_keys.stamp()
+        for fetch in self.__map_groups(missing, self.__select_session_keys):
+            for row in fetch or []:
+                devid = self.__devid(row[0])
+                result[devid] = self.__key(row[1])
+                self.__session_keys.put(devid, result[devid], stamp)
+        return result
+
+    def __select_session_keys(self, devids):
+        """
+        Select session keys of Utims kept by one shard
+        :return: rows (Utim ID, session key) or None on database error
+        """
+        placeholders, params = self.__in_list(devids)
+        sql = "SELECT device_id, session_key FROM {db_name} WHERE device_id IN ({devids})".format(
+            db_name=self.__DB_NAME, devids=placeholders
+        )
+        return self.__read(sql, params, devids)
+
     def set_session_key(self, devid, session_key):
         """
         Set Utim session key
@@ -188,16 +308,44 @@ class DataBaseConnection(object):
         :param bytes session_key:
         :return: nothing
         """
-        s_key_to_db = 'NULL'
-        if session_key is not None:
-            s_key_to_db = "'" + session_key.hex() + "'"
+        self.transition(devid, session_key=session_key)
 
-        sql = """UPDATE {db_name}
-                 SET session_key = {session_key}
-                 WHERE device_id='{devid}'""".format(db_name=self.__DB_NAME,
-                                                     session_key=s_key_to_db,
-                                                     devid=devid)
-        self.__execute(sql)
+    def get_srp_verifier(self, devid, srp_key_id):
+        """
+        Get SRP salt and verification key of Utim derived from master key
+        :param str devid: Utim ID
+        :param bytes srp_key_id: ID of current master key
+        :return: (salt, verification key), (None, None) if they are not created or derived from another key
+        """
+        found, verifier = self.__srp_verifiers.get(devid)
+        if not found:
+            stamp = self.__srp_verifiers.stamp()
+            sql = "SELECT srp_salt, srp_vkey, srp_key_id FROM {db_name} WHERE device_id = %s".format(
+                db_name=self.__DB_NAME)
+            fetch = self.__read(sql, (devid,), [devid])
+            if fetch is None:
+                return None, None
+            verifier = (None, None, None)
+            if len(fetch) > 0 and fetch[0][0] is not None and fetch[0][1] is not None:
+                verifier = (self.__key(fetch[0][0]), self.__key(fetch[0][1]), self.__key(fetch[0][2]))
+            self.__srp_verifiers.put(devid, verifier, stamp)
+
+        salt, vkey, key_id = verifier
+        if salt is not None and key_id != srp_key_id:
+            logging.info("SRP verifier of %s is derived from another master key, it is created again", devid)
+            return None, None
+        return salt, vkey
+
+    def set_srp_verifier(self, devid, srp_salt, srp_vkey, srp_key_id):
+        """
+        Set SRP salt and verification key of Utim
+        :param str devid: Utim ID
+        :param bytes srp_salt:
+        :param bytes srp_vkey:
+        :param bytes srp_key_id: ID of master key the verification key is derived from
+        :return: nothing
+        """
+        self.transition(devid, srp_salt=srp_salt, srp_vkey=srp_vkey, srp_key_id=srp_key_id)
 
     def get_config_hash(self, devid):
         """
@@ -205,9 +353,11 @@ class DataBaseConnection(object):
         :param str devid:
         :return str: config hash
         """
-        sql = "SELECT config_hash FROM {db_name} WHERE device_id = '{devid}'".format(db_name=self.__DB_NAME,
-                                                                                     devid=devid)
-        fetch = self.__execute(sql)
+        found, config_hash = self.__pending(devid, 'config_hash')
+        if found:
+            return config_hash
+        sql = "SELECT config_hash FROM {db_name} WHERE device_id = %s".format(db_name=self.__DB_NAME)
+        fetch = self.__read(sql, (devid,), [devid])
         if fetch is not None and len(fetch) > 0:
             return fetch[0][0]
         return None
@@ -219,15 +369,7 @@ class DataBaseConnection(object):
         :param str config_hash:
         :return: nothing
         """
-        c_hash_to_db = 'NULL'
-        if config_hash is not None:
-            c_hash_to_db = "'" + config_hash + "'"
-        sql = """UPDATE {db_name}
-                 SET config_hash = {config_hash}
-                 WHERE device_id='{devid}'""".format(db_name=self.__DB_NAME,
-                                                     config_hash=c_hash_to_db,
-                                                     devid=devid)
-        self.__execute(sql)
+        self.transition(devid, config_hash=config_hash)
 
     def get_keep_alive_counter(self, devid):
         """
@@ -235,9 +377,11 @@ class DataBaseConnection(object):
         :param str devid:
         :return int: counter
         """
-        sql = "SELECT keep_alive_counter FROM {db_name} WHERE device_id = '{devid}'".format(db_name=self.__DB_NAME,
-                                                                                            devid=devid)
-        fetch = self.__execute(sql)
+        found, counter = self.__pending(devid, 'keep_alive_counter')
+        if found:
+            return counter
+        sql = "SELECT keep_alive_counter FROM {db_name} WHERE device_id = %s".format(db_name=self.__DB_NAME)
+        fetch = self.__read(sql, (devid,), [devid])
         if fetch is not None and len(fetch) > 0:
             return fetch[0][0]
         return 0
@@ -249,12 +393,7 @@ class DataBaseConnection(object):
         :param int counter:
         :return: nothing
         """
-        sql = """UPDATE {db_name}
-                 SET keep_alive_counter = {counter} 
-                 WHERE device_id='{devid}'""".format(db_name=self.__DB_NAME,
-                                                     counter=counter,
-                                                     devid=devid)
-        self.__execute(sql)
+        self.transition(devid, keep_alive_counter=counter)
 
     def get_status(self, devid):
         """
@@ -262,11 +401,13 @@ class DataBaseConnection(object):
         :param str devid:
         :return str: status
         """
-        sql = "SELECT status FROM {db_name} WHERE device_id = '{devid}'".format(db_name=self.__DB_NAME,
-                                                                                devid=devid)
-        fetch = self.__execute(sql)
+        found, code = self.__pending(devid, 'status')
+        if found:
+            return self.__status_name(code)
+        sql = "SELECT status FROM {db_name} WHERE device_id = %s".format(db_name=self.__DB_NAME)
+        fetch = self.__read(sql, (devid,), [devid])
         if fetch is not None and len(fetch) > 0:
-            return fetch[0][0]
+            return self.__status_name(fetch[0][0])
         return None
 
     def set_status(self, devid, status):
@@ -276,15 +417,281 @@ class DataBaseConnection(object):
         :param str status:
         :return: nothing
         """
-        timestamp = str(datetime.datetime.now())
+        self.transition(devid, status=status)
+
+    def transition(self, devid, **changes):
+        """
+        Apply all column changes of a handshake step in one UPDATE statement
+
+        Changes of status, keepalive counter and config hash go to write-behind
+        buffer together when it is enabled, session key and SRP verifier are written at once.
+        :param str devid: Utim ID
+        :param changes: status (str), keep_alive_counter (int), config_hash (str), session_key (bytes),
+            srp_salt (bytes), srp_vkey (bytes), srp_key_id (bytes)
+        :return: nothing
+        """
+        unknown = set(changes) - set(self.__TRANSITION_COLUMNS)
+        if unknown:
+            raise ValueError('Unknown Utim columns: {}'.format(', '.join(sorted(unknown))))
+
+        values = dict(changes)
+        if 'status' in values:
+            values['status'] = self.__status_code(values['status'])
+            values['update_time'] = datetime.datetime.now()
+
+        if self.__writes is not None:
+            buffered = {column: value for column, value in values.items() if column in self.__BUFFERED_COLUMNS}
+            if buffered:
+                self.__writes.set_many(devid, buffered)
+            values = {column: value for column, value in values.items() if column not in self.__BUFFERED_COLUMNS}
+
+        if not values:
+            return
+        columns = sorted(values)
         sql = """UPDATE {db_name}
-                 SET status = '{status}',
-                     update_time = '{timestamp}'
-                 WHERE device_id='{devid}'""".format(db_name=self.__DB_NAME,
-                                                     status=status,
-                                                     timestamp=timestamp,
-                                                     devid=devid)
-        self.__execute(sql)
+                 SET {assignments}
+                 WHERE device_id = %s""".format(db_name=self.__DB_NAME,
+                                                assignments=', '.join('{} = %s'.format(column) for column in columns))
+        self.__execute(sql, [values[column] for column in columns] + [devid], devids=[devid])
+        self.__pin([devid])
+        if 'session_key' in values:
+            self.__session_keys.invalidate(devid)
+        if 'srp_salt' in values or 'srp_vkey' in values or 'srp_key_id' in values:
+            self.__srp_verifiers.invalidate(devid)
+
+    def __pending(self, devid, column):
+        """
+        Get value waiting in write-behind buffer
+        :return: (True, value) or (False, None)
+        """
+        if self.__writes is None:
+            return False, None
+        return self.__writes.get(devid, column)
+
+    def __flush_writes(self, pending):
+        """
+        Write buffered values, shards are written in parallel
+        :param dict pending: {Utim ID: {column: value}}
+        :raise: StorageBackendException
+        """
+        self.__map_groups(pending, lambda devids: self.__flush_shard_writes(
+            {devid: pending[devid] for devid in devids}))
+
+    def __flush_shard_writes(self, pending):
+        """
+        Write buffered values of Utims kept by one shard, one UPDATE per column and chunk of Utims
+        :param dict pending: {Utim ID: {column: value}}
+        :raise: StorageBackendException
+        """
+        for column in self.__BUFFERED_COLUMNS:
+            values = [(devid, columns[column]) for devid, columns in pending.items() if column in columns]
+            for chunk in self.__chunks(values, self.__max_update_rows):
+                chunk = self.__padded(chunk)
+                params = list()
+                for devid, value in chunk:
+                    params.extend((devid, value))
+                params.extend(devid for devid, value in chunk)
+                sql = """UPDATE {db_name}
+                         SET {column} = CASE device_id {cases} ELSE {column} END
+                         WHERE device_id IN ({devids})""".format(db_name=self.__DB_NAME, column=column,
+                                                                 cases=' '.join(['WHEN %s THEN %s'] * len(chunk)),
+                                                                 devids=', '.join(['%s'] * len(chunk)))
+                devids = [devid for devid, value in chunk]
+                self.__execute(sql, params, raise_error=True, devids=devids)
+                self.__pin(devids)
+
+    def flush(self):
+        """
+        Write values waiting in write-behind buffer
+        :return bool: True if nothing is left unwritten
+        """
+        if self.__writes is None:
+            return True
+        return self.__writes.flush()
+
+    def __device_state(self, row):
+        """
+        Get device state from udata row, values waiting in write-behind buffer override stored ones
+        """
+        state = DeviceState(self.__devid(row[0]), name=row[1], session_key=self.__key(row[2]), config_hash=row[3],
+                            keep_alive_counter=row[4] or 0, status=row[5], update_time=row[6], sub_id=row[7])
+        if self.__writes is not None:
+            for column in self.__BUFFERED_COLUMNS:
+                found, value = self.__writes.get(state.devid, column)
+                if found:
+                    setattr(state, column, value)
+        state.status = self.__status_name(state.status)
+        return state
+
+    def __select_device_states(self, condition, params, devids=None, shard=None):
+        """
+        Select device states, session keys of requested Utims are cached (not ones of bulk scans)
+        :param list devids: Utim IDs of condition, None selects on primary server
+        :param StorageBackend shard: Shard to select from if devids is None
+        :return dict: {Utim ID: DeviceState} or None on database error
+        """
+        stamp = self.__session_keys.stamp()
+        sql = """SELECT device_id, name, session_key, config_hash, keep_alive_counter, status, update_time, sub_id
+                 FROM {db_name}
+                 WHERE {condition}""".format(db_name=self.__DB_NAME, condition=condition)
+        if devids is None:
+            fetch = self.__execute(sql, params, shard=shard)
+        else:
+            fetch = self.__read(sql, params, devids)
+        if fetch is None:
+            return None
+
+        result = dict()
+        for row in fetch:
+            state = self.__device_state(row)
+            if devids is not None:
+                self.__session_keys.put(state.devid, state.session_key, stamp)
+            result[state.devid] = state
+        return result
+
+    def get_device_state(self, devid):
+        """
+        Get all columns of Utim in one query
+        :param str devid: Utim ID
+        :return DeviceState: state or None if Utim does not exist
+        """
+        states = self.__select_device_states('device_id = %s', (devid,), [devid])
+        if not states:
+            return None
+        return states.get(devid)
+
+    def get_device_states(self, devids=None, statuses=None):
+        """
+        Get states of several Utims, one query per 512 Utims, shards are queried in parallel
+        :param list devids: Utim IDs
+        :param list statuses: Statuses, all Utims having one of them are selected if devids is None
+            (all Utims if both are None)
+        :return dict: {Utim ID: DeviceState} for existing Utims only
+        """
+        result = dict()
+        if devids is None:
+            # Filter by stored statuses
+            self.flush()
+            condition, params = '1 = 1', None
+            if statuses is not None:
+                if not statuses:
+                    return result
+                placeholders, params = self.__in_list([self.__status_code(status) for status in statuses])
+                condition = 'status IN ({})'.format(placeholders)
+            for states in self.__backend.map_shards(
+                    lambda shard: self.__select_device_states(condition, params, shard=shard)):
+                result.update(states or {})
+            return result
+
+        for states in self.__map_groups(set(devids), self.__select_shard_states):
+            result.update(states)
+        if statuses is not None:
+            result = {devid: state for devid, state in result.items() if state.status in statuses}
+        return result
+
+    def __select_shard_states(self, devids):
+        """
+        Select states of Utims kept by one shard, one query per 512 Utims
+        :return dict: {Utim ID: DeviceState}
+        """
+        result = dict()
+        for chunk in self.__chunks(devids):
+            placeholders, params = self.__in_list(chunk)
+            states = self.__select_device_states('device_id IN ({})'.format(placeholders), params, chunk)
+            if states:
+                result.update(states)
+        return result
+
+    def get_keep_alive_counters(self, statuses):
+        """
+        Get keepalive counters of all Utims having one of statuses, shards are queried in parallel
+        Only Utim IDs and counters are selected, so the keepalive sweep does not read whole rows
+        :param list statuses: Statuses
+        :return dict: {Utim ID: keepalive counter}
+        """
+        result = dict()
+        if not statuses:
+            return result
+        self.flush()
+        placeholders, params = self.__in_list([self.__status_code(status) for status in statuses])
+        sql = """SELECT device_id, keep_alive_counter
+                 FROM {db_name}
+                 WHERE status IN ({statuses})""".format(db_name=self.__DB_NAME, statuses=placeholders)
+        for fetch in self.__backend.map_shards(lambda shard: self.__execute(sql, params, shard=shard)):
+            for row in fetch or []:
+                result[self.__devid(row[0])] = row[1] or 0
+        return result
+
+    def set_statuses(self, devids, status):
+        """
+        Set status of several Utims, shards are written in parallel
+        :param list devids: Utim IDs
+        :param str status:
+        :return: nothing
+        """
+        self.flush()
+        code = self.__status_code(status)
+        timestamp = datetime.datetime.now()
+        self.__map_groups(devids, lambda group: self.__update_statuses(group, code, timestamp))
+
+    def __update_statuses(self, devids, code, timestamp):
+        """
+        Set status code of Utims kept by one shard
+        """
+        for chunk in self.__chunks(devids):
+            placeholders, params = self.__in_list(chunk)
+            sql = """UPDATE {db_name}
+                     SET status = %s,
+                         update_time = %s
+                     WHERE device_id IN ({devids})""".format(db_name=self.__DB_NAME, devids=placeholders)
+            self.__execute(sql, [code, timestamp] + params, devids=chunk)
+            self.__pin(chunk)
+
+    def increment_keep_alive_counters(self, devids):
+        """
+        Increment keepalive counters of several Utims atomically, shards are written in parallel
+        :param list devids: Utim IDs
+        :return: nothing
+        """
+        self.flush()
+        self.__map_groups(devids, self.__increment_counters)
+
+    def __increment_counters(self, devids):
+        """
+        Increment keepalive counters of Utims kept by one shard
+        """
+        for chunk in self.__chunks(devids):
+            placeholders, params = self.__in_list(chunk)
+            sql = """UPDATE {db_name}
+                     SET keep_alive_counter = keep_alive_counter + 1
+                     WHERE device_id IN ({devids})""".format(db_name=self.__DB_NAME, devids=placeholders)
+            self.__execute(sql, params, devids=chunk)
+            self.__pin(chunk)
+
+    @staticmethod
+    def config_hash(config):
+        """
+        Get hash of configuration
+        :param dict config: Configuration or None
+        :return str: hash
+        """
+        if config is None or config.get('type') is None:
+            return 'nothing'
+        sha = hashlib.sha256()
+        sha.update(json.dumps(config).encode())
+        return sha.digest().hex()
+
+    @staticmethod
+    def __configuration(row):
+        """
+        Get configuration from subs row
+        """
+        return {'type': row[0],
+                'host_name': row[1],
+                'shared_access_key_name': row[2],
+                'shared_access_key': row[3],
+                'auth_method': row[4],
+                'region': row[5]}
 
     def get_configuration(self, devid):
         """
@@ -301,17 +708,47 @@ class DataBaseConnection(object):
                     s.region
                  FROM {db_name} u, {sub_db_name} s
                  WHERE
-                    u.device_id = '{devid}' and
+                    u.device_id = %s and
                     u.sub_id = s.sub_id""".format(db_name=self.__DB_NAME,
-                                                  sub_db_name=self.__SUB_DB_NAME,
-                                                  devid=devid)
-        fetch = self.__execute(sql)
+                                                  sub_db_name=self.__SUB_DB_NAME)
+        fetch = self.__read(sql, (devid,), [devid])
         if fetch is not None and len(fetch) > 0 and len(fetch[0]) >= 6:
-            result = {'type': fetch[0][0],
-                      'host_name': fetch[0][1],
-                      'shared_access_key_name': fetch[0][2],
-                      'shared_access_key': fetch[0][3],
-                      'auth_method': fetch[0][4],
-                      'region': fetch[0][5]}
-            return result
+            return self.__configuration(fetch[0])
         return None
+
+    def get_subscription_config_hash(self, sub_id):
+        """
+        Get hash of subscription configuration, it is cached per sub_id for configurations_ttl seconds
+        :param int sub_id: Subscription ID or None
+        :return str: config hash
+        """
+        if sub_id is None:
+            return self.config_hash(None)
+
+        found, config_hash = self.__config_hashes.get(sub_id)
+        if found:
+            return config_hash
+
+        stamp = self.__config_hashes.stamp()
+        sql = """SELECT sub_type, host_name, shared_access_key_name, shared_access_key, auth_method, region
+                 FROM {sub_db_name}
+                 WHERE sub_id = %s""".format(sub_db_name=self.__SUB_DB_NAME)
+        fetch = self.__read(sql, (sub_id,))
+        if fetch is None:
+            return None
+        config_hash = self.config_hash(self.__configuration(fetch[0]) if fetch else None)
+        self.__config_hashes.put(sub_id, config_hash, stamp)
+        return config_hash
+
+    def get_config_hashes(self, devid, state=None):
+        """
+        Get stored and target config hashes of Utim
+        :param str devid:
+        :param DeviceState state: Utim state if it is already read
+        :return: (stored config hash, config hash of Utim subscription)
+        """
+        if state is None:
+            state = self.get_device_state(devid)
+        if state is None:
+            return None, self.config_hash(None)
+        return state.config_hash, self.get_subscription_config_hash(state.sub_id)
@@ -0,0 +1,42 @@
+"""
+Deferred call module
+
+Calls put to the inbound queue to run them in order with frames of a device
+"""
+
+from .message_class import MessageClass
+
+
+class DeferredCall(list):
+    """
+    Deferred call class
+
+    Item [topic, call] is routed as frames of the device with the topic, so the
+    call runs on the worker processing the device, in order with its frames.
+    It is used to finish work completed in background (for example SRP
+    verifier built in a worker process) outside of threads of executors.
+    Queues never shed deferred calls, so the background work is not lost.
+    """
+
+    def __init__(self, devid, call, message_class=MessageClass.DATA):
+        """
+        Initialization
+
+        :param str devid: Device ID
+        :param call: Callable without arguments
+        :param int message_class: Message class of the call
+        """
+
+        super().__init__([devid.encode(), call])
+        self.message_class = message_class
+
+    @property
+    def devid(self):
+        return self[0].decode()
+
+    def run(self):
+        """
+        Run the call
+        """
+
+        self[1]()
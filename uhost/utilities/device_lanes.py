@@ -0,0 +1,142 @@
+"""
+Device lanes module
+
+Concurrent processing of items of different devices on an asyncio event loop
+"""
+
+import asyncio
+import collections
+import logging
+import queue
+from .deferred_call import DeferredCall
+from .priority_scheduler import PriorityScheduler
+from .shedding_queue import LoadShedder
+
+
+class DeviceLanes(object):
+    """
+    Device lanes class
+
+    Every device with items in process has its lane: a coroutine processing
+    items of the device one by one, so they keep their order. Lanes of different
+    devices run concurrently, up to concurrency lanes at once, put() waits only
+    for a free lane for a new device. Items of a busy device wait in its lane
+    without blocking put(): up to MAX_WAITING items per lane, beyond that the
+    lane sheds load with the shedder (deferred calls are never shed). Items are
+    processed by a coroutine function and put by a single coroutine.
+    """
+
+    MAX_WAITING = 64  # Items waiting in lane of one device
+
+    def __init__(self, loop, process, concurrency, key=None, shedder=None):
+        """
+        Initialization
+
+        :param loop: Event loop
+        :param process: Coroutine function processing single item
+        :param int concurrency: Max number of items processed at once
+        :param key: Callable to get device ID of item (item[0] by default)
+        :param LoadShedder shedder: Load shedding policy of waiting items
+        """
+
+        self.__loop = loop
+        self.__process_item = process
+        self.__key = key if key is not None else (lambda item: item[0])
+        self.__shedder = shedder if shedder is not None else LoadShedder('lanes')
+        self.__slots = asyncio.Semaphore(max(1, concurrency))
+        self.__lanes = dict()  # {device ID: lane task}
+        self.__waiting = dict()  # {device ID: (waiting items, waiting deferred calls)}
+
+    def key(self, item):
+        """
+        Get device ID of item
+
+        :return str: Device ID or None if item has no device ID
+        """
+
+        try:
+            key = self.__key(item)
+        except (IndexError, KeyError, TypeError):
+            return None
+        if isinstance(key, (bytes, bytearray)):
+            return key.decode('utf-8', 'replace')
+        return key
+
+    def busy(self, key):
+        """
+        Check device has items in process
+        """
+
+        return key in self.__lanes
+
+    def __len__(self):
+        return len(self.__lanes)
+
+    async def put(self, item, key=None):
+        """
+        Process item in lane of its device, wait while there is no free lane for new device
+
+        :param item: Item
+        :param key: Device ID (key of item by default)
+        """
+
+        key = key if key is not None else self.key(item)
+        waiting = self.__waiting.get(key)
+        if waiting is not None:
+            self.__wait(waiting, item)
+            return
+
+        await self.__slots.acquire()
+        self.__waiting[key] = (PriorityScheduler(), collections.deque())
+        self.__lanes[key] = self.__loop.create_task(self.__run(key, item))
+
+    def __wait(self, waiting, item):
+        """
+        Keep item in lane of busy device, shed load if the lane is full
+        """
+
+        items, calls = waiting
+        if isinstance(item, DeferredCall):
+            calls.append(item)
+        elif len(items) < self.MAX_WAITING or self.__shedder.shed(items, item):
+            items.put(self.__shedder.classify(item), item)
+
+    def cancel(self):
+        """
+        Cancel all lanes
+        """
+
+        for lane in list(self.__lanes.values()):
+            lane.cancel()
+
+    async def __run(self, key, item):
+        """
+        Process items of device one by one
+        """
+
+        try:
+            while True:
+                await self.__process(item)
+                items, calls = self.__waiting[key]
+                if calls:
+                    item = calls.popleft()
+                elif items:
+                    item = items.pop_oldest()
+                else:
+                    break
+        finally:
+            del self.__waiting[key]
+            del self.__lanes[key]
+            self.__slots.release()
+
+    async def __process(self, item):
+        """
+        Process single item
+        """
+
+        try:
+            await self.__process_item(item)
+        except queue.Full:
+            logging.debug("Result of item is dropped by full queue")
+        except Exception as ex:
+            logging.exception("Failed to process item: %s", ex)
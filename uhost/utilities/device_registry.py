@@ -0,0 +1,159 @@
+"""
+Device registry module
+
+In-memory set of Utim IDs of the Uhost
+"""
+
+import logging
+import threading
+import time
+
+
+class DeviceRegistry(object):
+    """
+    Device registry class
+
+    The whole set of Utim IDs is loaded once and reloaded every refresh_interval
+    seconds. An unknown ID is looked up in database and the answer is kept:
+    found IDs are added to the set, missing IDs are remembered for negative_ttl
+    seconds, so junk topics do not reach database on every message.
+    """
+
+    MAX_MISSING = 10000  # Missing IDs remembered at most
+
+    __shared = dict()
+    __shared_lock = threading.Lock()
+
+    def __init__(self, load, lookup, refresh_interval=300, negative_ttl=30):
+        """
+        Initialization
+
+        :param load: Callable returning list of all Utim IDs or None on error
+        :param lookup: Callable returning True/False if Utim exists or None on error
+        :param float refresh_interval: Seconds between full reloads (0 - never reload)
+        :param float negative_ttl: Seconds to remember missing Utim ID
+        """
+
+        self.__load = load
+        self.__lookup = lookup
+        self.__refresh_interval = refresh_interval
+        self.__negative_ttl = negative_ttl
+        self.__devices = set()
+        self.__missing = dict()  # {devid: expiration time}
+        self.__next_reload = 0  # Monotonic time of next full reload
+        self.__lock = threading.Lock()
+        self.__reload_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, name, load, lookup, refresh_interval=300, negative_ttl=30):
+        """
+        Get registry shared by every user of the same database
+
+        :param str name: Database name
+        :return DeviceRegistry:
+        """
+
+        with cls.__shared_lock:
+            registry = cls.__shared.get(name)
+            if registry is None:
+                registry = cls(load, lookup, refresh_interval, negative_ttl)
+                cls.__shared[name] = registry
+            return registry
+
+    def reload(self):
+        """
+        Load all Utim IDs from database
+
+        :return bool: True if registry was loaded
+        """
+
+        devices = self.__load()
+        if devices is None:
+            # Keep known IDs and try again soon
+            self.__next_reload = time.monotonic() + self.__negative_ttl
+            logging.warning('Device registry was not loaded')
+            return False
+
+        with self.__lock:
+            self.__devices = set(devices)
+            self.__missing.clear()
+            self.__next_reload = float('inf')
+            if self.__refresh_interval:
+                self.__next_reload = time.monotonic() + self.__refresh_interval
+        logging.debug('Device registry loaded: %d devices', len(devices))
+        return True
+
+    def __refresh(self):
+        """
+        Reload registry if it is stale, only one thread reloads at a time
+        """
+
+        if time.monotonic() < self.__next_reload:
+            return
+        if self.__reload_lock.acquire(blocking=False):
+            try:
+                if time.monotonic() >= self.__next_reload:
+                    self.reload()
+            finally:
+                self.__reload_lock.release()
+
+    def contains(self, devid):
+        """
+        Check Utim exists
+
+        :param str devid: Utim ID
+        :return bool:
+        """
+
+        self.__refresh()
+
+        now = time.monotonic()
+        with self.__lock:
+            if devid in self.__devices:
+                return True
+            expiration = self.__missing.get(devid)
+            if expiration is not None and expiration > now:
+                return False
+
+        exists = self.__lookup(devid)
+        if exists is None:
+            return False
+
+        with self.__lock:
+            if exists:
+                self.__devices.add(devid)
+                self.__missing.pop(devid, None)
+            else:
+                if len(self.__missing) >= self.MAX_MISSING:
+                    self.__missing = {key: value for key, value in self.__missing.items() if value > now}
+                    if len(self.__missing) >= self.MAX_MISSING:
+                        self.__missing.clear()
+                self.__missing[devid] = now + self.__negative_ttl
+        return exists
+
+    def add(self, devid):
+        """
+        Add Utim ID (invalidates its negative entry)
+
+        :param str devid: Utim ID
+        """
+
+        with self.__lock:
+            self.__devices.add(devid)
+            self.__missing.pop(devid, None)
+
+    def discard(self, devid):
+        """
+        Remove Utim ID
+
+        :param str devid: Utim ID
+        """
+
+        with self.__lock:
+            self.__devices.discard(devid)
+
+    def __contains__(self, devid):
+        return self.contains(devid)
+
+    def __len__(self):
+        return len(self.__devices)
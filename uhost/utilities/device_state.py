@@ -0,0 +1,42 @@
+"""
+Device state module
+"""
+
+
+class DeviceState(object):
+    """
+    Device state class
+
+    Snapshot of all columns of Utim row read in one query
+    """
+
+    __slots__ = ('devid', 'name', 'session_key', 'config_hash', 'keep_alive_counter', 'status', 'update_time',
+                 'sub_id')
+
+    def __init__(self, devid, name=None, session_key=None, config_hash=None, keep_alive_counter=0, status=None,
+                 update_time=None, sub_id=None):
+        """
+        Initialization
+
+        :param str devid: Utim ID
+        :param str name: Utim name
+        :param bytes session_key: Session key
+        :param str config_hash: Hash of configuration sent to Utim
+        :param int keep_alive_counter: Keepalive counter
+        :param str status: Status
+        :param update_time: Time of last status change
+        :param int sub_id: Subscription ID
+        """
+
+        self.devid = devid
+        self.name = name
+        self.session_key = session_key
+        self.config_hash = config_hash
+        self.keep_alive_counter = keep_alive_counter
+        self.status = status
+        self.update_time = update_time
+        self.sub_id = sub_id
+
+    def __repr__(self):
+        return 'DeviceState({}, status={}, keep_alive_counter={}, sub_id={})'.format(
+            self.devid, self.status, self.keep_alive_counter, self.sub_id)
@@ -0,0 +1,186 @@
+"""
+Ephemeral pool module
+
+Background generation of SRP server ephemerals
+"""
+
+import atexit
+import collections
+import logging
+import threading
+import time
+import _thread
+from . import srp
+
+
+class EphemeralPool(object):
+    """
+    SRP server ephemeral pool class
+
+    Pair (b, g^b mod N) does not depend on Utim, so it is generated in
+    background and taken by srp.Verifier of the group once attached. Every
+    pair is taken once, missing pair is computed inline.
+
+    Generation runs in idle time only: it pauses for pause seconds after
+    every take, so it does not compete with handshakes for the interpreter.
+    Pool keeps a target number of pairs: the target is doubled (up to size)
+    when a pair is missing at take, so reconnect storms grow it for the next
+    one, and halved (down to min_size) after decay_interval seconds without
+    misses.
+    """
+
+    __shared = dict()
+    __shared_lock = threading.Lock()
+
+    def __init__(self, group, size=64, min_size=4, pause=0.05, decay_interval=60.0):
+        """
+        Initialization
+
+        :param srp.Group group: SRP group
+        :param int size: Max number of ready pairs
+        :param int min_size: Min target number of ready pairs
+        :param float pause: Seconds generation pauses after take
+        :param float decay_interval: Seconds without misses after which target is halved
+        """
+
+        self.__group = group
+        self.__size = max(1, int(size))
+        self.__min_size = max(1, min(int(min_size), self.__size))
+        self.__pause = pause
+        self.__decay_interval = decay_interval
+        self.__target = self.__min_size
+        self.__ready = collections.deque()
+        self.__condition = threading.Condition()
+        self.__last_miss = time.monotonic()
+        self.__last_take = 0
+        self.__running = False
+        self.__hits = 0
+        self.__misses = 0
+
+    @classmethod
+    def shared(cls, group, size=64):
+        """
+        Get pool of the group attached to it
+
+        Generating thread is started once and stopped at interpreter exit.
+
+        :param srp.Group group: SRP group
+        :param int size: Max number of ready pairs
+        :return EphemeralPool:
+        """
+
+        with cls.__shared_lock:
+            pool = cls.__shared.get(group)
+            if pool is None:
+                pool = cls(group, size)
+                pool.start()
+                atexit.register(pool.stop)
+                cls.__shared[group] = pool
+            return pool
+
+    @property
+    def hits(self):
+        return self.__hits
+
+    @property
+    def misses(self):
+        return self.__misses
+
+    @property
+    def target(self):
+        return self.__target
+
+    def __len__(self):
+        return len(self.__ready)
+
+    def start(self):
+        """
+        Start generating thread and attach pool to the group
+        """
+
+        self.__running = True
+        _thread.start_new_thread(self.__run, ())
+        self.__group.ephemeral_source = self.take
+
+    def stop(self):
+        """
+        Detach pool from the group and stop generating thread
+        """
+
+        if self.__group.ephemeral_source == self.take:
+            self.__group.ephemeral_source = None
+        with self.__condition:
+            self.__running = False
+            self.__condition.notify_all()
+
+    def take(self):
+        """
+        Take ready pair, compute it inline if pool is empty
+
+        :return: (b, g^b mod N)
+        """
+
+        with self.__condition:
+            self.__last_take = time.monotonic()
+            if self.__ready:
+                self.__hits += 1
+                pair = self.__ready.popleft()
+            else:
+                self.__misses += 1
+                self.__last_miss = time.monotonic()
+                self.__target = min(self.__size, self.__target * 2)
+                pair = None
+            self.__condition.notify()
+        if pair is None:
+            pair = self.__group.new_ephemeral()
+        return pair
+
+    def __wait(self):
+        """
+        Wait until pool is below target and no pair is taken for pause seconds
+
+        :return bool: False if pool is stopped
+        """
+
+        with self.__condition:
+            while self.__running:
+                now = time.monotonic()
+                if now - self.__last_miss > self.__decay_interval:
+                    self.__target = max(self.__min_size, self.__target // 2)
+                    self.__last_miss = now
+                    while len(self.__ready) > self.__target:
+                        self.__ready.pop()
+                idle = now - self.__last_take
+                if len(self.__ready) >= self.__target:
+                    self.__condition.wait(self.__decay_interval)
+                elif idle < self.__pause:
+                    self.__condition.wait(self.__pause - idle)
+                else:
+                    return True
+            return False
+
+    def __run(self):
+        """
+        Generate pairs while pool is running
+        """
+
+        while self.__wait():
+            try:
+                pair = self.__group.new_ephemeral()
+            except Exception as ex:
+                logging.error('SRP ephemeral generation failed: %s', ex)
+                time.sleep(1)
+                continue
+            with self.__condition:
+                self.__ready.append(pair)
+
+
+def start(size, hash_alg=srp.SHA256, ng_type=srp.NG_1024):
+    """
+    Start pool of SRP group used by Uhost (initializer of SRP worker processes too)
+
+    :param int size: Max number of ready pairs (0 - pool is disabled)
+    """
+
+    if size > 0:
+        EphemeralPool.shared(srp.get_group(hash_alg, ng_type), size)
@@ -0,0 +1,64 @@
+"""
+Hash ring module
+
+Consistent hashing of keys to nodes
+"""
+
+import bisect
+import hashlib
+
+
+class HashRing(object):
+    """
+    Consistent hash ring class
+
+    Every node is placed on the ring as several virtual points, so adding or
+    removing a node moves only keys of that node.
+    """
+
+    DEFAULT_REPLICAS = 100  # Virtual points per node
+
+    def __init__(self, nodes, replicas=DEFAULT_REPLICAS):
+        """
+        Initialization
+
+        :param list nodes: Node names
+        :param int replicas: Virtual points per node
+        """
+
+        self.__nodes = sorted(set(nodes))
+        self.__points = []
+        self.__owners = []
+
+        ring = sorted((self.__hash('{}#{}'.format(node, index)), node)
+                      for node in self.__nodes for index in range(max(1, replicas)))
+        for point, node in ring:
+            self.__points.append(point)
+            self.__owners.append(node)
+
+    @staticmethod
+    def __hash(key):
+        """
+        Get position of key on the ring
+        """
+
+        if isinstance(key, str):
+            key = key.encode()
+        return int.from_bytes(hashlib.md5(key).digest()[:8], byteorder='big')
+
+    @property
+    def nodes(self):
+        return list(self.__nodes)
+
+    def node_for(self, key):
+        """
+        Get node owning the key
+
+        :param key: Key (str or bytes)
+        :return str: Node name or None if ring is empty
+        """
+
+        if not self.__points:
+            return None
+        index = bisect.bisect(self.__points, self.__hash(key)) % len(self.__points)
+        return self.__owners[index]
@@ -2,12 +2,14 @@
 Keepalive manager module
 """
 
+import queue
 import time
 import _thread
 import logging
 from .tag import Tag
 from .constants import Status
 from .database_connection import DataBaseConnection
+from .cluster import Cluster
 
 
 class KeepaliveManager(object):
@@ -15,10 +17,13 @@ class KeepaliveManager(object):
     This class will do stuff with Utims
     """
 
+    PERIOD = 15  # Seconds between keepalive sweeps
+
     def __init__(self, out_queue):
         logging.debug('init Keepalive Manager...')
         self.__connection = None
         self.__outbound_queue = out_queue
+        self.__cluster = Cluster()
         self.__running = False
 
     def run(self):
@@ -34,20 +39,41 @@ class KeepaliveManager(object):
         Process itself
         """
         while self.__running:
-            time.sleep(15)
-            logging.info('Keepalive Manager iteration!')
-            for devid in self.__connection.get_utim_names():
-                status = self.__connection.get_status(devid)
-                counter = self.__connection.get_keep_alive_counter(devid)
-                logging.info('Thinking about {} with status {} and counter {}'.format(devid, status, counter))
-                if status == Status.STATUS_DONE or status == Status.STATUS_NO_CONFIG:
-                    if counter > 4:
-                        logging.info('{} is dead now'.format(devid))
-                        self.__connection.set_status(devid, Status.STATUS_DED)
-                    else:
-                        logging.info('Sending keepalive to {}'.format(devid))
-                        self.__connection.set_keep_alive_counter(devid, counter + 1)
-                        self.__outbound_queue.put([devid, Tag.UCOMMAND.KEEPALIVE])
+            time.sleep(self.PERIOD)
+            self.sweep()
+
+    def sweep(self):
+        """
+        Single keepalive iteration over all Utims
+        """
+        if self.__connection is None:
+            self.__connection = DataBaseConnection()
+
+        logging.info('Keepalive Manager iteration!')
+        dead = []
+        alive = []
+        counters = self.__connection.get_keep_alive_counters([Status.STATUS_DONE, Status.STATUS_NO_CONFIG])
+        for devid, counter in counters.items():
+            if not self.__cluster.owns(devid):
+                continue
+            logging.debug('Thinking about {} with counter {}'.format(devid, counter))
+            if counter > 4:
+                logging.info('{} is dead now'.format(devid))
+                dead.append(devid)
+            else:
+                alive.append(devid)
+
+        if dead:
+            self.__connection.set_statuses(dead, Status.STATUS_DED)
+        if alive:
+            self.__connection.increment_keep_alive_counters(alive)
+
+        logging.info('Sending keepalive to {} Utims'.format(len(alive)))
+        for devid in alive:
+            try:
+                self.__outbound_queue.put([devid, Tag.UCOMMAND.KEEPALIVE])
+            except queue.Full:
+                logging.debug('Keepalive to {} is dropped by full queue'.format(devid))
 
     def stop(self):
         self.__running = False
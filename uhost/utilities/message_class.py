@@ -0,0 +1,106 @@
+"""
+Message class module
+
+Classification of pipeline items by the command tag they carry
+"""
+
+from .tag import Tag
+from .cryptography import CryptoLayer
+
+
+class MessageClass(object):
+    """
+    Message class
+
+    Lower value means more important message.
+    """
+
+    HANDSHAKE = 0
+    CONTROL = 1
+    DATA = 2
+    KEEPALIVE = 3
+
+    NAMES = {
+        HANDSHAKE: 'handshake',
+        CONTROL: 'control',
+        DATA: 'data',
+        KEEPALIVE: 'keepalive'
+    }
+
+    __TAGS = {
+        Tag.UCOMMAND.HELLO: HANDSHAKE,
+        Tag.UCOMMAND.CHECK: HANDSHAKE,
+        Tag.UCOMMAND.TRY_FIRST: HANDSHAKE,
+        Tag.UCOMMAND.TRY_SECOND: HANDSHAKE,
+        Tag.UCOMMAND.INIT: HANDSHAKE,
+        Tag.UCOMMAND.TRUSTED: CONTROL,
+        Tag.UCOMMAND.VERIFIED: CONTROL,
+        Tag.UCOMMAND.AUTHENTIC: CONTROL,
+        Tag.UCOMMAND.CONNECTION_STRING: CONTROL,
+        Tag.UCOMMAND.TEST_PLATFORM_DATA: CONTROL,
+        Tag.UCOMMAND.ERROR: CONTROL,
+        Tag.UCOMMAND.DIE: CONTROL,
+        Tag.UCOMMAND.SIGNED: DATA,
+        Tag.UCOMMAND.KEEPALIVE: KEEPALIVE,
+        Tag.UCOMMAND.KEEPALIVE_ANSWER: KEEPALIVE
+    }
+
+    # Header of frame which is neither signed nor encrypted
+    __PLAIN_HEADER = Tag.CRYPTO.SIGNED + CryptoLayer.SIGN_MODE_NONE + \
+        Tag.CRYPTO.ENCRYPTED + CryptoLayer.CRYPTO_MODE_NONE
+
+    @classmethod
+    def of_payload(cls, payload):
+        """
+        Get class of plain payload
+
+        :param bytes payload: Payload starting with command tag
+        :return int: Message class
+        """
+
+        if not isinstance(payload, (bytes, bytearray)):
+            return cls.DATA
+        return cls.__TAGS.get(bytes(payload[0:1]), cls.DATA)
+
+    @classmethod
+    def of_frame(cls, frame):
+        """
+        Get class of frame wrapped by crypto layer
+
+        Tag of secured frame can't be seen without session key, such frames are data.
+
+        :param bytes frame: Signed and encrypted frame
+        :return int: Message class
+        """
+
+        if not isinstance(frame, (bytes, bytearray)):
+            return cls.DATA
+        header_length = len(cls.__PLAIN_HEADER)
+        if frame[0:header_length] == cls.__PLAIN_HEADER:
+            return cls.of_payload(frame[header_length:])
+        return cls.DATA
+
+    @classmethod
+    def of_payload_item(cls, item):
+        """
+        Get class of [destination, payload] item
+        """
+
+        try:
+            return cls.of_payload(item[1])
+        except (IndexError, KeyError, TypeError):
+            return cls.DATA
+
+    @classmethod
+    def of_frame_item(cls, item):
+        """
+        Get class of [sender/destination, frame] item
+        """
+
+        message_class = getattr(item, 'message_class', None)
+        if message_class is not None:
+            return message_class
+        try:
+            return cls.of_frame(item[1])
+        except (IndexError, KeyError, TypeError):
+            return cls.DATA
@@ -0,0 +1,368 @@
+"""
+MySQL storage backend module
+"""
+
+import contextlib
+import itertools
+import logging
+import mysql.connector
+from .connection_pool import ConnectionPool, ConnectionPoolException
+from .storage_backend import StorageBackend, StorageBackendException
+
+
+class MySqlBackend(StorageBackend):
+    """
+    MySQL storage backend class
+
+    Every Uhost keeps its Utims in uhost_{uhostname} schema. Statements run on
+    pooled connections as server-side prepared statements, schema changes run
+    on direct connections. Read-only statements go to read replicas one by one,
+    retry of failed one goes to primary server.
+    """
+
+    MAX_TRIES = 3
+    SCHEMA_LOCK_TIMEOUT = 60  # Seconds to wait for another node changing the schema
+
+    def __init__(self, cfg, host=None):
+        """
+        Initialization
+
+        :param config.Config cfg: Config
+        :param str host: MySQL server of shard, hostname of config by default
+        """
+
+        self.__config = cfg
+        self.__uhost_name = 'uhost_' + cfg.uhost_name
+        self.__db_host = host or cfg.db_hostname
+        self.__db_name = cfg.db_username
+        self.__db_pass = cfg.db_password
+
+        # Pool of persistent connections shared by every backend of the Uhost
+        self.__pool = ConnectionPool.shared(size=cfg.db_pool_size,
+                                            recycle=cfg.db_pool_recycle,
+                                            timeout=cfg.db_pool_timeout,
+                                            ping_interval=cfg.db_pool_ping_interval,
+                                            user=self.__db_name, password=self.__db_pass, host=self.__db_host,
+                                            database=self.__uhost_name)
+
+        # Pools of read replicas (of unsharded database only)
+        self.__replicas = [ConnectionPool.shared(size=cfg.db_pool_size,
+                                                 recycle=cfg.db_pool_recycle,
+                                                 timeout=cfg.db_pool_timeout,
+                                                 ping_interval=cfg.db_pool_ping_interval,
+                                                 user=self.__db_name, password=self.__db_pass, host=replica,
+                                                 database=self.__uhost_name)
+                           for replica in ([] if cfg.db_shards else cfg.db_replicas)]
+        self.__next_replica = itertools.count()
+
+    @property
+    def name(self):
+        return self.__uhost_name
+
+    @property
+    def has_replicas(self):
+        return bool(self.__replicas)
+
+    def create(self):
+        self.__create_db(self.__uhost_name)
+        with self.__schema_lock() as cursor:
+            if self.__schema_version(cursor) == 0:
+                self.__create_table(cursor)
+                self.__insert_statuses(cursor)
+                self.__store_version(cursor, self.SCHEMA_VERSION)
+            else:
+                self.__insert_statuses(cursor)
+                self.migrate()
+
+    def execute(self, sql, params=None, raise_error=False, replica=False):
+        tries = 0
+        while tries < self.MAX_TRIES:
+            pool = self.__pool
+            if replica and self.__replicas:
+                pool = self.__replicas[next(self.__next_replica) % len(self.__replicas)]
+            try:
+                with pool.connection() as connection:
+                    return connection.execute(sql, params)
+            except (mysql.connector.Error, ConnectionPoolException) as er:
+                logging.debug(sql)
+                logging.debug(er)
+                tries = tries + 1
+                replica = False
+                logging.debug('reconnect')
+                if raise_error and tries >= self.MAX_TRIES:
+                    raise StorageBackendException(str(er))
+
+    def __connect(self, database=True):
+        """
+        Open direct connection for schema changes
+        """
+
+        if database:
+            connection = mysql.connector.connect(user=self.__db_name, password=self.__db_pass, host=self.__db_host,
+                                                 database=self.__uhost_name)
+        else:
+            connection = mysql.connector.connect(user=self.__db_name, password=self.__db_pass, host=self.__db_host)
+        connection.autocommit = True
+        return connection
+
+    @contextlib.contextmanager
+    def __schema_lock(self):
+        """
+        Hold named lock of the schema, so nodes started together change it one by one
+
+        :return: cursor of locked connection
+        """
+
+        connection = self.__connect()
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT GET_LOCK(%s, %s)", (self.__uhost_name, self.SCHEMA_LOCK_TIMEOUT))
+            cursor.fetchall()
+            yield cursor
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (self.__uhost_name,))
+            cursor.fetchall()
+            cursor.close()
+            connection.close()
+
+    @staticmethod
+    def __fetch(cursor, sql, params=None):
+        logging.debug(sql)
+        cursor.execute(sql, params)
+        return cursor.fetchall() if cursor.with_rows else None
+
+    def __column_type(self, cursor, table, column):
+        """
+        Get data type of column, None if there is no such column
+        """
+
+        fetch = self.__fetch(cursor, """SELECT DATA_TYPE FROM information_schema.COLUMNS
+                                        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s""",
+                             (table, column))
+        if not fetch:
+            return None
+        data_type = fetch[0][0]
+        return data_type.decode() if isinstance(data_type, (bytes, bytearray)) else data_type
+
+    def __has_index(self, cursor, table, index):
+        fetch = self.__fetch(cursor, """SELECT 1 FROM information_schema.STATISTICS
+                                        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s""",
+                             (table, index))
+        return bool(fetch)
+
+    def __schema_version(self, cursor):
+        fetch = self.__fetch(cursor, """SELECT TABLE_NAME FROM information_schema.TABLES
+                                        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN (%s, %s)""",
+                             (self.VERSION_TABLE, self.UTIMS_TABLE))
+        tables = [row[0].decode() if isinstance(row[0], (bytes, bytearray)) else row[0] for row in fetch or []]
+        if self.VERSION_TABLE in tables:
+            fetch = self.__fetch(cursor, "SELECT MAX(version) FROM {}".format(self.VERSION_TABLE))
+            if fetch and fetch[0][0] is not None:
+                return fetch[0][0]
+        if self.UTIMS_TABLE in tables:
+            return 1
+        return 0
+
+    def __store_version(self, cursor, version):
+        self.__fetch(cursor, "CREATE TABLE IF NOT EXISTS {} (version INT NOT NULL)".format(self.VERSION_TABLE))
+        self.__fetch(cursor, "DELETE FROM {}".format(self.VERSION_TABLE))
+        self.__fetch(cursor, "INSERT INTO {} (version) VALUES (%s)".format(self.VERSION_TABLE), (version,))
+
+    def schema_version(self):
+        connection = self.__connect()
+        try:
+            return self.__schema_version(connection.cursor())
+        finally:
+            connection.close()
+
+    def _set_schema_version(self, version):
+        connection = self.__connect()
+        try:
+            self.__store_version(connection.cursor(), version)
+        finally:
+            connection.close()
+
+    def _migrate_to_2(self):
+        """
+        Binary session keys and device IDs, status codes, secondary indexes
+
+        Steps already done by interrupted migration are skipped.
+        """
+
+        connection = self.__connect()
+        cursor = connection.cursor()
+        try:
+            # Foreign key from udata.status to status names
+            fetch = self.__fetch(cursor, """SELECT CONSTRAINT_NAME FROM information_schema.KEY_COLUMN_USAGE
+                                            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+                                            AND COLUMN_NAME = 'status' AND REFERENCED_TABLE_NAME IS NOT NULL""",
+                                 (self.UTIMS_TABLE,))
+            foreign_keys = [row[0].decode() if isinstance(row[0], (bytes, bytearray)) else row[0]
+                            for row in fetch or []]
+            status_is_code = self.__column_type(cursor, self.UTIMS_TABLE, 'status') == 'tinyint'
+            if not status_is_code:
+                for foreign_key in foreign_keys:
+                    self.__fetch(cursor, "ALTER TABLE {} DROP FOREIGN KEY `{}`".format(self.UTIMS_TABLE,
+                                                                                      foreign_key))
+                foreign_keys = []
+
+            # Status codes
+            if self.__column_type(cursor, self.STATUSES_TABLE, 'code') is None:
+                self.__fetch(cursor, "ALTER TABLE {} ADD COLUMN code TINYINT UNSIGNED".format(self.STATUSES_TABLE))
+            for item in self.STATUSES:
+                self.__fetch(cursor, "UPDATE {} SET code = %s WHERE complex_status = %s".format(self.STATUSES_TABLE),
+                             (item[0], item[1]))
+            if not self.__has_index(cursor, self.STATUSES_TABLE, 'complex_status_idx'):
+                self.__fetch(cursor, "DELETE FROM {} WHERE code IS NULL".format(self.STATUSES_TABLE))
+                self.__fetch(cursor, """ALTER TABLE {}
+                                        MODIFY code TINYINT UNSIGNED NOT NULL,
+                                        DROP PRIMARY KEY,
+                                        ADD PRIMARY KEY (code),
+                                        ADD UNIQUE KEY complex_status_idx (complex_status)""".format(
+                    self.STATUSES_TABLE))
+            self.__insert_statuses(cursor)
+
+            if not status_is_code:
+                if self.__column_type(cursor, self.UTIMS_TABLE, 'status_code') is None:
+                    self.__fetch(cursor, """ALTER TABLE {} ADD COLUMN status_code TINYINT UNSIGNED NOT NULL
+                                            DEFAULT {}""".format(self.UTIMS_TABLE,
+                                                                 self.STATUS_CODES[self.DEFAULT_STATUS]))
+                self.__fetch(cursor, """UPDATE {db_name} u, {status_db_name} s
+                                        SET u.status_code = s.code
+                                        WHERE u.status = s.complex_status""".format(
+                    db_name=self.UTIMS_TABLE, status_db_name=self.STATUSES_TABLE))
+                self.__fetch(cursor, """ALTER TABLE {} DROP COLUMN status,
+                                        CHANGE status_code status TINYINT UNSIGNED NOT NULL DEFAULT {}""".format(
+                    self.UTIMS_TABLE, self.STATUS_CODES[self.DEFAULT_STATUS]))
+
+            # Binary session keys
+            if self.__column_type(cursor, self.UTIMS_TABLE, 'session_key') == 'char':
+                if self.__column_type(cursor, self.UTIMS_TABLE, 'session_key_bin') is None:
+                    self.__fetch(cursor, "ALTER TABLE {} ADD COLUMN session_key_bin VARBINARY(32)".format(
+                        self.UTIMS_TABLE))
+                self.__fetch(cursor, "UPDATE {} SET session_key_bin = UNHEX(session_key)".format(self.UTIMS_TABLE))
+                self.__fetch(cursor, """ALTER TABLE {} DROP COLUMN session_key,
+                                        CHANGE session_key_bin session_key VARBINARY(32)""".format(self.UTIMS_TABLE))
+
+            # Binary device IDs: IDs stay text (not UNHEX) as they are used verbatim as MQTT topics,
+            # topics are case sensitive and not every topic is hex of fixed length
+            if self.__column_type(cursor, self.UTIMS_TABLE, 'device_id') == 'char':
+                self.__fetch(cursor, "ALTER TABLE {} MODIFY device_id VARBINARY(64) NOT NULL".format(
+                    self.UTIMS_TABLE))
+
+            # Indexes and foreign key to status codes
+            changes = []
+            if not self.__has_index(cursor, self.UTIMS_TABLE, 'status_idx'):
+                changes.append('ADD INDEX status_idx (status)')
+            if not self.__has_index(cursor, self.UTIMS_TABLE, 'update_time_idx'):
+                changes.append('ADD INDEX update_time_idx (update_time)')
+            if not foreign_keys:
+                changes.append('ADD FOREIGN KEY (status) REFERENCES {}(code)'.format(self.STATUSES_TABLE))
+            if changes:
+                self.__fetch(cursor, "ALTER TABLE {} {}".format(self.UTIMS_TABLE, ', '.join(changes)))
+        finally:
+            cursor.close()
+            connection.close()
+
+    def _migrate_to_3(self):
+        """
+        SRP salt and verification key of Utim
+        """
+
+        connection = self.__connect()
+        cursor = connection.cursor()
+        try:
+            changes = []
+            if self.__column_type(cursor, self.UTIMS_TABLE, 'srp_salt') is None:
+                changes.append('ADD COLUMN srp_salt VARBINARY(32) AFTER session_key')
+            if self.__column_type(cursor, self.UTIMS_TABLE, 'srp_vkey') is None:
+                changes.append('ADD COLUMN srp_vkey VARBINARY(512) AFTER srp_salt')
+            if changes:
+                self.__fetch(cursor, "ALTER TABLE {} {}".format(self.UTIMS_TABLE, ', '.join(changes)))
+        finally:
+            cursor.close()
+            connection.close()
+
+    def _migrate_to_4(self):
+        """
+        Master key ID of SRP verifier, verifiers stored before are created again at next handshake
+        """
+
+        connection = self.__connect()
+        cursor = connection.cursor()
+        try:
+            if self.__column_type(cursor, self.UTIMS_TABLE, 'srp_key_id') is None:
+                self.__fetch(cursor, "ALTER TABLE {} ADD COLUMN srp_key_id VARBINARY(8) AFTER srp_vkey".format(
+                    self.UTIMS_TABLE))
+        finally:
+            cursor.close()
+            connection.close()
+
+    def __create_db(self, db_name):
+        connection = self.__connect(database=False)
+        sql = """CREATE DATABASE IF NOT EXISTS {db_name};""".format(db_name=db_name)
+        cursor = connection.cursor()
+        cursor.execute(sql)
+        connection.close()
+
+    def __create_table(self, cursor):
+        sql = """CREATE TABLE IF NOT EXISTS {status_db_name} (
+                    code TINYINT UNSIGNED NOT NULL,
+                    complex_status CHAR(32) NOT NULL,
+                    status CHAR(32),
+                    provision CHAR(32),
+                    network CHAR(32),
+                    security CHAR(32),
+                    PRIMARY KEY (code),
+                    UNIQUE KEY complex_status_idx (complex_status));""".format(status_db_name=self.STATUSES_TABLE)
+        logging.debug(sql)
+        cursor.execute(sql)
+        sql = """CREATE TABLE IF NOT EXISTS {sub_db_name} (
+                    sub_id INT NOT NULL AUTO_INCREMENT,
+                    sub_name CHAR(64),
+                    sub_type CHAR(32),
+                    host_name CHAR(64),
+                    shared_access_key_name CHAR(32),
+                    shared_access_key CHAR(64),
+                    auth_method CHAR(32),
+                    region CHAR(32),
+                    PRIMARY KEY (sub_id));""".format(sub_db_name=self.SUBS_TABLE)
+        logging.debug(sql)
+        cursor.execute(sql)
+        # device_id is the device topic as is: case sensitive binary text, not UNHEX of it
+        sql = """CREATE TABLE IF NOT EXISTS {db_name} (
+                    device_id VARBINARY(64) NOT NULL,
+                    name CHAR(64),
+                    session_key VARBINARY(32),
+                    srp_salt VARBINARY(32),
+                    srp_vkey VARBINARY(512),
+                    srp_key_id VARBINARY(8),
+                    config_hash CHAR(64),
+                    keep_alive_counter INT DEFAULT 0,
+                    status TINYINT UNSIGNED NOT NULL DEFAULT {default_status},
+                    update_time TIMESTAMP,
+                    sub_id INT,
+                    PRIMARY KEY (device_id),
+                    INDEX status_idx (status),
+                    INDEX update_time_idx (update_time),
+                    FOREIGN KEY (sub_id) REFERENCES {sub_db_name}(sub_id),
+                    FOREIGN KEY (status) REFERENCES {status_db_name}(code));""".format(
+            db_name=self.UTIMS_TABLE, sub_db_name=self.SUBS_TABLE, status_db_name=self.STATUSES_TABLE,
+            default_status=self.STATUS_CODES[self.DEFAULT_STATUS]
+        )
+        logging.debug(sql)
+        cursor.execute(sql)
+
+    def __insert_statuses(self, cursor):
+        logging.debug('Start inserting')
+        if self.__column_type(cursor, self.STATUSES_TABLE, 'code') is None:
+            # Statuses of schema version 1 are added by migration
+            return
+
+        sql = """INSERT IGNORE INTO {table_name} (code, complex_status, status, network, security)
+                 VALUES (%s, %s, %s, %s, %s);""".format(table_name=self.STATUSES_TABLE)
+        for item in self.STATUSES:
+            logging.debug(item)
+            cursor.execute(sql, item)
+
+        logging.debug('End inserting')
@@ -0,0 +1,168 @@
+"""
+Priority scheduler module
+
+Weighted round robin over message classes
+"""
+
+import collections
+import itertools
+from .message_class import MessageClass
+
+
+class PriorityScheduler(object):
+    """
+    Priority scheduler class
+
+    Items are kept in one FIFO per message class. Every round each class with
+    pending items may yield up to its weight items, more important classes
+    first, so handshakes jump ahead of bulk data but data is never starved.
+    Items can be taken in arrival order too, and the oldest item of a class
+    can be dropped in O(1), so the scheduler is the storage of class queues.
+    Items put with a key (device ID) keep their order: while the key has pending
+    items, its new items join their class, so classes are prioritized between
+    devices and never reorder items of one device.
+    The scheduler is not thread-safe: its owner (worker or queue) locks it.
+    """
+
+    DEFAULT_WEIGHTS = {
+        MessageClass.HANDSHAKE: 8,
+        MessageClass.CONTROL: 4,
+        MessageClass.DATA: 2,
+        MessageClass.KEEPALIVE: 1
+    }
+
+    def __init__(self, weights=None, counter=None):
+        """
+        Initialization
+
+        :param dict weights: {message class: items per round}
+        :param counter: Iterator of arrival numbers (shared by schedulers to compare their items' age)
+        """
+
+        self.__weights = dict(self.DEFAULT_WEIGHTS)
+        if weights:
+            for message_class, weight in weights.items():
+                self.__weights[message_class] = max(1, int(weight))
+        self.__classes = sorted(self.__weights)
+        self.__items = {message_class: collections.deque() for message_class in self.__classes}
+        self.__credits = dict(self.__weights)
+        self.__keys = dict()  # {key: [message class, number of pending items]}
+        self.__length = 0
+        self.__counter = counter if counter is not None else itertools.count()
+
+    def __len__(self):
+        return self.__length
+
+    def empty(self):
+        """
+        Check scheduler is empty or not
+        """
+
+        return self.__length == 0
+
+    def put(self, message_class, item, key=None):
+        """
+        Put item
+
+        :param int message_class: Message class of item
+        :param item: Item
+        :param key: Key of items keeping their order (None - item is not ordered with others)
+        """
+
+        if message_class not in self.__items:
+            message_class = MessageClass.DATA
+        if key is not None:
+            pending = self.__keys.get(key)
+            if pending is None:
+                self.__keys[key] = [message_class, 1]
+            else:
+                message_class = pending[0]
+                pending[1] += 1
+        self.__items[message_class].append((next(self.__counter), key, item))
+        self.__length += 1
+
+    def __take(self, items):
+        """
+        Pop the first item of class FIFO
+        """
+
+        _, key, item = items.popleft()
+        self.__length -= 1
+        if key is not None:
+            pending = self.__keys[key]
+            pending[1] -= 1
+            if pending[1] == 0:
+                del self.__keys[key]
+        return item
+
+    def pop(self):
+        """
+        Pop next item
+
+        :return: Item or None if scheduler is empty
+        """
+
+        if self.__length == 0:
+            return None
+
+        for _ in range(2):
+            for message_class in self.__classes:
+                if self.__items[message_class] and self.__credits[message_class] > 0:
+                    self.__credits[message_class] -= 1
+                    return self.__take(self.__items[message_class])
+
+            # Every class with pending items spent its credits: start new round
+            self.__credits = dict(self.__weights)
+
+        return None
+
+    def pop_oldest(self):
+        """
+        Pop item in arrival order regardless of its class
+
+        :return: Item or None if scheduler is empty
+        """
+
+        oldest = None
+        for message_class in self.__classes:
+            items = self.__items[message_class]
+            if items and (oldest is None or items[0][0] < self.__items[oldest][0][0]):
+                oldest = message_class
+
+        return self.drop(oldest) if oldest is not None else None
+
+    def least_important(self):
+        """
+        Get the least important class with pending items
+
+        :return int: Message class or None if scheduler is empty
+        """
+
+        for message_class in reversed(self.__classes):
+            if self.__items[message_class]:
+                return message_class
+        return None
+
+    def oldest(self, message_class):
+        """
+        Get arrival number of the oldest item of message class
+
+        :param int message_class: Message class
+        :return int: Arrival number or None if class has no pending items
+        """
+
+        items = self.__items.get(message_class)
+        return items[0][0] if items else None
+
+    def drop(self, message_class):
+        """
+        Pop the oldest item of message class
+
+        :param int message_class: Message class
+        :return: Item or None if class has no pending items
+        """
+
+        items = self.__items.get(message_class)
+        if not items:
+            return None
+        return self.__take(items)
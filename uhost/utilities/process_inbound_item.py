@@ -5,6 +5,8 @@ Process item from queue module
 import logging
 from .tag import Tag
 from .cryptography import CryptoLayer
+from .message_class import MessageClass
+from .deferred_call import DeferredCall
 from ..workers.command_worker_check import CommandWorkerCheck
 from ..workers.command_worker_cleanup import CommandWorkerCleanup
 from ..workers.command_worker_for_signature import CommandWorkerForSignature
@@ -124,24 +126,42 @@ class ProcessInboundItem(object):
         Run worker to process data
         """
 
+        frame = tlv_data if isinstance(tlv_data, DeferredCall) else self.open_frame(tlv_data)
+        if frame is not None:
+            self.dispatch(frame)
+
+    def open_frame(self, tlv_data, session_keys=None):
+        """
+        Check, unsign and decrypt data
+
+        :param tlv_data: [topic, payload]
+        :param dict session_keys: {devid: session key} of existing Utims resolved in advance
+        :return: [devid, payload, flag_encrypted, utim_exists] or None if data is invalid,
+            utim_exists is None if it was not resolved in advance
+        """
+
         # Check tlv_data
         try:
             self.__check_tlv_data(tlv_data)
         except ProcessInboundItemTlvLengthException:
             logging.error("Invalid TLV length exception")
-            return
+            return None
         except ProcessInboundItemTlvTypeException:
             logging.error("Invalid TLV type exception")
-            return
+            return None
 
         devid = tlv_data[0].decode()
         payload = tlv_data[1]
         flag_encrypted = False
         crypto = None
+        utim_exists = None if session_keys is None else devid in session_keys
 
         if CryptoLayer.is_secured(payload):
             flag_encrypted = True
-            crypto = CryptoLayer(self.__uhost.get_session_key(devid))
+            if session_keys is None:
+                crypto = CryptoLayer(self.__uhost.get_session_key(devid))
+            else:
+                crypto = CryptoLayer(session_keys.get(devid))
         else:
             crypto = CryptoLayer(None)
 
@@ -154,40 +174,114 @@ class ProcessInboundItem(object):
         logging.debug("Topic: %s", str(devid))
         logging.debug("Payload: %s", str(payload))
 
-        if payload is not None:
+        if payload is None:
+            logging.debug("There was a critical flaw in message")
+            return None
+
+        return [devid, payload, flag_encrypted, utim_exists]
+
+    def open_frames(self, items):
+        """
+        Open batch of data, Utims and session keys of the batch are resolved in one query
+
+        :param list items: List of [topic, payload]
+        :return list: Opened frames (see open_frame)
+        """
+
+        devids = []
+        for tlv_data in items:
+            if isinstance(tlv_data, DeferredCall):
+                continue
+            try:
+                if len(tlv_data) == self.TLV_DATA_LENGTH and isinstance(tlv_data[0], bytes):
+                    devids.append(tlv_data[0].decode())
+            except (UnicodeDecodeError, TypeError):
+                pass
+
+        session_keys = self.__uhost.database.get_session_keys(devids)
+        frames = []
+        for tlv_data in items:
+            if isinstance(tlv_data, DeferredCall):
+                frames.append(tlv_data)
+                continue
+            try:
+                frame = self.open_frame(tlv_data, session_keys)
+            except UnicodeDecodeError:
+                logging.error("Invalid topic: %s", tlv_data[0])
+                continue
+            if frame is not None:
+                frames.append(frame)
+        return frames
+
+    @staticmethod
+    def frame_class(frame):
+        """
+        Get MessageClass of opened frame
+
+        :param frame: [devid, payload, flag_encrypted, utim_exists] or DeferredCall
+        """
+
+        if isinstance(frame, DeferredCall):
+            return frame.message_class
+        return MessageClass.of_payload(frame[1])
+
+    @staticmethod
+    def frame_key(frame):
+        """
+        Get device ID of opened frame
+
+        :param frame: [devid, payload, flag_encrypted, utim_exists] or DeferredCall
+        """
 
-            # Check utim name (devid) is valid or not
-            if devid in self.__uhost.database.get_utim_names():
-                # Get tag
-                tag = payload[0:1]
+        if isinstance(frame, DeferredCall):
+            return frame.devid
+        return frame[0]
 
-                if tag == Tag.UCOMMAND.HELLO:
-                    self.__hello_worker.process(devid, payload, self.__outbound_data_queue)
+    def dispatch(self, frame):
+        """
+        Run worker for opened frame
+
+        :param frame: [devid, payload, flag_encrypted, utim_exists] or DeferredCall
+        """
+
+        if isinstance(frame, DeferredCall):
+            frame.run()
+            return
+
+        devid, payload, flag_encrypted, utim_exists = frame
+        if utim_exists is None:
+            utim_exists = self.__uhost.database.does_utim_exist(devid)
 
-                elif tag == Tag.UCOMMAND.CHECK:
-                    self.__check_worker.process(devid, payload, self.__outbound_data_queue)
+        # Check utim name (devid) is valid or not
+        if utim_exists:
+            # Get tag
+            tag = payload[0:1]
 
-                elif tag == Tag.UCOMMAND.TRUSTED and flag_encrypted:
-                    self.__trusted_worker.process(devid, payload, self.__outbound_data_queue)
+            if tag == Tag.UCOMMAND.HELLO:
+                self.__hello_worker.process(devid, payload, self.__outbound_data_queue,
+                                            self.__inbound_data_queue)
 
-                elif tag == Tag.UCOMMAND.SIGNED and flag_encrypted:
-                    self.__signed_worker.process(devid, payload, self.__outbound_data_queue)
+            elif tag == Tag.UCOMMAND.CHECK:
+                self.__check_worker.process(devid, payload, self.__outbound_data_queue)
 
-                elif tag == Tag.UCOMMAND.VERIFIED and flag_encrypted:
-                    self.__authentic_worker.process(devid, payload, self.__outbound_data_queue)
+            elif tag == Tag.UCOMMAND.TRUSTED and flag_encrypted:
+                self.__trusted_worker.process(devid, payload, self.__outbound_data_queue)
 
-                elif tag == Tag.UCOMMAND.CONNECTION_STRING and flag_encrypted:
-                    self.__connection_status_worker.process(devid, payload, self.__outbound_data_queue,
-                                                            self.__inbound_data_queue)
+            elif tag == Tag.UCOMMAND.SIGNED and flag_encrypted:
+                self.__signed_worker.process(devid, payload, self.__outbound_data_queue)
 
-                elif tag == Tag.UCOMMAND.KEEPALIVE_ANSWER and flag_encrypted:
-                    self.__keepalive_worker.process(devid, payload, self.__outbound_data_queue)
+            elif tag == Tag.UCOMMAND.VERIFIED and flag_encrypted:
+                self.__authentic_worker.process(devid, payload, self.__outbound_data_queue)
 
-                else:
-                    self.__cleanup_worker.process(devid, payload, self.__outbound_data_queue)
+            elif tag == Tag.UCOMMAND.CONNECTION_STRING and flag_encrypted:
+                self.__connection_status_worker.process(devid, payload, self.__outbound_data_queue,
+                                                        self.__inbound_data_queue)
+
+            elif tag == Tag.UCOMMAND.KEEPALIVE_ANSWER and flag_encrypted:
+                self.__keepalive_worker.process(devid, payload, self.__outbound_data_queue)
 
             else:
-                logging.debug("Invalid utim name: %s", devid)
+                self.__cleanup_worker.process(devid, payload, self.__outbound_data_queue)
 
         else:
-            logging.debug("There was a critical flaw in message")
+            logging.debug("Invalid utim name: %s", devid)
@@ -0,0 +1,63 @@
+"""
+Sharded storage backend module
+
+Utims of the Uhost spread over several MySQL servers by hash of Utim ID
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from .hash_ring import HashRing
+from .mysql_backend import MySqlBackend
+from .storage_backend import StorageBackend
+
+
+class ShardedBackend(StorageBackend):
+    """
+    Sharded storage backend class
+
+    Every shard is MySQL backend with the same schema. Utim is kept by shard
+    chosen by consistent hashing of its ID, shard is identified by its host.
+    Statements of Uhost-wide tables (subscriptions) run on the first shard,
+    every shard keeps the same subscriptions referenced by its Utims.
+    """
+
+    def __init__(self, cfg):
+        """
+        Initialization
+
+        :param config.Config cfg: Config
+        """
+
+        self.__shards = [MySqlBackend(cfg, host) for host in cfg.db_shards]
+        self.__hosts = dict(zip(cfg.db_shards, self.__shards))
+        self.__ring = HashRing(cfg.db_shards)
+        self.__executor = ThreadPoolExecutor(max_workers=len(self.__shards))
+
+    @property
+    def name(self):
+        return self.__shards[0].name
+
+    @property
+    def shards(self):
+        return list(self.__shards)
+
+    def shard_for(self, devid):
+        return self.__hosts[self.__ring.node_for(devid)]
+
+    def map_shards(self, function, shards=None):
+        shards = self.__shards if shards is None else list(shards)
+        if len(shards) == 1:
+            return [function(shards[0])]
+        futures = [self.__executor.submit(function, shard) for shard in shards]
+        return [future.result() for future in futures]
+
+    def create(self):
+        self.map_shards(lambda shard: shard.create())
+
+    def execute(self, sql, params=None, raise_error=False, replica=False):
+        return self.__shards[0].execute(sql, params, raise_error, replica)
+
+    def schema_version(self):
+        return min(self.map_shards(lambda shard: shard.schema_version()))
+
+    def migrate(self):
+        return min(self.map_shards(lambda shard: shard.migrate()))
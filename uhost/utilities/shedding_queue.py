@@ -0,0 +1,325 @@
+"""
+Shedding queue module
+
+Bounded queues which drop the least important items first when they are full
+"""
+
+import collections
+import itertools
+import logging
+import queue
+import threading
+import time
+import zlib
+from .message_class import MessageClass
+from .deferred_call import DeferredCall
+from .priority_scheduler import PriorityScheduler
+
+
+def shard_of(key, shards):
+    """
+    Get shard index for routing key
+
+    :param key: Routing key (str or bytes)
+    :param int shards: Number of shards
+    :return int: Shard index
+    """
+
+    if isinstance(key, str):
+        key = key.encode()
+    if not isinstance(key, (bytes, bytearray)):
+        return 0
+    return zlib.crc32(key) % shards
+
+
+class LoadShedder(object):
+    """
+    Load shedding policy class
+
+    When a queue is full the shedder chooses an item to drop: the least important
+    class (highest MessageClass value) goes first. Within that class the oldest
+    queued item is dropped (drop_oldest) or the incoming one is rejected
+    (reject_newest). The block policy makes producers wait for free space first
+    and sheds as reject_newest on timeout: a less important item is dropped to
+    make room, otherwise the incoming item is rejected.
+    """
+
+    POLICY_DROP_OLDEST = 'drop_oldest'
+    POLICY_REJECT_NEWEST = 'reject_newest'
+    POLICY_BLOCK = 'block'
+
+    POLICIES = (POLICY_DROP_OLDEST, POLICY_REJECT_NEWEST, POLICY_BLOCK)
+
+    def __init__(self, name, policy=POLICY_DROP_OLDEST, classify=None):
+        """
+        Initialization
+
+        :param str name: Queue name (for logging)
+        :param str policy: Shedding policy
+        :param classify: Callable to get MessageClass of item
+        """
+
+        if policy not in self.POLICIES:
+            raise ValueError('Unknown shedding policy: {}'.format(policy))
+
+        self.__name = name
+        self.__policy = policy
+        self.__classify = classify if classify is not None else (lambda item: MessageClass.DATA)
+        self.__drops = dict()
+        self.__lock = threading.Lock()
+
+    @property
+    def name(self):
+        return self.__name
+
+    @property
+    def policy(self):
+        return self.__policy
+
+    @property
+    def drops(self):
+        """
+        Number of dropped items by message class name
+        """
+
+        with self.__lock:
+            return dict(self.__drops)
+
+    def classify(self, item):
+        """
+        Get MessageClass of item
+        """
+
+        return self.__classify(item)
+
+    def shed(self, items, item):
+        """
+        Make room for item in full queue
+
+        Queued items are kept per message class, so the victim is found without
+        scanning the queue.
+
+        :param items: Queued items (PriorityScheduler or ClassQueue with mutex held)
+        :param item: Incoming item
+        :return bool: True if victim was removed from items, False if incoming item is rejected
+        """
+
+        item_class = self.__classify(item)
+
+        # The least important class with queued items not more important than incoming one
+        victim_class = items.least_important()
+        if victim_class is None or victim_class < item_class or \
+                (victim_class == item_class and self.__policy != self.POLICY_DROP_OLDEST):
+            self.__count(item_class)
+            return False
+
+        items.drop(victim_class)
+        self.__count(victim_class)
+        return True
+
+    def __count(self, message_class):
+        """
+        Count dropped item
+        """
+
+        name = MessageClass.NAMES.get(message_class, str(message_class))
+        with self.__lock:
+            count = self.__drops.get(name, 0) + 1
+            self.__drops[name] = count
+
+        if count == 1 or count % 1000 == 0:
+            logging.warning("Queue '%s' is full, %d %s item(s) dropped", self.__name, count, name)
+        else:
+            logging.debug("Queue '%s' is full, %s item dropped", self.__name, name)
+
+
+class ClassQueue(queue.Queue):
+    """
+    Queue keeping one FIFO per message class
+
+    Items are got in arrival order, or in PriorityScheduler order of their
+    classes if weights are set, so items of important classes do not wait
+    behind the whole backlog. Items of one device (key) keep their order
+    either way. Put blocks while the queue is full as in queue.Queue.
+
+    The queue may be split into partitions by a hash of item key (device ID by
+    default): every consumer gets items of its own partition, so items of one
+    device go to one consumer, while all partitions share the capacity.
+
+    Deferred calls are kept apart from frames and got first: they finish work
+    already done in background and are never dropped to shed load.
+    """
+
+    def __init__(self, maxsize=0, classify=None, weights=None, partitions=1, key=None):
+        """
+        Initialization
+
+        :param int maxsize: Queue capacity of all partitions (0 - unbounded)
+        :param classify: Callable to get MessageClass of item
+        :param dict weights: PriorityScheduler weights (None - arrival order)
+        :param int partitions: Number of partitions
+        :param key: Callable to get device ID of item (item[0] by default)
+        """
+
+        self.classify = classify if classify is not None else (lambda item: MessageClass.DATA)
+        self.weights = weights
+        self.partitions = max(1, int(partitions))
+        self.key = key if key is not None else self.default_key
+        super().__init__(maxsize)
+        # Consumers of a partition wait for its items only
+        self.not_empty_partitions = [threading.Condition(self.mutex) for _ in range(self.partitions)]
+
+    @staticmethod
+    def default_key(item):
+        """
+        Get default partition key of item (device ID or topic)
+        """
+
+        return item[0]
+
+    def _init(self, maxsize):
+        counter = itertools.count()
+        self.queue = [PriorityScheduler(self.weights, counter) for _ in range(self.partitions)]
+        self.calls = [collections.deque() for _ in range(self.partitions)]
+
+    def _qsize(self):
+        return sum(len(items) for items in self.queue) + sum(len(calls) for calls in self.calls)
+
+    def _put(self, item):
+        index = self.partition_of(item)
+        if isinstance(item, DeferredCall):
+            self.calls[index].append(item)
+        else:
+            self.queue[index].put(self.classify(item), item, self.key_of(item))
+        self.not_empty_partitions[index].notify()
+
+    def key_of(self, item):
+        """
+        Get device ID of item
+
+        :return: Device ID or None if item has no device ID
+        """
+
+        try:
+            return self.key(item)
+        except (IndexError, KeyError, TypeError):
+            return None
+
+    def partition_of(self, item):
+        """
+        Get partition index of item
+        """
+
+        if self.partitions == 1:
+            return 0
+        return shard_of(self.key_of(item), self.partitions)
+
+    def get(self, block=True, timeout=None, partition=0):
+        """
+        Get item of partition
+
+        :param int partition: Partition index
+        """
+
+        items = self.queue[partition]
+        calls = self.calls[partition]
+        not_empty = self.not_empty_partitions[partition]
+        with not_empty:
+            if not block:
+                if not items and not calls:
+                    raise queue.Empty
+            elif timeout is None:
+                while not items and not calls:
+                    not_empty.wait()
+            elif timeout < 0:
+                raise ValueError("'timeout' must be a non-negative number")
+            else:
+                deadline = time.monotonic() + timeout
+                while not items and not calls:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0.0:
+                        raise queue.Empty
+                    not_empty.wait(remaining)
+            if calls:
+                item = calls.popleft()
+            else:
+                item = items.pop() if self.weights is not None else items.pop_oldest()
+            self.not_full.notify()
+            return item
+
+    def least_important(self):
+        """
+        Get the least important class with queued items (call with mutex held)
+
+        :return int: Message class or None if queue is empty
+        """
+
+        classes = [items.least_important() for items in self.queue]
+        classes = [message_class for message_class in classes if message_class is not None]
+        return max(classes) if classes else None
+
+    def drop(self, message_class):
+        """
+        Drop the oldest queued item of message class (call with mutex held)
+
+        :param int message_class: Message class
+        :return: Item or None if class has no queued items
+        """
+
+        oldest = None
+        for items in self.queue:
+            age = items.oldest(message_class)
+            if age is not None and (oldest is None or age < oldest[0]):
+                oldest = (age, items)
+        return oldest[1].drop(message_class) if oldest is not None else None
+
+
+class SheddingQueue(ClassQueue):
+    """
+    Bounded queue with load shedding
+
+    put() never waits longer than the policy allows: if the queue is full and the
+    incoming item is rejected, queue.Full is raised. Deferred calls are put
+    regardless of capacity.
+    """
+
+    def __init__(self, maxsize=0, shedder=None, block_timeout=None, weights=None, partitions=1, key=None):
+        """
+        Initialization
+
+        :param int maxsize: Queue capacity of all partitions (0 - unbounded)
+        :param LoadShedder shedder: Load shedding policy
+        :param float block_timeout: Default time to wait for free space (block policy)
+        :param dict weights: PriorityScheduler weights (None - arrival order)
+        :param int partitions: Number of partitions
+        :param key: Callable to get device ID of item (item[0] by default)
+        """
+
+        self.shedder = shedder if shedder is not None else LoadShedder('queue')
+        self.block_timeout = block_timeout
+        super().__init__(maxsize, self.shedder.classify, weights, partitions, key)
+
+    def put(self, item, block=True, timeout=None):
+        """
+        Put item, shed load if queue is full
+        """
+
+        if self.maxsize <= 0 or isinstance(item, DeferredCall):
+            with self.not_full:
+                self._put(item)
+                self.unfinished_tasks += 1
+            return
+
+        if block and self.shedder.policy == LoadShedder.POLICY_BLOCK:
+            try:
+                return super().put(item, True, timeout if timeout is not None else self.block_timeout)
+            except queue.Full:
+                pass
+
+        with self.not_full:
+            if self._qsize() >= self.maxsize:
+                if not self.shedder.shed(self, item):
+                    raise queue.Full
+                self.unfinished_tasks -= 1
+            self._put(item)
+            self.unfinished_tasks += 1
@@ -0,0 +1,227 @@
+"""
+SQLite storage backend module
+
+Embedded storage for gateways serving a few hundred Utims
+"""
+
+import datetime
+import logging
+import sqlite3
+import threading
+from .storage_backend import StorageBackend, StorageBackendException
+
+
+class SqliteBackend(StorageBackend):
+    """
+    SQLite storage backend class
+
+    Database file is opened in WAL mode, so readers do not wait for the
+    writer. Every thread uses its own connection in autocommit mode, sqlite3
+    keeps compiled statements of each connection.
+    """
+
+    MAX_TRIES = 3
+    BUSY_TIMEOUT = 5  # Seconds to wait for lock of another writer
+    CACHED_STATEMENTS = 256  # Compiled statements kept per connection
+    MAX_PARAMS = 999  # Default SQLITE_MAX_VARIABLE_NUMBER of SQLite before 3.32
+
+    def __init__(self, cfg):
+        """
+        Initialization
+
+        :param config.Config cfg: Config
+        """
+
+        self.__uhost_name = 'uhost_' + cfg.uhost_name
+        self.__path = cfg.sqlite_path or self.__uhost_name + '.sqlite'
+        self.__local = threading.local()
+        self.__statements = dict()  # {MySQL style SQL: SQLite SQL}
+
+    @property
+    def name(self):
+        return self.__path
+
+    def __connection(self):
+        """
+        Get connection of current thread
+        """
+
+        connection = getattr(self.__local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.__path, timeout=self.BUSY_TIMEOUT, isolation_level=None,
+                                         cached_statements=self.CACHED_STATEMENTS)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('PRAGMA foreign_keys=ON')
+            self.__local.connection = connection
+        return connection
+
+    def __translate(self, sql):
+        """
+        Replace %s placeholders by SQLite ones
+        """
+
+        statement = self.__statements.get(sql)
+        if statement is None:
+            statement = sql.replace('%s', '?')
+            self.__statements[sql] = statement
+        return statement
+
+    @staticmethod
+    def __adapt(params):
+        """
+        Convert parameters to types stored by SQLite
+        """
+
+        if params is None:
+            return ()
+        return [value.isoformat(' ') if isinstance(value, datetime.datetime) else value for value in params]
+
+    def __create_statuses(self, connection):
+        sql = """CREATE TABLE IF NOT EXISTS {status_db_name} (
+                    code INTEGER NOT NULL PRIMARY KEY,
+                    complex_status TEXT NOT NULL UNIQUE,
+                    status TEXT,
+                    provision TEXT,
+                    network TEXT,
+                    security TEXT);""".format(status_db_name=self.STATUSES_TABLE)
+        logging.debug(sql)
+        connection.execute(sql)
+        sql = """INSERT OR IGNORE INTO {table_name} (code, complex_status, status, network, security)
+                 VALUES (?, ?, ?, ?, ?);""".format(table_name=self.STATUSES_TABLE)
+        connection.executemany(sql, self.STATUSES)
+
+    def __create_utims(self, connection):
+        sql = """CREATE TABLE IF NOT EXISTS {db_name} (
+                    device_id TEXT NOT NULL PRIMARY KEY,
+                    name TEXT,
+                    session_key BLOB,
+                    srp_salt BLOB,
+                    srp_vkey BLOB,
+                    srp_key_id BLOB,
+                    config_hash TEXT,
+                    keep_alive_counter INTEGER DEFAULT 0,
+                    status INTEGER NOT NULL DEFAULT {default_status} REFERENCES {status_db_name}(code),
+                    update_time TIMESTAMP,
+                    sub_id INTEGER REFERENCES {sub_db_name}(sub_id)) WITHOUT ROWID;""".format(
+            db_name=self.UTIMS_TABLE, sub_db_name=self.SUBS_TABLE, status_db_name=self.STATUSES_TABLE,
+            default_status=self.STATUS_CODES[self.DEFAULT_STATUS]
+        )
+        logging.debug(sql)
+        connection.execute(sql)
+
+    def __create_indexes(self, connection):
+        for column in ('status', 'update_time'):
+            connection.execute("CREATE INDEX IF NOT EXISTS {db_name}_{column}_idx ON {db_name} ({column})".format(
+                db_name=self.UTIMS_TABLE, column=column))
+
+    def create(self):
+        connection = self.__connection()
+        if self.schema_version() != 0:
+            self.migrate()
+            return
+
+        self.__create_statuses(connection)
+        sql = """CREATE TABLE IF NOT EXISTS {sub_db_name} (
+                    sub_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    sub_name TEXT,
+                    sub_type TEXT,
+                    host_name TEXT,
+                    shared_access_key_name TEXT,
+                    shared_access_key TEXT,
+                    auth_method TEXT,
+                    region TEXT);""".format(sub_db_name=self.SUBS_TABLE)
+        logging.debug(sql)
+        connection.execute(sql)
+        self.__create_utims(connection)
+        self.__create_indexes(connection)
+        self._set_schema_version(self.SCHEMA_VERSION)
+
+    def schema_version(self):
+        connection = self.__connection()
+        tables = [row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        if self.VERSION_TABLE in tables:
+            fetch = connection.execute("SELECT MAX(version) FROM {}".format(self.VERSION_TABLE)).fetchall()
+            if fetch and fetch[0][0] is not None:
+                return fetch[0][0]
+        if self.UTIMS_TABLE in tables:
+            return 1
+        return 0
+
+    def _set_schema_version(self, version):
+        connection = self.__connection()
+        connection.execute("CREATE TABLE IF NOT EXISTS {} (version INTEGER NOT NULL)".format(self.VERSION_TABLE))
+        connection.execute("DELETE FROM {}".format(self.VERSION_TABLE))
+        connection.execute("INSERT INTO {} (version) VALUES (?)".format(self.VERSION_TABLE), (version,))
+
+    def _migrate_to_2(self):
+        """
+        Binary session keys, status codes, secondary indexes
+
+        SQLite can not change column types, so statuses and udata tables are
+        rebuilt in one transaction.
+        """
+
+        connection = self.__connection()
+        connection.execute('PRAGMA foreign_keys=OFF')
+        try:
+            connection.execute('BEGIN')
+            rows = connection.execute("""SELECT device_id, name, session_key, config_hash, keep_alive_counter,
+                                                status, update_time, sub_id
+                                         FROM {}""".format(self.UTIMS_TABLE)).fetchall()
+            connection.execute("DROP TABLE {}".format(self.UTIMS_TABLE))
+            connection.execute("DROP TABLE {}".format(self.STATUSES_TABLE))
+            self.__create_statuses(connection)
+            self.__create_utims(connection)
+            default_status = self.STATUS_CODES[self.DEFAULT_STATUS]
+            connection.executemany("""INSERT INTO {} (device_id, name, session_key, config_hash, keep_alive_counter,
+                                                      status, update_time, sub_id)
+                                      VALUES (?, ?, ?, ?, ?, ?, ?, ?)""".format(self.UTIMS_TABLE),
+                                   [(row[0], row[1], bytes.fromhex(row[2]) if row[2] is not None else None, row[3],
+                                     row[4], self.STATUS_CODES.get(row[5], default_status), row[6], row[7])
+                                    for row in rows])
+            self.__create_indexes(connection)
+            connection.execute('COMMIT')
+        except sqlite3.Error:
+            connection.execute('ROLLBACK')
+            raise
+        finally:
+            connection.execute('PRAGMA foreign_keys=ON')
+
+    def _migrate_to_3(self):
+        """
+        SRP salt and verification key of Utim
+        """
+
+        connection = self.__connection()
+        columns = [row[1] for row in connection.execute("PRAGMA table_info({})".format(self.UTIMS_TABLE))]
+        for column in ('srp_salt', 'srp_vkey'):
+            if column not in columns:
+                connection.execute("ALTER TABLE {} ADD COLUMN {} BLOB".format(self.UTIMS_TABLE, column))
+
+    def _migrate_to_4(self):
+        """
+        Master key ID of SRP verifier, verifiers stored before are created again at next handshake
+        """
+
+        connection = self.__connection()
+        columns = [row[1] for row in connection.execute("PRAGMA table_info({})".format(self.UTIMS_TABLE))]
+        if 'srp_key_id' not in columns:
+            connection.execute("ALTER TABLE {} ADD COLUMN srp_key_id BLOB".format(self.UTIMS_TABLE))
+
+    def execute(self, sql, params=None, raise_error=False, replica=False):
+        statement = self.__translate(sql)
+        params = self.__adapt(params)
+        tries = 0
+        while tries < self.MAX_TRIES:
+            try:
+                cursor = self.__connection().execute(statement, params)
+                if cursor.description is None:
+                    return None
+                return cursor.fetchall()
+            except sqlite3.Error as er:
+                logging.debug(sql)
+                logging.debug(er)
+                tries = tries + 1
+                if raise_error and tries >= self.MAX_TRIES:
+                    raise StorageBackendException(str(er))
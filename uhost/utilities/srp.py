@@ -16,54 +16,103 @@
 import hashlib
 import os
 import binascii
+import threading
 import six
 
+try:
+    import gmpy2
+except ImportError:  # Optional, built-in arithmetic is used without it
+    gmpy2 = None
+
 SHA256 = 0
 
 NG_1024 = 0
 NG_CUSTOM = 1
+NG_2048 = 2
+NG_3072 = 3
 
 _hash_map = {SHA256: hashlib.sha256}
 
-_ng_const = (
-    # 1024-bit
-    ('''\
+# Groups of RFC 5054, appendix A
+_ng_const = {
+    NG_1024: ('''\
 EEAF0AB9ADB38DD69C33F80AFA8FC5E86072618775FF3C0B9EA2314C9C256576D674DF7496\
 EA81D3383B4813D692C6E0E0D5D8E250B98BE48E495C1D6089DAD15DC7D7B46154D6B6CE8E\
 F4AD69B15D4982559B297BCF1885C529F566660E57EC68EDBC3C05726CC02FD4CBF4976EAA\
 9AFD5138FE8376435B9FC61D2FC0EB06E3''',
-     "2"),
-)
+              "2"),
+    NG_2048: ('''\
+AC6BDB41324A9A9BF166DE5E1389582FAF72B6651987EE07FC3192943DB56050A37329CBB4\
+A099ED8193E0757767A13DD52312AB4B03310DCD7F48A9DA04FD50E8083969EDB767B0CF60\
+95179A163AB3661A05FBD5FAAAE82918A9962F0B93B855F97993EC975EEAA80D740ADBF4FF\
+747359D041D5C33EA71D281E446B14773BCA97B43A23FB801676BD207A436C6481F1D2B907\
+8717461A5B9D32E688F87748544523B524B0D57D5EA77A2775D2ECFA032CFBDBF52FB37861\
+60279004E57AE6AF874E7303CE53299CCC041C7BC308D82A5698F3A8D0C38271AE35F8E9DB\
+FBB694B5C803D89F7AE435DE236D525F54759B65E372FCD68EF20FA7111F9E4AFF73''',
+              "2"),
+    NG_3072: ('''\
+FFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD129024E088A67CC74020BBEA63B\
+139B22514A08798E3404DDEF9519B3CD3A431B302B0A6DF25F14374FE1356D6D51C245E485\
+B576625E7EC6F44C42E9A637ED6B0BFF5CB6F406B7EDEE386BFB5A899FA5AE9F24117C4B1F\
+E649286651ECE45B3DC2007CB8A163BF0598DA48361C55D39A69163FA8FD24CF5F83655D23\
+DCA3AD961C62F356208552BB9ED529077096966D670C354E4ABC9804F1746C08CA18217C32\
+905E462E36CE3BE39E772C180E86039B2783A2EC07A28FB5C55DF06F4C52C9DE2BCBF69558\
+17183995497CEA956AE515D2261898FA051015728E5A8AAAC42DAD33170D04507A33A85521\
+ABDF1CBA64ECFB850458DBEF0A8AEA71575D060C7DB3970F85A6E1E4C7ABF5AE8CDB0933D7\
+1E8C94E04A25619DCEE3D2261AD2EE6BF12FFA06D98A0864D87602733EC86A64521F2B1817\
+7B200CBBE117577A615D6C770988C0BAD946E208E24FA074E5AB3143DB5BFCE0FD108E4B82\
+D120A93AD2CAFFFFFFFFFFFFFFFF''',
+              "5"),
+}
 
 
 def get_ng(ng_type, n_hex, g_hex):
-    if ng_type < NG_CUSTOM:
+    if ng_type != NG_CUSTOM:
         n_hex, g_hex = _ng_const[ng_type]
     return int(n_hex, 16), int(g_hex, 16)
 
 
+# Arithmetic backends: (modular exponentiation, conversion of number to backend type)
+_arithmetic_map = {'builtin': (pow, int)}
+if gmpy2 is not None:
+    _arithmetic_map['gmpy2'] = (gmpy2.powmod, gmpy2.mpz)
+
+_powmod, _number = _arithmetic_map['builtin']
+_arithmetic = 'builtin'
+
+
+def set_arithmetic(name):
+    global _powmod, _number, _arithmetic
+    _powmod, _number = _arithmetic_map[name]
+    _arithmetic = name
+
+
+def get_arithmetic():
+    return _arithmetic
+
+
+def get_arithmetics():
+    return sorted(_arithmetic_map)
+
+
+def powmod(base, exponent, modulus):
+    return int(_powmod(base, exponent, modulus))
+
+
+set_arithmetic('gmpy2' if gmpy2 is not None else 'builtin')
+
+
+# Big-endian conversions, long_to_bytes gives minimal length (b'' for 0)
 def bytes_to_long(s):
-    n = 0
-    for b in six.iterbytes(s):
-        n = (n << 8) | b
-    return n
+    return int.from_bytes(s, 'big')
 
 
 def long_to_bytes(n):
-    l = list()
-    x = 0
-    off = 0
-    while x != n:
-        b = (n >> off) & 0xFF
-        l.append(chr(b))
-        x = x | (b << off)
-        off += 8
-    l.reverse()
-    return six.b(''.join(l))
+    return n.to_bytes((n.bit_length() + 7) // 8, 'big')
 
 
 def get_random(nbytes):
-    return bytes_to_long(os.urandom(nbytes))
+    return int.from_bytes(os.urandom(nbytes), 'big')
 
 
 def get_random_of_length(nbytes):
@@ -78,7 +127,7 @@ def H(hash_class, *args, **kwargs):
         if s is not None:
             h.update(long_to_bytes(s) if isinstance(s, six.integer_types) else s)
 
-    return int(h.hexdigest(), 16)
+    return int.from_bytes(h.digest(), 'big')
 
 
 # N = 0xAC6BDB41324A9A9BF166DE5E1389582FAF72B6651987EE07FC3192943DB56050A37329CBB4A099ED8193E075776\
@@ -97,7 +146,87 @@ def HNxorg(hash_class, N, g):
     hg = hash_class(long_to_bytes(g)).digest()
     # print("hg: {0}".format(hg))
 
-    return (''.join(chr(hN[i] ^ hg[i]) for i in range(0, len(hN)))).encode()
+    # XOR bytes are UTF-8 encoded as code points (bytes over 0x7F take two bytes), Utims compute it so
+    return bytes(x ^ y for x, y in zip(hN, hg)).decode('latin-1').encode()
+
+
+class Group(object):
+    # Constants of SRP group computed once per (H, N, g): k = H(N, g), HNxorg,
+    # N as bytes and fixed-base table of g. Row i of the table keeps
+    # g^(j * 256^i) for every byte value j, so g^e of exponent up to
+    # FIXED_BASE_BITS bits is a product of one entry per byte of e.
+    # Server ephemerals are taken from ephemeral_source (e.g. EphemeralPool)
+    # when it is set.
+
+    FIXED_BASE_BITS = 256  # Ephemeral secrets a, b and private key x are 256-bit
+
+    _groups = dict()
+    _groups_lock = threading.Lock()
+
+    def __init__(self, hash_class, N, g):
+        self.hash_class = hash_class
+        self.N = N
+        self.g = g
+        self.N_bytes = long_to_bytes(N)
+        self.k = H(hash_class, N, g)
+        self.hnxorg = HNxorg(hash_class, N, g)
+        self._table = None
+        self._table_lock = threading.Lock()
+        self.ephemeral_source = None
+
+    @classmethod
+    def get(cls, hash_class, N, g):
+        key = (hash_class, N, g)
+        group = cls._groups.get(key)
+        if group is None:
+            with cls._groups_lock:
+                group = cls._groups.get(key)
+                if group is None:
+                    group = cls(hash_class, N, g)
+                    cls._groups[key] = group
+        return group
+
+    def _fixed_base_table(self):
+        if self._table is None:
+            with self._table_lock:
+                if self._table is None:
+                    N = _number(self.N)
+                    table = list()
+                    base = _number(self.g) % N
+                    for _ in range(self.FIXED_BASE_BITS // 8):
+                        row = [1, base]
+                        for _ in range(254):
+                            row.append(row[-1] * base % N)
+                        table.append(row)
+                        base = row[-1] * base % N
+                    self._table = table
+        return self._table
+
+    def pow_g(self, exponent):
+        if exponent < 0 or exponent.bit_length() > self.FIXED_BASE_BITS:
+            return powmod(self.g, exponent, self.N)
+        N = _number(self.N)
+        table = self._fixed_base_table()
+        result = _number(1)
+        for row, digit in zip(table, reversed(exponent.to_bytes(len(table), 'big'))):
+            if digit:
+                result = result * row[digit] % N
+        return int(result % N)
+
+    def new_ephemeral(self):
+        b = get_random_of_length(32)
+        return b, self.pow_g(b)
+
+    def ephemeral(self):
+        # Single-use pair (b, g^b mod N)
+        if self.ephemeral_source is not None:
+            return self.ephemeral_source()
+        return self.new_ephemeral()
+
+
+def get_group(hash_alg=SHA256, ng_type=NG_1024, n_hex=None, g_hex=None):
+    N, g = get_ng(ng_type, n_hex, g_hex)
+    return Group.get(_hash_map[hash_alg], N, g)
 
 
 def gen_x(hash_class, salt, username, password):
@@ -112,14 +241,14 @@ def create_salted_verification_key(username, password, hash_alg=SHA256, ng_type=
     N, g = get_ng(ng_type, n_hex, g_hex)
     _s = long_to_bytes(get_random(4))
     # _s = b'\xc3\x83\xc3\xa8'
-    _v = long_to_bytes(pow(g, gen_x(hash_class, _s, username, password), N))
+    _v = long_to_bytes(Group.get(hash_class, N, g).pow_g(gen_x(hash_class, _s, username, password)))
 
     return _s, _v
 
 
 def calculate_M(hash_class, N, g, I, s, A, B, K):
     h = hash_class()
-    hnxorg = HNxorg(hash_class, N, g)
+    hnxorg = Group.get(hash_class, N, g).hnxorg
     # print("HNxorg: {0}".format(hnxorg))
     h.update(hnxorg)
     h.update(hash_class(I).digest())
@@ -153,7 +282,8 @@ class Verifier(object):
 
         N, g = get_ng(ng_type, n_hex, g_hex)
         hash_class = _hash_map[hash_alg]
-        k = H(hash_class, N, g)
+        group = Group.get(hash_class, N, g)
+        k = group.k
 
         self.hash_class = hash_class
         self.N = N
@@ -169,11 +299,12 @@ class Verifier(object):
 
             if bytes_b:
                 self.b = bytes_to_long(bytes_b)
+                gb = group.pow_g(self.b)
             else:
-                self.b = get_random_of_length(32)
-            self.B = (k * self.v + pow(g, self.b, N)) % N
+                self.b, gb = group.ephemeral()
+            self.B = (k * self.v + gb) % N
             self.u = H(hash_class, self.A, self.B)
-            self.S = pow(self.A * pow(self.v, self.u, N), self.b, N)
+            self.S = powmod(self.A * powmod(self.v, self.u, N), self.b, N)
             self.K = hash_class(long_to_bytes(self.S)).digest()
             self.M = calculate_M(hash_class, N, g, self.I, self.s, self.A, self.B, self.K)
             self.H_AMK = calculate_H_AMK(hash_class, self.A, self.M, self.K)
@@ -213,7 +344,8 @@ class User(object):
             raise ValueError("32 bytes required for bytes_a")
         N, g = get_ng(ng_type, n_hex, g_hex)
         hash_class = _hash_map[hash_alg]
-        k = H(hash_class, N, g)
+        group = Group.get(hash_class, N, g)
+        k = group.k
 
         self.I = username
         self.p = password
@@ -221,7 +353,8 @@ class User(object):
             self.a = bytes_to_long(bytes_a)
         else:
             self.a = get_random_of_length(32)
-        self.A = pow(g, self.a, N)
+        self.A = group.pow_g(self.a)
+        self.group = group
         self.v = None
         self.M = None
         self.K = None
@@ -272,9 +405,9 @@ class User(object):
 
         self.x = gen_x(hash_class, self.s, self.I, self.p)
 
-        self.v = pow(g, self.x, N)
+        self.v = self.group.pow_g(self.x)
 
-        self.S = pow((self.B - k * self.v), (self.a + self.u * self.x), N)
+        self.S = powmod((self.B - k * self.v) % N, (self.a + self.u * self.x), N)
 
         self.K = hash_class(long_to_bytes(self.S)).digest()
         self.M = calculate_M(hash_class, N, g, self.I, self.s, self.A, self.B, self.K)
@@ -0,0 +1,82 @@
+"""
+SRP executor module
+
+Runs CPU-bound SRP computations (modular exponentiation) in worker processes
+"""
+
+from concurrent.futures import Future, ProcessPoolExecutor
+from . import ephemeral_pool, srp
+
+
+def build_verifier(username, password, salt, vkey, bytes_A):
+    """
+    Build SRP verifier, create salt and verification key if they are not set
+
+    :param bytes username: Utim name
+    :param bytes password: Master key
+    :param bytes salt: Salt or None
+    :param bytes vkey: Verification key or None
+    :param bytes bytes_A: Public ephemeral value of Utim
+    :return: (salt, vkey, srp.Verifier)
+    """
+
+    if salt is None or vkey is None:
+        salt, vkey = srp.create_salted_verification_key(username, password)
+    return salt, vkey, srp.Verifier(username, salt, vkey, bytes_A)
+
+
+class SrpExecutor(object):
+    """
+    SRP executor class
+
+    Without processes computations run inline and completed futures are returned.
+    Server ephemerals are generated in background of the process computing verifiers.
+    """
+
+    def __init__(self, processes=0, ephemerals=0):
+        """
+        Initialization
+
+        :param int processes: Number of worker processes (0 - compute inline)
+        :param int ephemerals: Max number of ready server ephemerals per process (0 - no pool)
+        """
+
+        self.__executor = None
+        if processes > 0:
+            self.__executor = ProcessPoolExecutor(max_workers=processes, initializer=ephemeral_pool.start,
+                                                  initargs=(ephemerals,))
+        else:
+            ephemeral_pool.start(ephemerals)
+
+    def submit_verifier(self, username, password, salt, vkey, bytes_A):
+        """
+        Submit SRP verifier building
+
+        :return Future: Future of (salt, vkey, srp.Verifier)
+        """
+
+        if self.__executor is not None:
+            return self.__executor.submit(build_verifier, username, password, salt, vkey, bytes_A)
+
+        future = Future()
+        try:
+            future.set_result(build_verifier(username, password, salt, vkey, bytes_A))
+        except Exception as ex:
+            future.set_exception(ex)
+        return future
+
+    @property
+    def offloaded(self):
+        """
+        Computations run in worker processes or not
+        """
+
+        return self.__executor is not None
+
+    def shutdown(self):
+        """
+        Shutdown worker processes
+        """
+
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=False)
@@ -0,0 +1,77 @@
+"""
+SRP reference module
+
+Previous implementation of SRP conversions and of the server side of a
+handshake, kept as the reference for compatibility tests and benchmarks
+"""
+
+import hashlib
+import six
+from . import srp
+
+
+def legacy_bytes_to_long(s):
+    n = 0
+    for b in six.iterbytes(s):
+        n = (n << 8) | b
+    return n
+
+
+def legacy_long_to_bytes(n):
+    l = list()
+    x = 0
+    off = 0
+    while x != n:
+        b = (n >> off) & 0xFF
+        l.append(chr(b))
+        x = x | (b << off)
+        off += 8
+    l.reverse()
+    return six.b(''.join(l))
+
+
+def legacy_H(hash_class, *args):
+    h = hash_class()
+    for s in args:
+        if s is not None:
+            h.update(legacy_long_to_bytes(s) if isinstance(s, six.integer_types) else s)
+    return int(h.hexdigest(), 16)
+
+
+def legacy_HNxorg(hash_class, N, g):
+    hN = hash_class(legacy_long_to_bytes(N)).digest()
+    hg = hash_class(legacy_long_to_bytes(g)).digest()
+    return (''.join(chr(hN[i] ^ hg[i]) for i in range(0, len(hN)))).encode()
+
+
+def legacy_verifier(username, bytes_s, bytes_v, bytes_A, bytes_b, hash_class=hashlib.sha256):
+    """
+    Server side of handshake computed as before: without precomputation,
+    with built-in pow() and previous conversions
+
+    :return: (B, M, H_AMK)
+    """
+
+    N, g = srp.get_ng(srp.NG_1024, None, None)
+    k = legacy_H(hash_class, N, g)
+    s = legacy_bytes_to_long(bytes_s)
+    v = legacy_bytes_to_long(bytes_v)
+    A = legacy_bytes_to_long(bytes_A)
+    b = legacy_bytes_to_long(bytes_b)
+    B = (k * v + pow(g, b, N)) % N
+    u = legacy_H(hash_class, A, B)
+    S = pow(A * pow(v, u, N), b, N)
+    K = hash_class(legacy_long_to_bytes(S)).digest()
+    h = hash_class()
+    h.update(legacy_HNxorg(hash_class, N, g))
+    h.update(hash_class(username).digest())
+    h.update(legacy_long_to_bytes(s))
+    h.update(legacy_long_to_bytes(A))
+    h.update(legacy_long_to_bytes(B))
+    h.update(K)
+    M = h.digest()
+    h = hash_class()
+    h.update(legacy_long_to_bytes(A))
+    h.update(M)
+    h.update(K)
+    return B, M, h.digest()
@@ -0,0 +1,199 @@
+"""
+Storage backend module
+
+Interface of database keeping Utims of the Uhost
+"""
+
+import logging
+
+
+class StorageBackendException(Exception):
+    """
+    Storage backend exception
+
+    The exception is raised when:
+     * statement failed after all tries and caller asked for errors
+     * storage in config is unknown
+     * schema is newer than supported one
+    """
+
+    pass
+
+
+class StorageBackend(object):
+    """
+    Storage backend class
+
+    Backend runs SQL of DataBaseConnection with %s placeholders and returns
+    fetched rows as tuples. Every backend keeps the same tables: udata (Utims),
+    subs (subscriptions), statuses and schema_version.
+
+    Schema versions:
+     1. hex CHAR keys, status names in udata
+     2. binary session keys and device IDs, status codes, indexes on status and update_time
+     3. SRP salt and verification key of Utim
+     4. ID of master key the SRP verification key is derived from
+    """
+
+    STORAGE_MYSQL = 'MYSQLDB'
+    STORAGE_SQLITE = 'SQLITE'
+
+    UTIMS_TABLE = 'udata'
+    SUBS_TABLE = 'subs'
+    STATUSES_TABLE = 'statuses'
+    VERSION_TABLE = 'schema_version'
+
+    SCHEMA_VERSION = 4
+
+    MAX_PARAMS = 65535  # Max parameters of one statement
+
+    # [code, complex status, status, network, security], codes are stored in udata
+    STATUSES = [
+        [1, 'STATUS_CONFIGURING', 'Provisioning', 'Online', 'D2C protected'],
+        [2, 'STATUS_DED', 'Disabled', 'Offline', 'Not protected'],
+        [3, 'STATUS_DONE', 'Working', 'Online', 'D2C protected'],
+        [4, 'STATUS_NEWBORN', 'Disabled', 'Offline', 'Not protected'],
+        [5, 'STATUS_NO_CONFIG', 'Disabled', 'Online', 'D2C protected'],
+        [6, 'STATUS_SRP', 'Provisioning', 'Connecting', 'Securing connection'],
+        [7, 'STATUS_TESTING', 'Provisioning', 'Online', 'D2C protected']
+    ]
+    STATUS_CODES = {item[1]: item[0] for item in STATUSES}
+    STATUS_NAMES = {item[0]: item[1] for item in STATUSES}
+    DEFAULT_STATUS = 'STATUS_NEWBORN'
+
+    @property
+    def name(self):
+        """
+        Name of the database, caches of the same database are shared
+        """
+
+        raise NotImplementedError
+
+    @property
+    def has_replicas(self):
+        """
+        Backend runs read-only statements on read replicas
+        """
+
+        return False
+
+    @property
+    def shards(self):
+        """
+        Backends keeping Utims, the backend itself if it is not sharded
+        """
+
+        return [self]
+
+    def shard_for(self, devid):
+        """
+        Get backend keeping Utim
+
+        :param str devid: Utim ID
+        :return StorageBackend:
+        """
+
+        return self
+
+    def group(self, devids):
+        """
+        Group Utims by backends keeping them
+
+        :param devids: Utim IDs
+        :return dict: {StorageBackend: [Utim IDs]}
+        """
+
+        groups = dict()
+        for devid in devids:
+            groups.setdefault(self.shard_for(devid), []).append(devid)
+        return groups
+
+    def map_shards(self, function, shards=None):
+        """
+        Call function for every shard, sharded backend calls it in parallel
+
+        :param function: Callable taking StorageBackend
+        :param shards: Shards to call function for (all shards by default)
+        :return list: Results in order of shards
+        """
+
+        return [function(shard) for shard in (self.shards if shards is None else shards)]
+
+    def create(self):
+        """
+        Create database, tables and statuses if they do not exist and migrate them to current version
+        """
+
+        raise NotImplementedError
+
+    def execute(self, sql, params=None, raise_error=False, replica=False):
+        """
+        Execute statement
+
+        :param str sql: SQL with %s placeholders
+        :param params: Bound parameters
+        :param bool raise_error: Raise StorageBackendException if all tries failed
+        :param bool replica: Read-only statement may run on read replica if backend has any
+        :return: Fetched rows, None if statement returns no rows or failed
+        """
+
+        raise NotImplementedError
+
+    def schema_version(self):
+        """
+        Get schema version
+
+        :return int: Version, 0 if there are no tables
+        """
+
+        raise NotImplementedError
+
+    def migrate(self):
+        """
+        Migrate schema in place to current version
+
+        Every step is done by _migrate_to_{version} method of backend, missing schema is not created.
+        :return int: Version before migration
+        """
+
+        initial = version = self.schema_version()
+        if version == 0:
+            return version
+        if version > self.SCHEMA_VERSION:
+            raise StorageBackendException('Schema version {} is newer than supported {}'.format(
+                version, self.SCHEMA_VERSION))
+
+        while version < self.SCHEMA_VERSION:
+            version += 1
+            logging.info('Migrating schema of %s to version %d', self.name, version)
+            getattr(self, '_migrate_to_{}'.format(version))()
+            self._set_schema_version(version)
+        return initial
+
+    def _set_schema_version(self, version):
+        """
+        Store schema version
+        """
+
+        raise NotImplementedError
+
+
+def open_backend(cfg):
+    """
+    Open storage backend chosen in config
+
+    Backend modules are imported on demand, so SQLite storage does not need MySQL connector.
+    :param config.Config cfg: Config
+    :return StorageBackend:
+    """
+
+    if cfg.storage == StorageBackend.STORAGE_SQLITE:
+        from .sqlite_backend import SqliteBackend
+        return SqliteBackend(cfg)
+    if cfg.storage == StorageBackend.STORAGE_MYSQL and cfg.db_shards:
+        from .sharded_backend import ShardedBackend
+        return ShardedBackend(cfg)
+    if cfg.storage == StorageBackend.STORAGE_MYSQL:
+        from .mysql_backend import MySqlBackend
+        return MySqlBackend(cfg)
+    raise StorageBackendException('Unknown storage: {}'.format(cfg.storage))
@@ -0,0 +1,133 @@
+"""
+TTL cache module
+
+Thread-safe bounded cache with least recently used eviction and expiration
+"""
+
+import collections
+import threading
+import time
+
+
+class TtlCache(object):
+    """
+    LRU cache class with time to live of entries
+
+    None is a valid cached value, so get() returns a (found, value) pair.
+    Cache with zero maxsize keeps nothing. A value read from the source before
+    an invalidation must not be cached after it: take stamp() before reading
+    and pass it to put(), the put is skipped if anything was invalidated since.
+    """
+
+    __shared = dict()
+    __shared_lock = threading.Lock()
+
+    def __init__(self, maxsize=10000, ttl=60):
+        """
+        Initialization
+
+        :param int maxsize: Max number of entries (0 - cache is disabled)
+        :param float ttl: Seconds an entry is valid (0 - until evicted)
+        """
+
+        self.__maxsize = max(0, int(maxsize))
+        self.__ttl = ttl
+        self.__entries = collections.OrderedDict()  # {key: (expiration time, value)}, most recently used last
+        self.__lock = threading.Lock()
+        self.__hits = 0
+        self.__misses = 0
+        self.__invalidations = 0
+
+    @classmethod
+    def shared(cls, name, maxsize=10000, ttl=60):
+        """
+        Get cache shared by every user of the same name
+
+        :param name: Cache name
+        :return TtlCache:
+        """
+
+        with cls.__shared_lock:
+            cache = cls.__shared.get(name)
+            if cache is None:
+                cache = cls(maxsize, ttl)
+                cls.__shared[name] = cache
+            return cache
+
+    @property
+    def hits(self):
+        return self.__hits
+
+    @property
+    def misses(self):
+        return self.__misses
+
+    def stamp(self):
+        """
+        Get invalidation stamp for put()
+        """
+
+        return self.__invalidations
+
+    def get(self, key):
+        """
+        Get value
+
+        :param key: Key
+        :return: (True, value) or (False, None) if key is missing or expired
+        """
+
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None:
+                if entry[0] is None or entry[0] > time.monotonic():
+                    self.__entries.move_to_end(key)
+                    self.__hits += 1
+                    return True, entry[1]
+                del self.__entries[key]
+            self.__misses += 1
+            return False, None
+
+    def put(self, key, value, stamp=None):
+        """
+        Put value, the least recently used entry is evicted if cache is full
+
+        :param key: Key
+        :param value: Value
+        :param int stamp: Stamp taken before value was read
+        """
+
+        if not self.__maxsize:
+            return
+
+        expiration = time.monotonic() + self.__ttl if self.__ttl else None
+        with self.__lock:
+            if stamp is not None and stamp != self.__invalidations:
+                return
+            self.__entries[key] = (expiration, value)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.__maxsize:
+                self.__entries.popitem(last=False)
+
+    def invalidate(self, key):
+        """
+        Remove value
+
+        :param key: Key
+        """
+
+        with self.__lock:
+            self.__entries.pop(key, None)
+            self.__invalidations += 1
+
+    def clear(self):
+        """
+        Remove all values
+        """
+
+        with self.__lock:
+            self.__entries.clear()
+            self.__invalidations += 1
+
+    def __len__(self):
+        return len(self.__entries)
@@ -20,7 +20,7 @@ class UConnMQTT(object):
         Initialize MQTT connection
         """
 
-        self.__topic = None
+        self.__topics = []
         self.__message_callback = None
         self.reconnection = 0
 
@@ -110,8 +110,8 @@ class UConnMQTT(object):
         self.reconnection = 0
         self.connectionFlag = True
 
-        if self.__topic:
-            self.__client.subscribe(self.__topic)
+        for topic in self.__topics:
+            self.__client.subscribe(topic)
 
     def on_disconnect(self, client, userdata, rc):
         print("ucon-mqtt - Internet connection losted..")
@@ -149,7 +149,8 @@ class UConnMQTT(object):
         :param str topic: Channel name to listen
         :param callback: Callback
         """
-        self.__topic = topic
+        if topic not in self.__topics:
+            self.__topics.append(topic)
         self.__cbobject = cbobj
         self.__message_callback = callback
         self.__client.subscribe(topic)
@@ -161,9 +162,11 @@ class UConnMQTT(object):
         :param str topic: Channel name to listen
         """
 
-        self.__topic = None
-        self.__cbobject = None
-        self.__message_callback = None
+        if topic in self.__topics:
+            self.__topics.remove(topic)
+        if not self.__topics:
+            self.__cbobject = None
+            self.__message_callback = None
         self.__client.unsubscribe(topic)
 
     def publish(self, sender, destination, message):
@@ -8,7 +8,7 @@ import logging
 import queue
 import _thread
 import paho.mqtt.client as mqtt
-from . import connmanager, exceptions, config
+from . import connmanager, exceptions, config, cluster
 
 
 class UhostConnection(object):
@@ -16,7 +16,9 @@ class UhostConnection(object):
     MQTT class
     """
 
-    def __init__(self, type, inbound_queue):
+    POLL_TIMEOUT = 1  # Seconds to block on outbound queue before checking the running flag
+
+    def __init__(self, type, inbound_queue, outbound_queue=None):
         """
         Initialize MQTT connection
         """
@@ -25,11 +27,20 @@ class UhostConnection(object):
         self.__client = connmanager.ConnManager(type)
 
         self.__inbound_queue = inbound_queue  # Queue for inbound data
-        self.outbound_queue = queue.Queue()  # Queue for outbound data
+        self.outbound_queue = outbound_queue  # Queue for outbound data
+        if self.outbound_queue is None:
+            self.outbound_queue = queue.Queue()
 
         self.__running = False  # Flag to inform there is work with serial or not
 
         self.__config = config.Config()
+        self.__cluster = cluster.Cluster()
+
+        # Uhost topic, node of a cluster signs messages with its node topic to get acks back
+        self.__topic = bytes.fromhex(self.__config.uhost_name).decode()
+        self.__sender = self.__topic.encode()
+        if self.__cluster.enabled:
+            self.__sender = self.__cluster.node_topic(self.__topic).encode()
 
     @staticmethod
     def __log_exception(ex):
@@ -74,34 +85,74 @@ class UhostConnection(object):
         self.__running = True
 
         # Subscribe to topic
-        self.__client.subscribe(bytes.fromhex(self.__config.uhost_name).decode(), self, UhostConnection._on_message)
-        logging.debug("Subscribed to topic: %s", bytes.fromhex(self.__config.uhost_name).decode())
+        self.subscribe()
 
         logging.info("Start Running")
         while self.__running:
             self.__publish()
 
+    def subscribe(self):
+        """
+        Subscribe to topic of the Uhost
+
+        Node of a cluster shares the topic with other nodes and also listens to
+        its own node topic for messages forwarded by them.
+        """
+
+        topics = [self.__cluster.shared_topic(self.__topic)]
+        if self.__cluster.enabled:
+            topics.append(self.__cluster.node_topic(self.__topic))
+
+        route = self.__route if self.__cluster.enabled else None
+        for item in topics:
+            self.__client.subscribe(item, self, UhostConnection._on_message, route)
+            logging.debug("Subscribed to topic: %s", item)
+
+    def __route(self, sender):
+        """
+        Get topic of the node owning the sender
+
+        :param bytes sender: Message sender
+        :return str: Node topic or None if the device is pinned to this node
+        """
+
+        if self.__cluster.owns(sender):
+            return None
+        return self.__cluster.node_topic(self.__topic, self.__cluster.node_for(sender))
+
     def __publish(self):
         """
         Publish
         """
 
-        while not self.outbound_queue.empty():
-            item = self.outbound_queue.get()
-            logging.debug("Publish item: %s", item)
+        try:
+            item = self.outbound_queue.get(timeout=self.POLL_TIMEOUT)
+        except queue.Empty:
+            return
+
+        self.publish_item(item)
 
-            # Check number of elements of item
-            item_length = len(item)
-            if item_length == 2:
-                destination = item[0]
-                message = item[1]
-                logging.debug("Message: %s", message)
-                logging.debug("Type message: %s", type(message))
-                self.__client.publish(bytes.fromhex(self.__config.uhost_name), destination, message)
-                logging.debug("Message %s was published to %s", str(destination), str(message))
+    def publish_item(self, item):
+        """
+        Publish single item
 
-            else:
-                logging.error("Invalid length of item: %d", item_length)
+        :param list item: [destination, message]
+        """
+
+        logging.debug("Publish item: %s", item)
+
+        # Check number of elements of item
+        item_length = len(item)
+        if item_length == 2:
+            destination = item[0]
+            message = item[1]
+            logging.debug("Message: %s", message)
+            logging.debug("Type message: %s", type(message))
+            self.__client.publish(self.__sender, destination, message)
+            logging.debug("Message %s was published to %s", str(destination), str(message))
+
+        else:
+            logging.error("Invalid length of item: %d", item_length)
 
     def _on_message(self, sender, message):
         """
@@ -115,6 +166,7 @@ class UhostConnection(object):
         """
 
         logging.info("Received message {0} from {1}".format(message, sender))
+
         try:
             item = [sender, message]
             self.__inbound_queue.put(item)
@@ -0,0 +1,174 @@
+"""
+Worker pool module
+
+Pool of worker threads which block on a queue instead of polling it
+"""
+
+import _thread
+import functools
+import logging
+import queue
+import time
+from .priority_scheduler import PriorityScheduler
+
+
+class WorkerPool(object):
+    """
+    Partitioned worker pool class
+
+    Every worker gets items of its own partition of the source queue
+    (ClassQueue split by a hash of device ID), so all items of one device are
+    processed in order by the same worker while different devices are processed
+    in parallel. Nothing is routed in between: the source queue is the only
+    place items wait, so its capacity bounds them and its shedder can drop any
+    of them. A plain queue is read by a single worker.
+
+    If classify is set, every worker collects a batch of up to batch_size items
+    (waiting up to batch_window seconds for more), prepares the whole batch at
+    once and processes it in PriorityScheduler order of prepared items (classes
+    of secured frames are known after they are opened). Prepared items of one
+    device (key) keep their order, classes are prioritized between devices.
+    """
+
+    POLL_TIMEOUT = 1  # Seconds to block on a queue before checking the running flag
+
+    def __init__(self, name, source_queue, handler, prepare=None, classify=None, key=None, weights=None,
+                 batch_size=64, batch_window=0):
+        """
+        Initialization
+
+        :param str name: Pool name (for logging)
+        :param Queue source_queue: Queue to get items from (ClassQueue - one worker per partition)
+        :param handler: Callable to process single item
+        :param prepare: Callable to prepare list of items before scheduling (returns list of prepared items)
+        :param classify: Callable to get MessageClass of prepared item
+        :param key: Callable to get device ID of prepared item (item[0] by default)
+        :param dict weights: PriorityScheduler weights
+        :param int batch_size: Max number of items in batch
+        :param float batch_window: Seconds to wait for more items of batch
+        """
+
+        self.__name = name
+        self.__source_queue = source_queue
+        self.__handler = handler
+        self.__workers = getattr(source_queue, 'partitions', 1)
+        self.__prepare = prepare
+        self.__classify = classify
+        self.__key = key if key is not None else (lambda item: item[0])
+        self.__weights = weights
+        self.__batch_size = max(1, int(batch_size))
+        self.__batch_window = batch_window
+        self.__running = False
+
+    @property
+    def workers(self):
+        return self.__workers
+
+    def run(self):
+        """
+        Run workers in new threads
+        """
+
+        self.__running = True
+        if self.__workers == 1:
+            _thread.start_new_thread(self.__work, (self.__source_queue.get,))
+        else:
+            for index in range(self.__workers):
+                _thread.start_new_thread(self.__work, (functools.partial(self.__source_queue.get,
+                                                                         partition=index),))
+        logging.info("Worker pool '%s' runs %d worker(s)", self.__name, self.__workers)
+
+    def stop(self):
+        """
+        Stop workers
+        """
+
+        self.__running = False
+
+    def __work(self, get):
+        """
+        Process items of one partition
+
+        :param get: get() of the source queue partition
+        """
+
+        if self.__classify is not None:
+            self.__work_scheduled(get)
+            return
+
+        while self.__running:
+            try:
+                item = get(timeout=self.POLL_TIMEOUT)
+            except queue.Empty:
+                continue
+
+            self.__process(item)
+
+    def __work_scheduled(self, get):
+        """
+        Process items of one partition in batches in priority order
+
+        :param get: get() of the source queue partition
+        """
+
+        scheduler = PriorityScheduler(self.__weights)
+
+        while self.__running:
+            for item in self.__prepare_batch(self.__collect(get)):
+                scheduler.put(self.__classify(item), item, self.__key(item))
+
+            while not scheduler.empty():
+                self.__process(scheduler.pop())
+
+    def __collect(self, get):
+        """
+        Collect batch of items
+
+        :param get: get() of the source queue partition
+        :return list: Items (empty if there was nothing to get)
+        """
+
+        try:
+            batch = [get(timeout=self.POLL_TIMEOUT)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.__batch_window
+        while len(batch) < self.__batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(get(timeout=remaining))
+                else:
+                    batch.append(get(block=False))
+            except queue.Empty:
+                break
+        return batch
+
+    def __prepare_batch(self, batch):
+        """
+        Prepare batch of items
+
+        :return list: Prepared items
+        """
+
+        if not batch or self.__prepare is None:
+            return batch
+
+        try:
+            return self.__prepare(batch)
+        except Exception as ex:
+            logging.exception("Worker pool '%s' failed to prepare %d item(s): %s", self.__name, len(batch), ex)
+            return []
+
+    def __process(self, item):
+        """
+        Process single item
+        """
+
+        try:
+            self.__handler(item)
+        except queue.Full:
+            logging.debug("Worker pool '%s': result of item is dropped by full queue", self.__name)
+        except Exception as ex:
+            logging.exception("Worker pool '%s' failed to process item: %s", self.__name, ex)
@@ -0,0 +1,162 @@
+"""
+Write buffer module
+
+Write-behind buffer of per-device column updates
+"""
+
+import atexit
+import logging
+import threading
+import _thread
+
+
+class WriteBuffer(object):
+    """
+    Write-behind buffer class
+
+    Keeps only the latest value per (device, column) and passes all pending
+    values to the flush callable every interval seconds or as soon as
+    max_pending devices have pending values. Values of failed flush are put
+    back unless they were overwritten meanwhile.
+    """
+
+    __shared = dict()
+    __shared_lock = threading.Lock()
+
+    def __init__(self, flush, interval=1.0, max_pending=1000):
+        """
+        Initialization
+
+        :param flush: Callable taking {devid: {column: value}}, raises exception on failure
+        :param float interval: Seconds between flushes
+        :param int max_pending: Number of devices with pending values triggering flush
+        """
+
+        self.__flush = flush
+        self.__interval = interval
+        self.__max_pending = max(1, int(max_pending))
+        self.__pending = dict()  # {devid: {column: value}}
+        self.__flushing = dict()  # Values being written, still visible to readers
+        self.__lock = threading.Lock()
+        self.__flush_lock = threading.Lock()  # Flushes are applied one by one and in order
+        self.__wakeup = threading.Event()
+        self.__running = False
+
+    @classmethod
+    def shared(cls, name, flush, interval=1.0, max_pending=1000):
+        """
+        Get buffer shared by every user of the same database
+
+        Flushing thread is started once, pending values are flushed at interpreter exit too.
+
+        :param str name: Database name
+        :return WriteBuffer:
+        """
+
+        with cls.__shared_lock:
+            buffer = cls.__shared.get(name)
+            if buffer is None:
+                buffer = cls(flush, interval, max_pending)
+                buffer.start()
+                atexit.register(buffer.stop)
+                cls.__shared[name] = buffer
+            return buffer
+
+    def start(self):
+        """
+        Start flushing thread
+        """
+
+        self.__running = True
+        _thread.start_new_thread(self.__run, ())
+
+    def stop(self):
+        """
+        Stop flushing thread and flush pending values
+        """
+
+        self.__running = False
+        self.__wakeup.set()
+        self.flush()
+
+    def __run(self):
+        """
+        Flushing thread
+        """
+
+        while self.__running:
+            self.__wakeup.wait(self.__interval)
+            self.__wakeup.clear()
+            self.flush()
+
+    def set(self, devid, column, value):
+        """
+        Put value
+
+        :param str devid: Device ID
+        :param str column: Column name
+        :param value: Value
+        """
+
+        self.set_many(devid, {column: value})
+
+    def set_many(self, devid, values):
+        """
+        Put values of several columns together, they are flushed together
+
+        :param str devid: Device ID
+        :param dict values: {column: value}
+        """
+
+        with self.__lock:
+            self.__pending.setdefault(devid, dict()).update(values)
+            full = len(self.__pending) >= self.__max_pending
+        if full:
+            self.__wakeup.set()
+
+    def get(self, devid, column):
+        """
+        Get pending value
+
+        :return: (True, value) or (False, None) if there is no pending value
+        """
+
+        with self.__lock:
+            for values in (self.__pending, self.__flushing):
+                columns = values.get(devid)
+                if columns is not None and column in columns:
+                    return True, columns[column]
+            return False, None
+
+    def __len__(self):
+        return len(self.__pending)
+
+    def flush(self):
+        """
+        Flush pending values
+
+        :return bool: True if pending values were written
+        """
+
+        with self.__flush_lock:
+            with self.__lock:
+                if not self.__pending:
+                    return True
+                pending = self.__pending
+                self.__pending = dict()
+                self.__flushing = pending
+
+            try:
+                self.__flush(pending)
+                return True
+            except Exception:
+                logging.exception('Write buffer flush failed, %d devices are kept', len(pending))
+                with self.__lock:
+                    for devid, columns in pending.items():
+                        newer = self.__pending.setdefault(devid, dict())
+                        for column, value in columns.items():
+                            newer.setdefault(column, value)
+                return False
+            finally:
+                with self.__lock:
+                    self.__flushing = dict()
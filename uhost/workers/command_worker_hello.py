@@ -3,9 +3,11 @@ Hello command worker
 """
 
 import logging
+import time
 from ..utilities.tag import Tag
-from ..utilities import srp
 from ..utilities.constants import Status
+from ..utilities.deferred_call import DeferredCall
+from ..utilities.message_class import MessageClass
 
 
 class CommandWorkerHelloException(Exception):
@@ -27,8 +29,16 @@ class CommandWorkerHelloUtimMethodException(Exception):
 class CommandWorkerHello(object):
     """
     Hello command worker class
+
+    When SRP verifier is built in background, the session of the Utim keeps
+    the HELLO in process (its A) until the verifier is ready. Repeated HELLO with
+    the same A is dropped meanwhile, HELLO with new A replaces it, so Utim gets
+    one challenge for its last A. The ready verifier is handed back to the
+    inbound queue and finishes the HELLO on the worker of the Utim.
     """
 
+    PENDING_TIMEOUT = 30  # Seconds HELLO in process blocks repeated ones
+
     def __init__(self, uhost):
         """
         Initialization
@@ -37,6 +47,8 @@ class CommandWorkerHello(object):
         # Check all necessary methods
         methods = [
             'get_srp_session',
+            'create_srp_verifier',
+            'set_srp_verifier',
             'set_srp_session',
             'remove_srp_session',
             'save_dev_status'
@@ -47,13 +59,17 @@ class CommandWorkerHello(object):
 
         self.__uhost = uhost  # Uhost instance
 
-    def process(self, devid, data, outbound_queue):
+    def process(self, devid, data, outbound_queue, inbound_queue=None):
         """
         Run process
+
+        :param str devid: Device ID
+        :param bytes data: Data to process
+        :param Queue outbound_queue: Outbound queue
+        :param Queue inbound_queue: Inbound queue to finish HELLO with verifier built in background
         """
 
         packet = None
-        packet_backend = None
 
         tag = data[0:1]
         length_bytes = data[1:3]
@@ -68,6 +84,12 @@ class CommandWorkerHello(object):
         if length == len(value) and tag == Tag.UCOMMAND.HELLO:
             # Get session values
             session = self.__uhost.get_srp_session(devid)
+            pending = session.get('pending')
+            if pending is not None and pending[0] == value and \
+                    time.monotonic() - pending[1] < self.PENDING_TIMEOUT:
+                logging.debug("HELLO from %s is in process, repeated one is dropped", devid)
+                return
+
             A = session.get('A')
             logging.debug("GET session A: %s", [x for x in A] if A is not None else 'None')
             if A != value:
@@ -89,41 +111,19 @@ class CommandWorkerHello(object):
                           str(salt), str(vkey), str(value))
             if svr is None:
                 logging.debug("SVR is None")
-                svr = srp.Verifier(bytes.fromhex(devid), salt, vkey, value)
-
-            s, B = svr.get_challenge()
-            if s is None or B is None:
-                logging.error('Challenge is None. s: %s, B: %s', str(s), str(B))
-                packet = Tag.UCOMMAND.assemble_error(b"hello no challenge")
+                future = self.__uhost.create_srp_verifier(devid, salt, vkey, value)
+                if future.done() or inbound_queue is None:
+                    packet = self.__on_verifier(devid, value, session, future)
+                else:
+                    # Verifier is built in background, HELLO is finished on the worker of the Utim
+                    session['pending'] = (value, time.monotonic())
+                    future.add_done_callback(
+                        lambda f: self.__hand_back(devid, value, session, f, outbound_queue, inbound_queue)
+                    )
+                    return
 
             else:
-                logging.debug('Challenge s: %s, B: %s', [x for x in s], [x for x in B])
-
-                # Remove old sessions of utim_name
-                self.__uhost.remove_srp_session(bytes.fromhex(devid))
-
-                logging.debug("SAVE A: %s", [x for x in value])
-                # Save session values
-                session = {
-                    'utimname': devid,
-                    'salt': salt,
-                    'vkey': vkey,
-                    'A': value,
-                    'svr': svr,
-                    'test_data': session.get('test_data'),
-                    'platform_verified': session.get('platform_verified')
-                }
-                self.__uhost.set_srp_session(devid, session)
-
-                logging.debug("self.M: %s", str(svr.M))
-                session = self.__uhost.get_srp_session(devid)
-                svr1 = session.get('svr')
-                logging.debug("self1.M: %s", str(svr1.M) if svr1 else None)
-
-                packet = Tag.UCOMMAND.assemble_try(s, B)
-
-                self.__uhost.database.set_keep_alive_counter(devid, 0)
-                self.__uhost.save_dev_status(devid, Status.STATUS_SRP)
+                packet = self.__challenge(devid, value, session, salt, vkey, svr)
 
         else:
             logging.debug("Invalid data %s from %s", [hex(x) for x in data], devid)
@@ -131,3 +131,114 @@ class CommandWorkerHello(object):
 
         if packet is not None:
             outbound_queue.put([devid, packet])
+
+    def __hand_back(self, devid, value, session, future, outbound_queue, inbound_queue):
+        """
+        Put built SRP verifier to the inbound queue (runs in thread of SRP executor)
+
+        :param str devid: Device ID
+        :param bytes value: Public ephemeral value of Utim
+        :param dict session: SRP session keeping the HELLO in process
+        :param Future future: Future of (salt, vkey, srp.Verifier)
+        :param Queue outbound_queue: Outbound queue
+        :param Queue inbound_queue: Inbound queue
+        """
+
+        call = DeferredCall(devid, lambda: self.__finish(devid, value, future, outbound_queue),
+                            MessageClass.HANDSHAKE)
+        try:
+            # Queues never shed deferred calls, but a plain queue may be full or a stopped loop may refuse it
+            inbound_queue.put(call, block=False)
+        except Exception as ex:
+            # Repeated HELLO is processed again
+            logging.warning('Verifier of %s is not handed back: %s', devid, ex)
+            if session.get('pending', (None,))[0] == value:
+                session.pop('pending', None)
+
+    def __finish(self, devid, value, future, outbound_queue):
+        """
+        Finish HELLO processing with SRP verifier built in background
+
+        :param str devid: Device ID
+        :param bytes value: Public ephemeral value of Utim
+        :param Future future: Future of (salt, vkey, srp.Verifier)
+        :param Queue outbound_queue: Outbound queue
+        """
+
+        session = self.__uhost.get_srp_session(devid)
+        if session.get('pending', (None,))[0] != value:
+            logging.debug("Verifier of %s is outdated, dropped", devid)
+            return
+        session.pop('pending', None)
+
+        packet = self.__on_verifier(devid, value, session, future)
+        if packet is not None:
+            outbound_queue.put([devid, packet])
+
+    def __on_verifier(self, devid, value, session, future):
+        """
+        Assemble challenge with built SRP verifier, store salt and verification key created with it
+
+        :param str devid: Device ID
+        :param bytes value: Public ephemeral value of Utim
+        :param dict session: SRP session
+        :param Future future: Future of (salt, vkey, srp.Verifier)
+        :return bytes: Packet to send
+        """
+
+        try:
+            salt, vkey, svr = future.result()
+        except Exception as ex:
+            logging.error('Verifier building failed for %s: %s', devid, ex)
+            return Tag.UCOMMAND.assemble_error(b"hello no verifier")
+
+        if session.get('salt') is None or session.get('vkey') is None:
+            self.__uhost.set_srp_verifier(devid, salt, vkey)
+        return self.__challenge(devid, value, session, salt, vkey, svr)
+
+    def __challenge(self, devid, value, session, salt, vkey, svr):
+        """
+        Save SRP session and assemble challenge
+
+        :return bytes: Packet to send
+        """
+
+        s, B = svr.get_challenge()
+        if s is None or B is None:
+            logging.error('Challenge is None. s: %s, B: %s', str(s), str(B))
+            return Tag.UCOMMAND.assemble_error(b"hello no challenge")
+
+        logging.debug('Challenge s: %s, B: %s', [x for x in s], [x for x in B])
+
+        # Remove old sessions of utim_name
+        self.__uhost.remove_srp_session(bytes.fromhex(devid))
+
+        logging.debug("SAVE A: %s", [x for x in value])
+        # Save session values
+        session = {
+            'utimname': devid,
+            'salt': salt,
+            'vkey': vkey,
+            'A': value,
+            'svr': svr,
+            'test_data': session.get('test_data'),
+            'platform_verified': session.get('platform_verified')
+        }
+        self.__uhost.set_srp_session(devid, session)
+
+        logging.debug("self.M: %s", str(svr.M))
+        session = self.__uhost.get_srp_session(devid)
+        svr1 = session.get('svr')
+        logging.debug("self1.M: %s", str(svr1.M) if svr1 else None)
+
+        # Repeated HELLO finds Utim already waiting for CHECK
+        state = self.__uhost.database.get_device_state(devid)
+        changes = dict()
+        if state is None or state.keep_alive_counter != 0:
+            changes['keep_alive_counter'] = 0
+        if state is None or state.status != Status.STATUS_SRP:
+            changes['status'] = Status.STATUS_SRP
+        if changes:
+            self.__uhost.save_dev_transition(devid, **changes)
+
+        return Tag.UCOMMAND.assemble_try(s, B)
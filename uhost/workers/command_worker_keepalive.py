@@ -17,16 +17,17 @@ class CommandWorkerKeepalive(object):
 
     def process(self, devid, data, outbound_queue):
         logging.info('Got keepalive from {}'.format(devid))
-        self.__uhost.database.set_keep_alive_counter(devid, 0)
-        config_hash = self.__uhost.database.get_config_hash(devid)
-        config = self.__uhost.database.get_configuration(devid)
-        new_config_hash = self.__uhost.config_hash(config)
+        state = self.__uhost.database.get_device_state(devid)
+        # Snapshot may be stale (replica read, concurrent sweep), so the counter is reset anyway
+        changes = dict(keep_alive_counter=0)
+        config_hash, new_config_hash = self.__uhost.database.get_config_hashes(devid, state)
         logging.info('Old hash: {}'.format(config_hash))
         logging.info('New hash: {}'.format(new_config_hash))
         if config_hash != new_config_hash:
             logging.info('{} needs some attention -- new config incoming!'.format(devid))
             if new_config_hash == self.__uhost.config_hash(None):
-                self.__uhost.database.set_status(devid, Status.STATUS_NO_CONFIG)
-                self.__uhost.database.set_config_hash(devid, new_config_hash)
+                changes['status'] = Status.STATUS_NO_CONFIG
+                changes['config_hash'] = new_config_hash
             else:
-                self.__uhost.database.set_status(devid, Status.STATUS_CONFIGURING)
+                changes['status'] = Status.STATUS_CONFIGURING
+        self.__uhost.database.transition(devid, **changes)
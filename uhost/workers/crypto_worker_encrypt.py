@@ -43,8 +43,9 @@ class CryptoWorkerEncrypt(object):
         """
 
         try:
-            crypto = CryptoLayer(self.__uhost.get_session_key(devid))
-            logging.debug('Encrypting message {0} with key {1}'.format(data, self.__uhost.get_session_key(devid)))
+            session_key = self.__uhost.get_session_key(devid)
+            crypto = CryptoLayer(session_key)
+            logging.debug('Encrypting message {0} with key {1}'.format(data, session_key))
             cipherdata = crypto.encrypt(CryptoLayer.CRYPTO_MODE_AES, data)
             logging.debug('Encrypted package: {0}'.format(cipherdata))
             outbound_queue.put([devid, cipherdata])
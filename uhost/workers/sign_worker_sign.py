@@ -43,8 +43,9 @@ class SignWorkerSign(object):
         """
 
         try:
-            crypto = CryptoLayer(self.__uhost.get_session_key(devid))
-            logging.debug('Signing message {0} with key {1}'.format(data, self.__uhost.get_session_key(devid)))
+            session_key = self.__uhost.get_session_key(devid)
+            crypto = CryptoLayer(session_key)
+            logging.debug('Signing message {0} with key {1}'.format(data, session_key))
             cipherdata = crypto.sign(CryptoLayer.SIGN_MODE_SHA1, data)
             logging.debug('Signed package: {0}'.format(cipherdata))
             outbound_queue.put([devid, cipherdata])
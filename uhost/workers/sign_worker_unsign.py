@@ -43,8 +43,9 @@ class SignWorkerUnsign(object):
         """
 
         try:
-            crypto = CryptoLayer(self.__uhost.get_session_key(devid))
-            logging.debug('Unsigning package {0} with key {1}'.format(data, self.__uhost.get_session_key(devid)))
+            session_key = self.__uhost.get_session_key(devid)
+            crypto = CryptoLayer(session_key)
+            logging.debug('Unsigning package {0} with key {1}'.format(data, session_key))
             message = crypto.unsign(data)
             logging.debug('Unsigned message: {0}'.format(message))
             outbound_queue.put([devid, message])